@@ -0,0 +1,66 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import Broadcast, Message
+
+CHUNK_SIZE = 1000
+# Broadcasts to at most this many users are delivered within the request;
+# bigger ones are left for `manage.py send_broadcasts`
+INLINE_LIMIT = 1000
+
+
+def start_broadcast(sender, body, subject="No Subject"):
+    recipients = User.objects.exclude(id=sender.id).aggregate(count=Count('id'), last=Max('id'))
+    broadcast = Broadcast.objects.create(
+        sender=sender,
+        subject=subject,
+        body=body,
+        recipient_count=recipients['count'],
+        max_recipient_id=recipients['last'] or 0,
+    )
+    if broadcast.recipient_count <= INLINE_LIMIT:
+        broadcast = deliver_broadcast(broadcast)
+    return broadcast
+
+
+def deliver_chunk(broadcast, chunk_size=CHUNK_SIZE):
+    """Insert the next chunk of recipients' messages; returns the refreshed broadcast."""
+    with transaction.atomic():
+        broadcast = Broadcast.objects.select_for_update().get(pk=broadcast.pk)
+        if broadcast.completed_at:
+            return broadcast
+
+        recipient_ids = list(
+            User.objects.exclude(id=broadcast.sender_id)
+            .filter(id__gt=broadcast.last_recipient_id, id__lte=broadcast.max_recipient_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        Message.objects.bulk_create([
+            Message(
+                sender_id=broadcast.sender_id,
+                recipient_id=recipient_id,
+                subject=broadcast.subject,
+                body=broadcast.body,
+                broadcast=broadcast,
+            )
+            for recipient_id in recipient_ids
+        ])
+
+        broadcast.delivered_count += len(recipient_ids)
+        if recipient_ids:
+            broadcast.last_recipient_id = recipient_ids[-1]
+        if len(recipient_ids) < chunk_size:
+            broadcast.completed_at = timezone.now()
+        broadcast.save(update_fields=['delivered_count', 'last_recipient_id', 'completed_at'])
+    return broadcast
+
+
+def deliver_broadcast(broadcast, chunk_size=CHUNK_SIZE, progress=None):
+    while not broadcast.completed_at:
+        broadcast = deliver_chunk(broadcast, chunk_size)
+        if progress:
+            progress(broadcast)
+    return broadcast
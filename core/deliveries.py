@@ -0,0 +1,221 @@
+from datetime import datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .events import publish_delivery_change
+from .geocoding import distances_km
+from .instrumentation import record_cache
+from .models import DeliveryRequest
+from .routing import invalidate_route_plan
+
+# Invalidation only reaches the cache it runs against. With a process-local cache the other
+# workers keep stale counters until their copy expires, so there they are kept only briefly
+STATS_TTL = 60 * 60 * 24
+LOCAL_STATS_TTL = 30
+CENTS = Decimal('0.01')
+
+# (from, to) -> who may make the move: 'agent' is the assigned logistics agent (or, when
+# accepting, any agent if nobody is assigned); 'party' is the agent, the farmer or the buyer
+TRANSITIONS = {
+    ('pending', 'accepted'): 'agent',
+    ('pending', 'cancelled'): 'party',
+    ('accepted', 'pending'): 'agent',  # handed back to the pool
+    ('accepted', 'in_transit'): 'agent',
+    ('accepted', 'cancelled'): 'party',
+    ('in_transit', 'delivered'): 'agent',
+}
+
+
+def _stats_key(agent_id):
+    return f"delivery_stats:{agent_id}"
+
+
+def _stats_ttl():
+    if settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+        return LOCAL_STATS_TTL
+    return STATS_TTL
+
+
+def delivery_stats(agent_id):
+    """
+    Status counters for a logistics agent, from one aggregate query and cached until a
+    delivery changes (or, with a process-local cache, for LOCAL_STATS_TTL seconds).
+    """
+    stats = cache.get(_stats_key(agent_id))
+    record_cache('delivery_stats', stats is not None)
+    if stats is None:
+        stats = DeliveryRequest.objects.filter(logistics_agent_id=agent_id).aggregate(
+            total=Count('id'),
+            pending=Count('id', filter=Q(status='pending')),
+            in_transit=Count('id', filter=Q(status='in_transit')),
+            delivered=Count('id', filter=Q(status='delivered')),
+        )
+        cache.set(_stats_key(agent_id), stats, _stats_ttl())
+    return stats
+
+
+def invalidate_delivery_stats(*agent_ids):
+    cache.delete_many([_stats_key(agent_id) for agent_id in agent_ids if agent_id])
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_deliveries(deliveries, filters):
+    """
+    Narrow a DeliveryRequest queryset by DeliveryFilterForm data. Dates become a
+    half-open range on the raw column and locations compare lower-cased, so every
+    filter can use one of the listing indexes.
+    """
+    if filters.get('status'):
+        deliveries = deliveries.filter(status=filters['status'])
+    if filters.get('date_from'):
+        deliveries = deliveries.filter(date_requested__gte=_day_start(filters['date_from']))
+    if filters.get('date_to'):
+        deliveries = deliveries.filter(date_requested__lt=_day_start(filters['date_to'] + timedelta(days=1)))
+    if filters.get('pickup', '').strip():
+        deliveries = deliveries.alias(pickup_key=Lower('pickup_location')).filter(pickup_key=filters['pickup'].strip().lower())
+    if filters.get('destination', '').strip():
+        deliveries = deliveries.alias(destination_key=Lower('destination')).filter(
+            destination_key=filters['destination'].strip().lower(),
+        )
+    return deliveries
+
+
+def tariff(distance_km):
+    """Cost of a great-circle distance: the base fee plus each DELIVERY_RATE_BANDS rate over its stretch of road."""
+    road_km = Decimal(distance_km * settings.DELIVERY_ROAD_FACTOR)
+    cost = settings.DELIVERY_BASE_FEE
+    covered = Decimal(0)
+    for limit, rate in settings.DELIVERY_RATE_BANDS:
+        stretch = road_km - covered if limit is None else min(road_km, Decimal(limit)) - covered
+        if stretch <= 0:
+            break
+        cost += stretch * rate
+        covered += stretch
+    return cost.quantize(CENTS, ROUND_HALF_UP)
+
+
+def quote_many(routes):
+    """Delivery costs for (pickup, destination) pairs; None where a location can't be placed."""
+    return [None if distance is None else tariff(distance) for distance in distances_km(routes)]
+
+
+def quote(pickup, destination):
+    return quote_many([(pickup, destination)])[0]
+
+
+def requote_deliveries(deliveries, batch_size=2000):
+    """Recompute delivery_cost for a DeliveryRequest queryset; returns (checked, changed)."""
+    checked = changed = 0
+    batch = []
+
+    def flush():
+        nonlocal checked, changed
+        costs = quote_many([(delivery.pickup_location, delivery.destination) for delivery in batch])
+        stale = []
+        for delivery, cost in zip(batch, costs):
+            if delivery.delivery_cost != cost:
+                delivery.delivery_cost = cost
+                stale.append(delivery)
+        DeliveryRequest.objects.bulk_update(stale, ['delivery_cost'], batch_size=batch_size)
+        checked += len(batch)
+        changed += len(stale)
+        batch.clear()
+
+    rows = deliveries.only('id', 'pickup_location', 'destination', 'delivery_cost').order_by('pk')
+    for delivery in rows.iterator(chunk_size=batch_size):
+        batch.append(delivery)
+        if len(batch) == batch_size:
+            flush()
+    if batch:
+        flush()
+    return checked, changed
+
+
+class DeliveryConflict(Exception):
+    """A status change that isn't allowed, or that lost to someone else's change."""
+
+
+def _deliveries_changed(*agent_ids):
+    # Conditional UPDATEs skip the post_save handlers that normally do this
+    invalidate_delivery_stats(*agent_ids)
+    invalidate_route_plan()
+
+
+def _explain_conflict(delivery_id, user, role, status):
+    delivery = DeliveryRequest.objects.only('status', 'logistics_agent_id').filter(pk=delivery_id).first()
+    if delivery is None:
+        return "This delivery no longer exists."
+    if role == 'logistics' and delivery.logistics_agent_id not in (None, user.id):
+        if status == 'accepted':
+            return "Another agent accepted this delivery first."
+        return "You are not assigned to this delivery."
+    if delivery.status == status:
+        return f"This delivery is already {delivery.get_status_display().lower()}."
+    if (delivery.status, status) not in TRANSITIONS:
+        return f"A delivery that is {delivery.get_status_display().lower()} can't be marked as '{status}'."
+    return "You are not authorized to update this delivery."
+
+
+def change_status(delivery_id, user, role, status):
+    """
+    Move a delivery to ``status`` with one conditional UPDATE, so of two concurrent
+    changes only one can match the row. Raises DeliveryConflict, with a message for
+    the user, when the move isn't allowed for ``role`` or the row changed first.
+    """
+    if role == 'logistics':
+        sources = [source for (source, target) in TRANSITIONS if target == status]
+    else:
+        sources = [source for (source, target), actor in TRANSITIONS.items() if target == status and actor == 'party']
+    if not sources:
+        raise DeliveryConflict("Invalid status update.")
+
+    rows = DeliveryRequest.objects.filter(pk=delivery_id, status__in=sources)
+    changes = {'status': status}
+    if role == 'logistics':
+        if status == 'accepted':
+            rows = rows.filter(Q(logistics_agent__isnull=True) | Q(logistics_agent=user))
+            changes['logistics_agent'] = user
+        else:
+            rows = rows.filter(logistics_agent=user)
+            if status == 'pending':
+                changes['logistics_agent'] = None
+    elif role == 'farmer':
+        rows = rows.filter(farmer=user)
+    elif role == 'buyer':
+        rows = rows.filter(buyer=user)
+    else:
+        raise DeliveryConflict("You are not authorized to update this delivery.")
+
+    if not rows.update(**changes):
+        raise DeliveryConflict(_explain_conflict(delivery_id, user, role, status))
+    farmer_id, buyer_id, agent_id = DeliveryRequest.objects.filter(pk=delivery_id).values_list(
+        'farmer_id', 'buyer_id', 'logistics_agent_id',
+    ).get()
+    _deliveries_changed(agent_id, user.id if role == 'logistics' else None)
+    extra = {}
+    if 'logistics_agent' in changes:
+        extra['agent'] = user.username if changes['logistics_agent'] else None
+    publish_delivery_change(delivery_id, status, [farmer_id, buyer_id, agent_id, user.id], **extra)
+
+
+def claim_deliveries(user, delivery_ids):
+    """Accept every delivery in ``delivery_ids`` that is still unclaimed; returns how many were."""
+    claimed = DeliveryRequest.objects.filter(
+        pk__in=delivery_ids, status='pending', logistics_agent__isnull=True,
+    ).update(logistics_agent=user, status='accepted')
+    if claimed:
+        _deliveries_changed(user.id)
+        parties = DeliveryRequest.objects.filter(
+            pk__in=delivery_ids, status='accepted', logistics_agent=user,
+        ).values_list('pk', 'farmer_id', 'buyer_id')
+        for delivery_id, farmer_id, buyer_id in parties:
+            publish_delivery_change(delivery_id, 'accepted', [farmer_id, buyer_id, user.id], agent=user.username)
+    return claimed
@@ -0,0 +1,117 @@
+import asyncio
+import contextvars
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import DeliveryEvent, DeliveryRequest
+
+QUEUE_SIZE = 100
+STATUS_LABELS = dict(DeliveryRequest.STATUS_CHOICES)  # lazily translated
+# Events are only read by streams that were open when they were written; older rows are
+# deleted by whichever relay gets to them
+EVENT_RETENTION = timedelta(minutes=5)
+PRUNE_EVERY = 60  # polls
+
+# user id -> subscriptions of that user's open event streams in this process
+_subscriptions = defaultdict(set)
+# event loop -> the task relaying DeliveryEvent rows to the streams open on it
+_relays = {}
+_lock = threading.Lock()
+
+
+class Subscription:
+    """One open stream: a queue read on the event loop, fed from whichever thread saved the change."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass  # a client this far behind reloads the page anyway
+
+
+async def subscribe(user_id):
+    """Open a stream for ``user_id``; it hears every event written after this returns."""
+    subscription = Subscription(user_id)
+    with _lock:
+        _subscriptions[user_id].add(subscription)
+        running = subscription.loop in _relays
+    if not running:
+        try:
+            last_id = (await DeliveryEvent.objects.aaggregate(last=Max('id')))['last'] or 0
+        except BaseException:
+            unsubscribe(subscription)
+            raise
+        with _lock:
+            if subscription.loop not in _relays:
+                # A context of its own, so the relay outlives the request that started it
+                _relays[subscription.loop] = subscription.loop.create_task(
+                    _relay(subscription.loop, last_id), context=contextvars.Context(),
+                )
+    return subscription
+
+
+def unsubscribe(subscription):
+    with _lock:
+        _subscriptions[subscription.user_id].discard(subscription)
+        if not _subscriptions[subscription.user_id]:
+            del _subscriptions[subscription.user_id]
+
+
+def publish(user_ids, event):
+    """Hand ``event`` to the streams of ``user_ids`` open in this process."""
+    with _lock:
+        targets = [subscription for user_id in set(user_ids) for subscription in _subscriptions.get(user_id, ())]
+    for subscription in targets:
+        subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+
+
+def _has_streams(loop):
+    return any(subscription.loop is loop for subscriptions in _subscriptions.values() for subscription in subscriptions)
+
+
+async def _relay(loop, last_id):
+    # Rows are read in id order past ``last_id``. On SQLite writes are serialised, so ids are
+    # also commit order; on PostgreSQL a transaction that commits after a later one's events
+    # were read is missed, and that page catches up on its next reload
+    polls = 0
+    try:
+        while True:
+            await asyncio.sleep(settings.DELIVERY_EVENTS_POLL)
+            with _lock:
+                if not _has_streams(loop):
+                    del _relays[loop]
+                    return
+            rows = DeliveryEvent.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', 'recipient_id', 'payload')
+            async for event_id, user_id, payload in rows:
+                publish([user_id], payload)
+                last_id = event_id
+            polls += 1
+            if polls % PRUNE_EVERY == 0:
+                await DeliveryEvent.objects.filter(created_at__lt=timezone.now() - EVENT_RETENTION).adelete()
+    except BaseException:
+        # A failed poll ends the relay; the next stream to open starts another
+        with _lock:
+            _relays.pop(loop, None)
+        raise
+
+
+def publish_delivery_change(delivery_id, status, party_ids, **extra):
+    """
+    Tell the farmer, buyer and agent of a delivery (``party_ids``) about its new status.
+    The events are written in the caller's transaction, so they are only seen if it
+    commits; each worker's relay then pushes them to the streams it holds.
+    """
+    event = {'id': delivery_id, 'status': status, **extra}
+    DeliveryEvent.objects.bulk_create([
+        DeliveryEvent(recipient_id=user_id, payload=event) for user_id in {user_id for user_id in party_ids if user_id}
+    ])
@@ -39,3 +39,19 @@ class DeliveryRequestForm(forms.ModelForm):
     class Meta:
         model = DeliveryRequest
         fields = ['buyer', 'product', 'pickup_location', 'destination', 'logistics_agent'] 
+
+
+class DeliveryFilterForm(forms.Form):
+    status = forms.ChoiceField(choices=[('', _("Any status"))] + DeliveryRequest.STATUS_CHOICES, required=False)
+    date_from = forms.DateField(required=False, label=_("From"), widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(required=False, label=_("To"), widget=forms.DateInput(attrs={'type': 'date'}))
+    # Whole location, any case: matched against an index on the lower-cased column
+    pickup = forms.CharField(max_length=100, required=False)
+    destination = forms.CharField(max_length=100, required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from, date_to = cleaned_data.get('date_from'), cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError(_("The start date must not be after the end date."))
+        return cleaned_data
@@ -0,0 +1,182 @@
+import math
+import re
+from functools import lru_cache
+
+EARTH_RADIUS_KM = 6371.0088
+GEOCODE_CACHE_SIZE = 4096
+
+# (latitude, longitude) of Nigerian towns, keyed by normalised name
+PLACES = {
+    # State capitals
+    'umuahia': (5.5250, 7.4944),
+    'yola': (9.2035, 12.4954),
+    'uyo': (5.0377, 7.9128),
+    'awka': (6.2106, 7.0741),
+    'bauchi': (10.3158, 9.8442),
+    'yenagoa': (4.9267, 6.2676),
+    'makurdi': (7.7322, 8.5391),
+    'maiduguri': (11.8311, 13.1510),
+    'calabar': (4.9757, 8.3417),
+    'asaba': (6.1980, 6.7319),
+    'abakaliki': (6.3249, 8.1137),
+    'benin city': (6.3350, 5.6037),
+    'ado ekiti': (7.6233, 5.2209),
+    'enugu': (6.4584, 7.5464),
+    'abuja': (9.0765, 7.3986),
+    'gombe': (10.2897, 11.1673),
+    'owerri': (5.4850, 7.0350),
+    'dutse': (11.7562, 9.3389),
+    'kaduna': (10.5105, 7.4165),
+    'kano': (12.0022, 8.5920),
+    'katsina': (12.9908, 7.6018),
+    'birnin kebbi': (12.4539, 4.1975),
+    'lokoja': (7.8023, 6.7333),
+    'ilorin': (8.4966, 4.5421),
+    'ikeja': (6.6018, 3.3515),
+    'lafia': (8.4939, 8.5153),
+    'minna': (9.6139, 6.5569),
+    'abeokuta': (7.1475, 3.3619),
+    'akure': (7.2571, 5.2058),
+    'osogbo': (7.7827, 4.5418),
+    'ibadan': (7.3775, 3.9470),
+    'jos': (9.8965, 8.8583),
+    'port harcourt': (4.8156, 7.0498),
+    'sokoto': (13.0059, 5.2476),
+    'jalingo': (8.8937, 11.3596),
+    'damaturu': (11.7470, 11.9608),
+    'gusau': (12.1628, 6.6614),
+    # Oyo State towns
+    'ogbomosho': (8.1335, 4.2407),
+    'oyo': (7.8526, 3.9312),
+    'saki': (8.6676, 3.3939),
+    'iseyin': (7.9667, 3.6000),
+    'fiditi': (7.7167, 3.9167),
+    'eruwa': (7.5333, 3.4167),
+    'kishi': (9.0833, 3.8500),
+    'igboho': (8.8333, 3.7667),
+    'igbo ora': (7.4333, 3.2833),
+    'okeho': (8.0333, 3.3500),
+    'lanlate': (7.6000, 3.4500),
+    # Other towns
+    'lagos': (6.5244, 3.3792),
+    'ikorodu': (6.6194, 3.5105),
+    'epe': (6.5841, 3.9834),
+    'badagry': (6.4316, 2.8876),
+    'ota': (6.6804, 3.2356),
+    'sagamu': (6.8322, 3.6319),
+    'ijebu ode': (6.8194, 3.9173),
+    'ife': (7.4905, 4.5521),
+    'ilesa': (7.6167, 4.7333),
+    'ede': (7.7333, 4.4333),
+    'iwo': (7.6333, 4.1833),
+    'ondo': (7.1000, 4.8333),
+    'owo': (7.1962, 5.5868),
+    'offa': (8.1491, 4.7207),
+    'jebba': (9.1333, 4.8333),
+    'okene': (7.5500, 6.2333),
+    'warri': (5.5167, 5.7500),
+    'sapele': (5.8941, 5.6767),
+    'onitsha': (6.1667, 6.7833),
+    'nnewi': (6.0177, 6.9170),
+    'aba': (5.1066, 7.3667),
+    'ikot ekpene': (5.1819, 7.7146),
+    'ugep': (5.8086, 8.0811),
+    'otukpo': (7.1904, 8.1299),
+    'gboko': (7.3167, 9.0000),
+    'bida': (9.0833, 6.0167),
+    'kontagora': (10.4000, 5.4667),
+    'suleja': (9.1806, 7.1794),
+    'kafanchan': (9.5833, 8.3000),
+    'zaria': (11.0855, 7.7199),
+    'funtua': (11.5231, 7.3081),
+    'kaura namoda': (12.5939, 6.5863),
+    'azare': (11.6765, 10.1948),
+    'potiskum': (11.7128, 11.0780),
+    'nguru': (12.8791, 10.4526),
+    'mubi': (10.2676, 13.2644),
+}
+
+# A state on its own resolves to its capital
+STATES = {
+    'abia': 'umuahia', 'adamawa': 'yola', 'akwa ibom': 'uyo', 'anambra': 'awka',
+    'bauchi': 'bauchi', 'bayelsa': 'yenagoa', 'benue': 'makurdi', 'borno': 'maiduguri',
+    'cross river': 'calabar', 'delta': 'asaba', 'ebonyi': 'abakaliki', 'edo': 'benin city',
+    'ekiti': 'ado ekiti', 'enugu': 'enugu', 'fct': 'abuja', 'federal capital territory': 'abuja',
+    'gombe': 'gombe', 'imo': 'owerri', 'jigawa': 'dutse', 'kaduna': 'kaduna', 'kano': 'kano',
+    'katsina': 'katsina', 'kebbi': 'birnin kebbi', 'kogi': 'lokoja', 'kwara': 'ilorin',
+    'lagos': 'ikeja', 'nasarawa': 'lafia', 'niger': 'minna', 'ogun': 'abeokuta', 'ondo': 'akure',
+    'osun': 'osogbo', 'oyo': 'ibadan', 'plateau': 'jos', 'rivers': 'port harcourt',
+    'sokoto': 'sokoto', 'taraba': 'jalingo', 'yobe': 'damaturu', 'zamfara': 'gusau',
+}
+
+# Other spellings people type
+ALIASES = {
+    'ogbomoso': 'ogbomosho', 'shaki': 'saki', 'oshogbo': 'osogbo', 'ile ife': 'ife',
+    'benin': 'benin city', 'ph': 'port harcourt', 'portharcourt': 'port harcourt',
+    'ado': 'ado ekiti', 'ijebu': 'ijebu ode', 'shagamu': 'sagamu', 'igboora': 'igbo ora',
+}
+
+_SEPARATORS_RE = re.compile(r'[,;/|]')
+_NOISE_RE = re.compile(r'[^a-z ]+')
+
+
+def normalize_place(text):
+    return ' '.join(_NOISE_RE.sub(' ', (text or '').lower().replace('-', ' ')).split())
+
+
+def _lookup(name):
+    name = ALIASES.get(name, name)
+    if name in PLACES:
+        return PLACES[name]
+    if name.endswith(' state'):
+        name = name[:-len(' state')]
+    if name in STATES:
+        return PLACES[STATES[name]]
+    return None
+
+
+@lru_cache(maxsize=GEOCODE_CACHE_SIZE)
+def geocode(text):
+    """
+    (latitude, longitude) for a free-text location such as "Ibadan", "Bodija, Ibadan"
+    or "Oyo State", or None when no known town or state appears in it. The first
+    comma-separated part that resolves wins; failing that, the last word or word pair that does.
+    """
+    for part in _SEPARATORS_RE.split(text or ''):
+        point = _lookup(normalize_place(part))
+        if point:
+            return point
+    words = normalize_place(text).split()
+    for size in (2, 1):
+        for start in range(len(words) - size, -1, -1):
+            point = _lookup(' '.join(words[start:start + size]))
+            if point:
+                return point
+    return None
+
+
+def haversine_km(a, b):
+    lat1, lon1 = map(math.radians, a)
+    lat2, lon2 = map(math.radians, b)
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+def distances_km(pairs):
+    """
+    Great-circle distances for many (origin, destination) text pairs, None where either
+    end is unknown. Each distinct place is geocoded once and each distinct route computed once.
+    """
+    points = {text: geocode(text) for pair in pairs for text in pair}
+    routes = {}
+    results = []
+    for origin, destination in pairs:
+        a, b = points[origin], points[destination]
+        if a is None or b is None:
+            results.append(None)
+            continue
+        route = (a, b) if a <= b else (b, a)
+        if route not in routes:
+            routes[route] = haversine_km(*route)
+        results.append(routes[route])
+    return results
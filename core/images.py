@@ -0,0 +1,166 @@
+import hashlib
+import io
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps, features
+
+from .instrumentation import record_cache
+
+# Derivatives live under one prefix so they can be served with far-future cache headers
+DERIVATIVE_DIR = 'derivatives'
+# Preferred first: <picture> lists sources in this order and browsers take the first they support
+FORMATS = [fmt for fmt in ('avif', 'webp') if features.check(fmt)]
+QUALITY = {'avif': 55, 'webp': 78}
+MANIFEST_TTL = 60 * 60 * 24
+EMPTY_MANIFEST_TTL = 60  # retry soon if the background build has not finished yet
+BUILD_LOCK_TTL = 300
+
+
+def _manifest_key(name):
+    return f"image_derivatives:{hashlib.md5(name.encode()).hexdigest()}"
+
+
+def file_digest(fh, chunk_size=64 * 1024):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: fh.read(chunk_size), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def derivative_name(digest, width, fmt):
+    # Named after the source bytes, so identical uploads share derivatives and a URL never changes content
+    return f"{DERIVATIVE_DIR}/{digest[:2]}/{digest}/{width}.{fmt}"
+
+
+def _target_widths(image_width):
+    widths = [w for w in settings.IMAGE_DERIVATIVE_WIDTHS if w < image_width]
+    return widths or [image_width]
+
+
+def _encode(image, width, fmt):
+    resized = image.copy()
+    if resized.width > width:
+        resized.thumbnail((width, resized.height), Image.LANCZOS)
+    buffer = io.BytesIO()
+    resized.save(buffer, format=fmt.upper(), quality=QUALITY[fmt])
+    return buffer.getvalue()
+
+
+def generate_derivatives(name, storage=None):
+    """
+    Build the resized/re-encoded copies of the uploaded image ``name`` and record them.
+    Returns the manifest: (format, width, derivative name) tuples.
+    """
+    from .models import ImageDerivative
+    from .storage import select_media_storage
+
+    storage = storage or default_storage
+    with select_media_storage().open(name, 'rb') as fh:
+        digest = file_digest(fh)
+        fh.seek(0)
+        image = Image.open(fh)
+        image = ImageOps.exif_transpose(image)  # phone photos carry their rotation in EXIF
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    rows = []
+    for fmt in FORMATS:
+        for width in _target_widths(image.width):
+            target = derivative_name(digest, width, fmt)
+            if not storage.exists(target):
+                storage.save(target, ContentFile(_encode(image, width, fmt)))
+            rows.append(ImageDerivative(
+                source=name, source_digest=digest, width=width, format=fmt,
+                name=target, size=storage.size(target),
+            ))
+
+    with transaction.atomic():
+        ImageDerivative.objects.filter(source=name).delete()
+        ImageDerivative.objects.bulk_create(rows)
+    manifest = [(row.format, row.width, row.name) for row in rows]
+    cache.set(_manifest_key(name), manifest, MANIFEST_TTL)
+    _invalidate_pages_showing(name)
+    return manifest
+
+
+def _invalidate_pages_showing(name):
+    # Product cards cached before the derivatives existed still point at the original upload
+    from .models import Product
+    from .pagecache import invalidate_product_pages
+
+    product_ids = list(Product.objects.filter(image=name).values_list('pk', flat=True))
+    if product_ids:
+        invalidate_product_pages(*product_ids)
+
+
+def forget_derivatives(name, storage=None):
+    """Drop the derivatives of a deleted upload; files shared with another upload of the same bytes stay."""
+    from .models import ImageDerivative
+
+    storage = storage or default_storage
+    rows = list(ImageDerivative.objects.filter(source=name))
+    ImageDerivative.objects.filter(source=name).delete()
+    still_used = set(
+        ImageDerivative.objects.filter(source_digest__in={row.source_digest for row in rows})
+        .values_list('source_digest', flat=True)
+    )
+    for row in rows:
+        if row.source_digest not in still_used:
+            storage.delete(row.name)
+    cache.delete(_manifest_key(name))
+
+
+def _generate_in_background(name):
+    if not cache.add(f"{_manifest_key(name)}:building", True, BUILD_LOCK_TTL):
+        return
+
+    def run():
+        try:
+            generate_derivatives(name)
+        except (OSError, ValueError):
+            pass  # missing or unreadable upload; the original keeps being served
+        finally:
+            cache.delete(f"{_manifest_key(name)}:building")
+            connection.close()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def get_derivatives(fieldfile):
+    """
+    Manifest for an ImageField value, from cache or the database. When nothing has
+    been built yet the build is started in the background and [] is returned, so the
+    page falls back to the original upload this once.
+    """
+    from .models import ImageDerivative
+
+    if not fieldfile:
+        return []
+    key = _manifest_key(fieldfile.name)
+    manifest = cache.get(key)
+    record_cache('image_derivatives', manifest is not None)
+    if manifest is None:
+        manifest = list(
+            ImageDerivative.objects.filter(source=fieldfile.name)
+            .order_by('width')
+            .values_list('format', 'width', 'name')
+        )
+        cache.set(key, manifest, MANIFEST_TTL if manifest else EMPTY_MANIFEST_TTL)
+        if not manifest and settings.IMAGE_DERIVATIVES_IN_BACKGROUND:
+            _generate_in_background(fieldfile.name)
+    return manifest
+
+
+def srcsets(manifest, storage=None):
+    """{format: 'url 320w, url 640w'} for a manifest, in FORMATS order."""
+    storage = storage or default_storage
+    grouped = {}
+    for fmt, width, name in sorted(manifest, key=lambda row: row[1]):
+        grouped.setdefault(fmt, []).append(f"{storage.url(name)} {width}w")
+    return {fmt: ', '.join(grouped[fmt]) for fmt in FORMATS if fmt in grouped}
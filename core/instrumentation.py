@@ -0,0 +1,167 @@
+import logging
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger('farmmarket.slow_queries')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# Metrics of the request being handled. Context variables follow the request into
+# sync_to_async and asyncio.to_thread, so async views are measured too.
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.http_calls = 0
+        self.http_time = 0.0
+        self.cache = defaultdict(lambda: [0, 0])  # cache name -> [hits, misses]
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        hits = sum(hit for hit, _ in self.cache.values())
+        misses = sum(miss for _, miss in self.cache.values())
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'http;dur={self.http_time * 1000:.1f};desc="{self.http_calls} calls"',
+            f'cache;desc="{hits} hits, {misses} misses"',
+            f'total;dur={self.elapsed * 1000:.1f}',
+        ])
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def _query_origin():
+    # Innermost frame from the project itself, skipping Django, libraries and this module
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        if frame.filename.startswith(base_dir) and 'site-packages' not in frame.filename and frame.filename != __file__:
+            return f"{frame.filename[len(base_dir) + 1:]}:{frame.lineno} in {frame.name}"
+    return 'unknown'
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper: times every query and logs the slow ones with where they came from."""
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.db_time += duration
+        if duration * 1000 >= settings.SLOW_QUERY_MS:
+            logger.warning("Slow query (%.0f ms) from %s: %s", duration * 1000, _query_origin(), sql[:1000])
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver; a reconnect must not stack a second wrapper."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def record_http(duration):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.http_calls += 1
+        metrics.http_time += duration
+
+
+def record_cache(name, hit):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache[name][0 if hit else 1] += 1
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Per-process aggregates by URL name, exposed in Prometheus text format."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.durations = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self.db_times = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self.query_counts = defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS))
+        self.http_times = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self.cache_lookups = defaultdict(int)  # (view, cache, result) -> count
+
+    def observe(self, view, metrics):
+        with self.lock:
+            self.durations[view].observe(metrics.elapsed)
+            self.db_times[view].observe(metrics.db_time)
+            self.query_counts[view].observe(metrics.queries)
+            if metrics.http_calls:
+                self.http_times[view].observe(metrics.http_time)
+            for name, (hits, misses) in metrics.cache.items():
+                self.cache_lookups[view, name, 'hit'] += hits
+                self.cache_lookups[view, name, 'miss'] += misses
+
+    def _histogram_lines(self, name, help_text, histograms):
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for view, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{view="{view}"}} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{{view="{view}"}} {histogram.count}')
+        return lines
+
+    def prometheus(self):
+        with self.lock:
+            lines = []
+            lines += self._histogram_lines(
+                'farmmarket_request_duration_seconds', "Wall time per request.", self.durations)
+            lines += self._histogram_lines(
+                'farmmarket_db_duration_seconds', "Database time per request.", self.db_times)
+            lines += self._histogram_lines(
+                'farmmarket_db_queries', "Database queries per request.", self.query_counts)
+            lines += self._histogram_lines(
+                'farmmarket_weather_http_duration_seconds', "OpenWeather HTTP time per request that called it.",
+                self.http_times)
+            lines += [
+                "# HELP farmmarket_cache_lookups_total Cache lookups by cache and result.",
+                "# TYPE farmmarket_cache_lookups_total counter",
+            ]
+            for (view, name, result), count in sorted(self.cache_lookups.items()):
+                lines.append(f'farmmarket_cache_lookups_total{{view="{view}",cache="{name}",result="{result}"}} {count}')
+            return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
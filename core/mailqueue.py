@@ -0,0 +1,123 @@
+import hashlib
+import logging
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger('farmmarket.mail')
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = timedelta(minutes=1)
+# A claimed row is not due again for this long, so a worker that dies mid-send only delays it
+SEND_LEASE = timedelta(minutes=10)
+# Failures of the mail server rather than of one message: the rest of the batch would fail too
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+def _dedupe_key(reference, recipient, subject, body):
+    return hashlib.sha256('\0'.join((reference, recipient, subject, body)).encode()).hexdigest()
+
+
+def enqueue_mass_mail(datatuple, reference=''):
+    """
+    Queue (subject, message, from_email, recipient_list) tuples, like send_mass_mail,
+    in one INSERT; `send_queued_mail` delivers them. ``reference`` names what the
+    mail is about (e.g. "order:42"): queueing the same mail for the same reference
+    again while it waits is a no-op, while the same text for a new reference is
+    queued. Called inside a transaction, the mail is only queued if that
+    transaction commits.
+    """
+    OutboundEmail.objects.bulk_create([
+        OutboundEmail(
+            subject=subject,
+            body=message,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            recipient=recipient,
+            dedupe_key=_dedupe_key(reference, recipient, subject, message),
+        )
+        for subject, message, from_email, recipient_list in datatuple
+        for recipient in recipient_list
+    ], ignore_conflicts=True)
+
+
+def enqueue_mail(subject, message, recipient_list, from_email=None, reference=''):
+    enqueue_mass_mail([(subject, message, from_email, recipient_list)], reference)
+
+
+def _claim_due(batch_size):
+    # Short transaction: lease the rows by moving their next attempt past the send
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        if batch:
+            OutboundEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+                next_attempt_at=timezone.now() + SEND_LEASE,
+            )
+    return batch
+
+
+def _release(emails):
+    # Due again at once, with no attempt counted against them
+    OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(next_attempt_at=timezone.now())
+
+
+def send_queued_mail(batch_size=100):
+    """
+    Send due mail over one backend connection; returns (sent, failed) counts. Rows
+    are claimed in a short transaction and sent outside it, so a slow mail server
+    holds no database locks. If the connection can't be opened, or drops, the
+    batch stops and its unsent rows are released rather than failed.
+    """
+    batch = _claim_due(batch_size)
+    if not batch:
+        return 0, 0
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        logger.warning("Mail server unavailable; %d emails left queued: %s", len(batch), exc)
+        _release(batch)
+        return 0, 0
+
+    sent, failed = [], []
+    try:
+        for position, email in enumerate(batch):
+            try:
+                EmailMessage(email.subject, email.body, email.from_email, [email.recipient],
+                             connection=connection).send()
+            except CONNECTION_ERRORS as exc:
+                logger.warning("Mail server connection lost; %d emails left queued: %s", len(batch) - position, exc)
+                _release(batch[position:])
+                batch = batch[:position]
+                break
+            except Exception as exc:
+                email.attempts += 1
+                email.last_error = str(exc)
+                if email.attempts >= MAX_ATTEMPTS:
+                    email.status = 'failed'
+                else:
+                    # Exponential backoff: 1, 2, 4, 8 minutes
+                    email.next_attempt_at = timezone.now() + RETRY_BASE_DELAY * 2 ** (email.attempts - 1)
+                failed.append(email)
+            else:
+                email.status = 'sent'
+                email.sent_at = timezone.now()
+                email.attempts += 1
+                sent.append(email)
+    finally:
+        connection.close()
+
+    OutboundEmail.objects.bulk_update(
+        batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+    return len(sent), len(failed)
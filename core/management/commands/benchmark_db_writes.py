@@ -0,0 +1,60 @@
+import threading
+import time
+
+from django.db import OperationalError, connection, connections, transaction
+from django.core.management.base import BaseCommand
+
+TABLE = 'benchmark_db_writes'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure write throughput of the configured database with concurrent writer threads, "
+        "using a scratch table that is dropped afterwards. Compare profiles by re-running with "
+        "e.g. SQLITE_TUNING=False or DB_ENGINE=postgresql."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=200, help="Transactions per thread.")
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {TABLE} (worker INTEGER, payload VARCHAR(100))")
+        counts = {'ok': 0, 'failed': 0}
+        lock = threading.Lock()
+
+        def writer(worker):
+            ok = failed = 0
+            try:
+                for i in range(options['writes']):
+                    try:
+                        # Read-then-write, like most view transactions
+                        with transaction.atomic(), connection.cursor() as cursor:
+                            cursor.execute(f"SELECT COUNT(*) FROM {TABLE} WHERE worker = %s", [worker])
+                            cursor.execute(f"INSERT INTO {TABLE} (worker, payload) VALUES (%s, %s)", [worker, f"row {i}"])
+                        ok += 1
+                    except OperationalError:  # "database is locked" and friends
+                        failed += 1
+            finally:
+                connections.close_all()
+                with lock:
+                    counts['ok'] += ok
+                    counts['failed'] += failed
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {TABLE}")
+        settings_dict = connection.settings_dict
+        self.stdout.write(f"{connection.vendor} {settings_dict['NAME']} {settings_dict.get('OPTIONS', {})}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{counts['ok']} writes in {elapsed:.2f}s ({counts['ok'] / elapsed:.0f}/s) "
+            f"from {options['threads']} threads; {counts['failed']} failed"
+        ))
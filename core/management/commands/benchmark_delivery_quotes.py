@@ -0,0 +1,55 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.deliveries import quote, quote_many
+from core.geocoding import PLACES, STATES, geocode
+
+
+def _spelling(rng, name):
+    # The ways people fill in the pickup and destination fields
+    return rng.choice([
+        name.title(),
+        name.upper(),
+        f"  {name} ",
+        f"Market road, {name.title()}",
+        f"{rng.choice(list(STATES)).title()} State",
+        "Unknown village",
+    ])
+
+
+class Command(BaseCommand):
+    help = (
+        "Time delivery quoting over synthetic (pickup, destination) pairs drawn from the gazetteer, "
+        "one request at a time and in batches. Nothing is written to the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=50000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        names = list(PLACES)
+        routes = [(_spelling(rng, rng.choice(names)), _spelling(rng, rng.choice(names))) for _ in range(options['count'])]
+
+        geocode.cache_clear()
+        started = time.perf_counter()
+        single = [quote(pickup, destination) for pickup, destination in routes]
+        single_time = time.perf_counter() - started
+        info = geocode.cache_info()
+
+        geocode.cache_clear()
+        started = time.perf_counter()
+        batched = quote_many(routes)
+        batch_time = time.perf_counter() - started
+
+        assert single == batched
+        unplaced = sum(cost is None for cost in batched)
+        self.stdout.write(f"{len(routes)} routes, {unplaced} with an unknown end")
+        self.stdout.write(f"geocode cache: {info.hits} hits, {info.misses} misses")
+        self.stdout.write(self.style.SUCCESS(
+            f"one at a time: {single_time:.2f}s ({len(routes) / single_time:.0f}/s); "
+            f"batched: {batch_time:.2f}s ({len(routes) / batch_time:.0f}/s)"
+        ))
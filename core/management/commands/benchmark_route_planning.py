@@ -0,0 +1,50 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.geocoding import PLACES
+from core.routing import Agent, Job, plan_routes
+
+JITTER_DEGREES = 0.1  # about 11 km, so deliveries in one town are not all on the same spot
+
+
+class Command(BaseCommand):
+    help = (
+        "Plan routes for synthetic open deliveries and agents scattered over the gazetteer's towns, "
+        "with nearest-neighbour ordering alone and with 2-opt inside the time budget. Nothing is "
+        "written to the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--deliveries', type=int, default=5000)
+        parser.add_argument('--agents', type=int, default=200)
+        parser.add_argument('--budget', type=float, default=2.0, help="Planner time budget in seconds.")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        towns = list(PLACES.items())
+        # Produce comes from a handful of farming towns and goes anywhere
+        farm_towns = rng.sample(towns, 12)
+
+        def near(point):
+            return (point[0] + rng.uniform(-JITTER_DEGREES, JITTER_DEGREES),
+                    point[1] + rng.uniform(-JITTER_DEGREES, JITTER_DEGREES))
+
+        jobs = []
+        for delivery_id in range(options['deliveries']):
+            (pickup_name, pickup), (destination_name, destination) = rng.choice(farm_towns), rng.choice(towns)
+            jobs.append(Job(delivery_id, near(pickup), near(destination), pickup_name, destination_name))
+        agents = [Agent(agent_id, near(rng.choice(towns)[1])) for agent_id in range(options['agents'])]
+
+        for label, budget in (("nearest neighbour", 0), ("with 2-opt", options['budget'])):
+            started = time.perf_counter()
+            plan = plan_routes(jobs, agents, budget=budget)
+            elapsed = time.perf_counter() - started
+            assigned = [batch for batch in plan.batches if batch.agent_id is not None]
+            self.stdout.write(
+                f"{label}: {len(plan.batches)} batches (mean {len(jobs) / len(plan.batches):.1f} deliveries), "
+                f"{len(assigned)} proposed to agents, {sum(batch.distance_km for batch in plan.batches):,.0f} km "
+                f"in total, {elapsed:.2f}s{'' if plan.optimised or not budget else ', budget exhausted'}"
+            )
@@ -0,0 +1,84 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Q
+
+from core.geocoding import PLACES, STATES
+from core.models import CROP_CHOICES, Product
+from core.queries import PRODUCTS_PER_PAGE, product_listing
+from core.search import rebuild_index
+
+ADJECTIVES = ['fresh', 'organic', 'dried', 'ripe', 'bulk', 'sweet', 'local', 'premium']
+SEARCHES = [('tomatoes', None), ('fresh maize', None), (None, 'ibadan'), ('pepper', 'kano'), ('yam', 'oyo')]
+
+
+def first_page(products):
+    # Numbered pages, as product_list serves search results: a COUNT and the page itself
+    return list(Paginator(products, PRODUCTS_PER_PAGE).get_page(1))
+
+
+def icontains_page(query, location):
+    """The listing as it was filtered before the index: substring scans of the product table."""
+    products = Product.objects.all()
+    if query:
+        products = products.filter(title__icontains=query)
+    if location:
+        products = products.filter(Q(city__icontains=location) | Q(state__icontains=location))
+    return first_page(products.order_by('-date_posted'))
+
+
+def indexed_page(query, location):
+    products, _ = product_listing(query, location)
+    return first_page(products)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the first page of marketplace searches through the search index with the "
+        "icontains filters it replaced, over synthetic products. Everything is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5, help="Runs of each search; the best is reported.")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        crops = [crop for crop, _ in CROP_CHOICES]
+        towns = list(PLACES)
+        states = list(STATES)
+
+        with transaction.atomic():
+            farmer = User.objects.create(username='benchmark-search-farmer')
+            Product.objects.bulk_create([
+                Product(
+                    farmer=farmer, title=f"{rng.choice(ADJECTIVES).title()} {crop}s", category=crop,
+                    description=f"{rng.choice(ADJECTIVES).title()} {crop.lower()} from a family farm",
+                    price=rng.randint(50, 5000), quantity=rng.randint(1, 100),
+                    city=rng.choice(towns).title(), state=f"{rng.choice(states).title()} State",
+                )
+                for crop in (rng.choice(crops) for _ in range(options['products']))
+            ], batch_size=1000)
+            started = time.perf_counter()
+            rebuild_index(Product.objects.all())
+            self.stdout.write(f"Indexed {options['products']} products in {time.perf_counter() - started:.1f}s")
+
+            for query, location in SEARCHES:
+                timings = {}
+                for label, search in (("icontains", icontains_page), ("index", indexed_page)):
+                    runs = []
+                    for _ in range(options['repeat']):
+                        started = time.perf_counter()
+                        search(query, location)
+                        runs.append(time.perf_counter() - started)
+                    timings[label] = min(runs)
+                self.stdout.write(
+                    f"q={query!r} location={location!r}: icontains {timings['icontains'] * 1000:.1f}ms, "
+                    f"index {timings['index'] * 1000:.1f}ms"
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,125 @@
+import re
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.deliveries import filter_deliveries
+from core.models import DeliveryRequest, Product
+from core.pagination import CursorPaginator
+from core.queries import (
+    DELIVERIES_PER_PAGE, PRODUCTS_PER_PAGE, assigned_deliveries, inbox_messages, latest_products,
+    listed_deliveries, open_deliveries, product_listing, sent_messages, unclaimed_deliveries, unread_messages,
+)
+
+USER = User(pk=1)
+# Sort values for the made-up row a deep page's cursor points past
+CURSOR_VALUES = {'date_posted': timezone.now(), 'date_requested': timezone.now(), 'price': 100}
+
+
+def cursor_pages(queryset, per_page, ordering, model):
+    """Evaluate the first keyset page and one deep in the listing, as the views do."""
+    paginator = CursorPaginator(queryset, per_page, ordering)
+    list(paginator.page())
+    deep = model(pk=10 ** 6, **{paginator.field: CURSOR_VALUES[paginator.field]})
+    list(paginator.page(paginator.encode_cursor(deep, 'next')))
+
+
+def product_pages(**filters):
+    def run():
+        products, ordering = product_listing(**filters)
+        if ordering:
+            cursor_pages(products, PRODUCTS_PER_PAGE, ordering, Product)
+        list(Paginator(products, PRODUCTS_PER_PAGE).get_page(2))  # ?page= links
+    return run
+
+
+def delivery_pages(role, filters):
+    def run():
+        deliveries = filter_deliveries(listed_deliveries(USER, role), filters)
+        deliveries = deliveries.select_related('product', 'farmer', 'buyer', 'logistics_agent')
+        cursor_pages(deliveries, DELIVERIES_PER_PAGE, '-date_requested', DeliveryRequest)
+    return run
+
+
+# The hot views' queries, run through the same helpers the views list from
+QUERIES = {
+    'product_list newest': product_pages(),
+    'product_list price': product_pages(sort='price_low'),
+    'product_list category by price': product_pages(category='Tomato', sort='price_high'),
+    'dashboard my products': lambda: list(latest_products(farmer=USER)[:5]),
+    'dashboard marketplace': lambda: list(latest_products(exclude_farmer=USER)[:5]),
+    'dashboard unread count': lambda: unread_messages(USER).count(),
+    'inbox': lambda: list(inbox_messages(USER)),
+    'sent messages': lambda: list(sent_messages(USER)),
+    'logistics dashboard': lambda: (
+        list(assigned_deliveries(USER).filter(status='pending')[:20]),
+        list(Paginator(assigned_deliveries(USER), 10).get_page(1)),
+    ),
+    'pending deliveries': lambda: list(open_deliveries(USER)),
+    'route planning pool': lambda: list(unclaimed_deliveries().values_list('id', 'pickup_location', 'destination')),
+}
+
+# my_delivery_requests pages, for each role and each filter on its own
+DELIVERY_FILTERS = {
+    'all': {},
+    'status': {'status': 'pending'},
+    'date range': {'date_from': date(2025, 1, 1), 'date_to': date(2025, 3, 31)},
+    'pickup': {'pickup': 'Ibadan'},
+    'destination': {'destination': 'Ogbomosho'},
+}
+for _role in ('farmer', 'buyer', 'logistics'):
+    QUERIES[f'delivery listing {_role}'] = delivery_pages(_role, {})
+for _name, _filters in DELIVERY_FILTERS.items():
+    QUERIES[f'delivery listing {_name}'] = delivery_pages('logistics', _filters)
+
+# Full table scans and sorts that could not use an index
+FULL_SCAN_PATTERNS = {
+    'sqlite': [re.compile(r'\bSCAN (core_\w+)$'), re.compile(r'USE TEMP B-TREE FOR ORDER BY')],
+    'postgresql': [re.compile(r'Seq Scan on (core_\w+)'), re.compile(r'\bSort\b')],
+}
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute(f"EXPLAIN {sql}")
+        return [row[0] for row in cursor.fetchall()]
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot view queries and fail if any of them falls back to a full scan."
+
+    def handle(self, *args, **options):
+        patterns = FULL_SCAN_PATTERNS.get(connection.vendor)
+        if patterns is None:
+            raise CommandError(f"No plan checks defined for the {connection.vendor} backend.")
+
+        failures = []
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Small tables would otherwise always be seq-scanned
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            for name, run in QUERIES.items():
+                with CaptureQueriesContext(connection) as captured:
+                    run()
+                bad = [
+                    line for query in captured.captured_queries for line in explain(query['sql'])
+                    if any(p.search(line.strip()) for p in patterns)
+                ]
+                if bad:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f"{name}:\n    " + "\n    ".join(bad)))
+                else:
+                    self.stdout.write(f"{name}: ok ({len(captured)} queries)")
+
+        if failures:
+            raise CommandError(f"{len(failures)} queries fall back to a full scan: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("All query plans use an index."))
@@ -0,0 +1,67 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from core.images import forget_derivatives
+from core.storage import (
+    MEDIA_REFERENCES, collect, is_content_addressed, reference_count, select_media_storage,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move uploads with legacy names to content-addressed ones, so identical files are stored once, "
+        "then delete content-addressed files that no product or profile references."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--include-legacy', action='store_true',
+            help="Also delete unreferenced files with legacy (non content-addressed) names.",
+        )
+
+    def handle(self, *args, **options):
+        storage = select_media_storage()
+        moved, freed = 0, 0
+
+        for label, field_name in MEDIA_REFERENCES:
+            model = apps.get_model(label)
+            field = model._meta.get_field(field_name)
+            names = (
+                model._default_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+                .values_list(field_name, flat=True).distinct()
+            )
+            for name in list(names):
+                if is_content_addressed(name) or name == field.get_default():
+                    continue
+                if not storage.exists(name):
+                    self.stderr.write(f"{label}.{field_name}: missing file {name}")
+                    continue
+                with storage.open(name, 'rb') as fh:
+                    new_name = storage.save(name, fh)  # shared with any identical upload already stored
+                # A bulk rename: no model is re-saved, so the replaced name is released below instead
+                model._default_manager.filter(**{field_name: name}).update(**{field_name: new_name})
+                moved += 1
+                if not reference_count(name):
+                    forget_derivatives(name)
+                    storage.delete(name)
+                    freed += 1
+
+            directory = field.upload_to.rstrip('/')
+            for path in self.stored_files(storage, directory):
+                if is_content_addressed(path):
+                    freed += collect(path, storage)
+                elif options['include_legacy'] and path != field.get_default() and not reference_count(path):
+                    forget_derivatives(path)
+                    storage.delete(path)
+                    freed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Moved {moved} uploads to content-addressed names, deleted {freed} files."))
+
+    def stored_files(self, storage, directory):
+        if not storage.exists(directory):
+            return
+        subdirectories, files = storage.listdir(directory)
+        for name in files:
+            yield f"{directory}/{name}"
+        for subdirectory in subdirectories:
+            yield from self.stored_files(storage, f"{directory}/{subdirectory}")
@@ -0,0 +1,55 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from core.images import generate_derivatives
+from core.models import ImageDerivative, Product
+from users.models import Profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Build WebP/AVIF derivatives for every product image and profile photo that lacks them, "
+        "then report how many bytes a page showing each image at --width would download."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Rebuild images that already have derivatives.")
+        parser.add_argument('--width', type=int, default=640, help="Display width used for the page-weight report.")
+
+    def handle(self, *args, **options):
+        names = set(Product.objects.exclude(image='').exclude(image=None).values_list('image', flat=True))
+        names |= set(Profile.objects.exclude(photo='').exclude(photo=None).values_list('photo', flat=True))
+        if not options['force']:
+            names -= set(ImageDerivative.objects.filter(source__in=names).values_list('source', flat=True))
+
+        built = 0
+        for name in sorted(names):
+            try:
+                generate_derivatives(name)
+                built += 1
+            except (OSError, ValueError) as exc:
+                self.stderr.write(f"{name}: {exc}")
+        self.stdout.write(self.style.SUCCESS(f"Built derivatives for {built} images."))
+        self.report(options['width'])
+
+    def report(self, width):
+        # Compare originals with the derivative a browser would pick from the srcset at `width`
+        by_source = {}
+        for row in ImageDerivative.objects.order_by('width'):
+            by_source.setdefault(row.source, {}).setdefault(row.format, []).append(row)
+
+        original_bytes = 0
+        derivative_bytes = {}
+        for source, formats in by_source.items():
+            try:
+                original_bytes += default_storage.size(source)
+            except OSError:
+                continue
+            for fmt, rows in formats.items():
+                chosen = next((row for row in rows if row.width >= width), rows[-1])
+                derivative_bytes[fmt] = derivative_bytes.get(fmt, 0) + chosen.size
+
+        self.stdout.write(f"{len(by_source)} images, originals: {original_bytes / 1024:.0f} KiB")
+        for fmt, total in derivative_bytes.items():
+            saved = 100 - total * 100 / original_bytes if original_bytes else 0
+            self.stdout.write(f"  {fmt} at {width}px: {total / 1024:.0f} KiB ({saved:.0f}% smaller)")
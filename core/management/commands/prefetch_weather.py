@@ -0,0 +1,68 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.models import Product
+from core.weather import normalize_city, pop_stats, refresh_weather
+from users.models import Profile
+
+DEFAULT_CITY = "Ibadan"
+
+
+def active_locations():
+    """Distinct cities users and listings point at, deduplicated on the normalised name."""
+    values = chain(
+        [DEFAULT_CITY],
+        Profile.objects.exclude(location__isnull=True).values_list('location', flat=True).distinct(),
+        Profile.objects.exclude(city__isnull=True).values_list('city', flat=True).distinct(),
+        Product.objects.values_list('city', flat=True).distinct(),
+    )
+    cities = {}
+    for value in values:
+        key = normalize_city(value)
+        if key:
+            cities.setdefault(key, value.strip())
+    return list(cities.values())
+
+
+class Command(BaseCommand):
+    help = "Warm the weather cache for every city referenced by profiles and products."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help="Concurrent OpenWeather requests.")
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Seconds between refresh rounds; 0 runs a single round and exits.")
+
+    def handle(self, *args, **options):
+        if settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+            self.stderr.write(self.style.WARNING(
+                "The default cache is process-local; web workers will not see these results."))
+
+        while True:
+            self.refresh_round(options['workers'])
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def refresh_round(self, workers):
+        started = time.monotonic()
+        cities = active_locations()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(refresh_weather, cities))
+
+        refreshed = sum(1 for result in results if result is not None)
+        failed = [city for city, result in zip(cities, results) if result is None]
+        stats = pop_stats()
+        lookups = sum(stats.values())
+        hit_ratio = stats['hits'] / lookups if lookups else 0
+
+        self.stdout.write(
+            f"Refreshed {refreshed}/{len(cities)} cities in {time.monotonic() - started:.1f}s; "
+            f"{len(failed)} failed. View lookups since last round: {lookups} "
+            f"(hits {stats['hits']}, stale {stats['stale']}, misses {stats['misses']}, hit ratio {hit_ratio:.0%})."
+        )
+        if failed:
+            self.stdout.write(f"Unknown or unreachable: {', '.join(sorted(failed))}")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from core.models import Product
+from core.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the marketplace search index from every Product."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = rebuild_index(Product.objects.all(), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} products."))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.market import refresh_market_index
+
+
+class Command(BaseCommand):
+    help = "Recompute the weekly per-category and per-state market price index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Seconds between refreshes; 0 refreshes once and exits.")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            count = refresh_market_index()
+            self.stdout.write(f"Wrote {count} weekly index rows in {time.monotonic() - started:.1f}s.")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.deliveries import requote_deliveries
+from core.models import DeliveryRequest
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute delivery costs from the current gazetteer and tariff settings. Only pending "
+        "requests are re-quoted unless --status says otherwise, so accepted jobs keep their price."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', action='append', choices=[value for value, _label in DeliveryRequest.STATUS_CHOICES],
+                            help="Re-quote requests in this status (repeatable); default: pending.")
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        statuses = options['status'] or ['pending']
+        started = time.monotonic()
+        checked, changed = requote_deliveries(
+            DeliveryRequest.objects.filter(status__in=statuses), batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} delivery requests ({', '.join(statuses)}), updated {changed} "
+            f"in {time.monotonic() - started:.1f}s."
+        ))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.broadcast import CHUNK_SIZE, deliver_broadcast
+from core.models import Broadcast
+
+
+class Command(BaseCommand):
+    help = "Fan out pending broadcast messages to their recipients in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Seconds between polls for new broadcasts; 0 processes pending ones and exits.")
+
+    def handle(self, *args, **options):
+        while True:
+            for broadcast in Broadcast.objects.filter(completed_at__isnull=True).order_by('created_at'):
+                deliver_broadcast(broadcast, options['chunk_size'], progress=self.report)
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def report(self, broadcast):
+        self.stdout.write(
+            f"Broadcast #{broadcast.pk}: {broadcast.delivered_count}/{broadcast.recipient_count} "
+            f"delivered ({broadcast.progress}%)"
+        )
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.mailqueue import send_queued_mail
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbound email in batches, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Seconds to wait when the queue is empty; 0 drains it once and exits.")
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = send_queued_mail(options['batch_size'])
+            if sent or failed:
+                self.stdout.write(f"Sent {sent} emails; {failed} failed.")
+                continue
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
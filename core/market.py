@@ -0,0 +1,112 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Avg, Count, F, Max, Min, Value, Window
+from django.db.models.functions import FirstValue, TruncWeek
+from django.db.models.expressions import RowRange
+
+from .instrumentation import record_cache
+from .models import MarketPriceIndex, PriceHistory
+
+MOVING_WINDOW_WEEKS = 4
+CACHE_TTL = 60 * 60
+CENTS = Decimal('0.01')
+
+
+def _weekly_aggregates():
+    """Weekly price aggregates per (category, state) and per category nationwide, computed in the database."""
+    weekly = PriceHistory.objects.annotate(week=TruncWeek('date_recorded'))
+    aggregates = dict(mean=Avg('price'), low=Min('price'), high=Max('price'), samples=Count('id'))
+    by_state = weekly.values('week', category=F('product__category'), state=F('product__state')).annotate(**aggregates)
+    nationwide = weekly.values('week', category=F('product__category'), state=Value('')).annotate(**aggregates)
+    return by_state.union(nationwide, all=True)
+
+
+def _decimal(value):
+    return Decimal(str(value)).quantize(CENTS)
+
+
+def refresh_market_index():
+    """Rebuild the MarketPriceIndex table; returns the number of weekly rows written."""
+    with transaction.atomic():
+        MarketPriceIndex.objects.all().delete()
+        rows = MarketPriceIndex.objects.bulk_create([
+            MarketPriceIndex(
+                category=row['category'],
+                state=row['state'],
+                week_start=row['week'].date(),
+                mean_price=_decimal(row['mean']),
+                min_price=row['low'],
+                max_price=row['high'],
+                sample_count=row['samples'],
+            )
+            for row in _weekly_aggregates()
+        ], batch_size=500)
+
+        _derive_columns()
+
+    # New version number retires every cached series at once
+    try:
+        cache.incr('market_index:version')
+    except ValueError:
+        cache.set('market_index:version', 2, None)
+    return len(rows)
+
+
+def _derive_columns():
+    """
+    Fill in the moving average, rolling volatility and index of every row with one
+    UPDATE ... FROM the window functions over the summary, without loading any rows.
+    """
+    series = dict(partition_by=[F('category'), F('state')], order_by=F('week_start').asc())
+    window = dict(series, frame=RowRange(start=-(MOVING_WINDOW_WEEKS - 1), end=0))
+    derived = MarketPriceIndex.objects.annotate(
+        window_mean=Window(Avg('mean_price'), **window),
+        window_mean_sq=Window(Avg(F('mean_price') * F('mean_price')), **window),
+        base_price=Window(FirstValue('mean_price'), **series),
+    ).values('id', 'window_mean', 'window_mean_sq', 'base_price')
+    sql, params = derived.query.sql_with_params()
+    table = connection.ops.quote_name(MarketPriceIndex._meta.db_table)
+    # Volatility is the coefficient of variation over the window; rounding can leave
+    # the variance a hair below zero. 100.0 keeps SQLite off integer division
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            UPDATE {table} SET
+                moving_average = ROUND(derived.window_mean, 2),
+                volatility = CASE WHEN derived.window_mean > 0 THEN SQRT(CASE
+                    WHEN derived.window_mean_sq > derived.window_mean * derived.window_mean
+                    THEN derived.window_mean_sq - derived.window_mean * derived.window_mean ELSE 0 END
+                ) / derived.window_mean END,
+                index_value = CASE WHEN derived.base_price > 0 THEN {table}.mean_price * 100.0 / derived.base_price END
+            FROM ({sql}) AS derived
+            WHERE {table}.id = derived.id
+        """, params)
+
+
+def market_series(category=None, state=''):
+    """Weekly index points for a category (or all categories) in a state ('' = nationwide), cached."""
+    version = cache.get_or_set('market_index:version', 1, None)
+    key = f"market_index:{version}:{category or '*'}:{state.lower().replace(' ', '_')}"
+    series = cache.get(key)
+    record_cache('market_series', series is not None)
+    if series is None:
+        rows = MarketPriceIndex.objects.filter(state__iexact=state).order_by('category', 'week_start')
+        if category:
+            rows = rows.filter(category=category)
+        series = [
+            {
+                'category': row.category,
+                'week': row.week_start.isoformat(),
+                'mean': float(row.mean_price),
+                'min': float(row.min_price),
+                'max': float(row.max_price),
+                'samples': row.sample_count,
+                'moving_average': float(row.moving_average) if row.moving_average is not None else None,
+                'index': row.index_value,
+                'volatility': row.volatility,
+            }
+            for row in rows
+        ]
+        cache.set(key, series, CACHE_TTL)
+    return series
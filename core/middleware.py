@@ -0,0 +1,47 @@
+from . import instrumentation
+
+
+class InstrumentationMiddleware:
+    """
+    Times each request and its database, OpenWeather and cache work, reports the
+    breakdown in a Server-Timing header and adds it to the per-view histograms
+    served by the metrics view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics, token = instrumentation.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.finish_request(token)
+        return self._finish(request, response, metrics)
+
+    def _finish(self, request, response, metrics):
+        match = getattr(request, 'resolver_match', None)
+        # URL names keep the label set small; unmatched paths share one label
+        view = (match.view_name if match else '') or 'unresolved'
+        response['Server-Timing'] = metrics.server_timing()
+        instrumentation.registry.observe(view, metrics)
+        return response
+
+
+class SyncChainMiddleware:
+    """
+    Sync-only, and last in MIDDLEWARE, so that under ASGI Django runs the whole
+    middleware chain and sync views in one thread per request. Otherwise each of
+    Django's MiddlewareMixin middlewares moves every request to a thread and back,
+    once for process_request and again for process_response, which costs more
+    than the rest of a cached dashboard. Async views such as delivery_events still
+    run on the event loop.
+    """
+    sync_capable = True
+    async_capable = False
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
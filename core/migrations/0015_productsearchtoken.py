@@ -0,0 +1,60 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:55
+
+import re
+import unicodedata
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# core.search's tokenizer as it was when this migration was written; kept here so later
+# changes to the app code can't change what the migration does
+FIELD_WEIGHTS = {'title': 5, 'category': 3, 'city': 2, 'state': 2, 'description': 1}
+TOKEN_MAX_LENGTH = 50
+WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+    return [token[:TOKEN_MAX_LENGTH] for token in WORD_RE.findall(stripped)]
+
+
+def build_search_index(apps, schema_editor):
+    Product = apps.get_model('core', 'Product')
+    ProductSearchToken = apps.get_model('core', 'ProductSearchToken')
+    entries = []
+    for product in Product.objects.iterator(chunk_size=500):
+        for field, field_weight in FIELD_WEIGHTS.items():
+            for token, occurrences in Counter(tokenize(getattr(product, field))).items():
+                entries.append(ProductSearchToken(
+                    product_id=product.pk, field=field, token=token, weight=field_weight * occurrences,
+                ))
+        if len(entries) >= 500:
+            ProductSearchToken.objects.bulk_create(entries)
+            entries = []
+    ProductSearchToken.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_deliveryrequest_delivery_cost'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=20)),
+                ('token', models.CharField(max_length=50)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='core.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'product'], name='core_search_token_idx')],
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
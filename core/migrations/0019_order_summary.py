@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_order_summaries(apps, schema_editor):
+    Order = apps.get_model('core', 'Order')
+    orders = list(Order.objects.prefetch_related('items__product'))
+    for order in orders:
+        items = list(order.items.all())
+        order.item_count = sum(item.quantity for item in items)
+    Order.objects.bulk_update(orders, ['item_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['buyer', '-created_at'], name='core_order_buyer_idx'),
+        ),
+        migrations.RunPython(backfill_order_summaries, migrations.RunPython.noop),
+    ]
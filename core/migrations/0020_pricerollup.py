@@ -0,0 +1,71 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:03
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+# core.price_history's bucketing as it was when this migration was written; kept here so
+# later changes to the app code can't change what the migration does
+PERIODS = ('day', 'week', 'month')
+
+
+def bucket_start(period, moment):
+    day = timezone.localdate(moment) if timezone.is_aware(moment) else moment.date()
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def build_price_rollups(apps, schema_editor):
+    PriceHistory = apps.get_model('core', 'PriceHistory')
+    PriceRollup = apps.get_model('core', 'PriceRollup')
+    rollups = {}
+    for entry in PriceHistory.objects.order_by('date_recorded', 'id').iterator():
+        for period in PERIODS:
+            key = (entry.product_id, period, bucket_start(period, entry.date_recorded))
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollups[key] = PriceRollup(
+                    product_id=entry.product_id, period=period, period_start=key[2],
+                    min_price=entry.price, max_price=entry.price, price_sum=entry.price,
+                    sample_count=1, last_price=entry.price,
+                )
+            else:
+                rollup.min_price = min(rollup.min_price, entry.price)
+                rollup.max_price = max(rollup.max_price, entry.price)
+                rollup.price_sum += entry.price
+                rollup.sample_count += 1
+                rollup.last_price = entry.price
+    PriceRollup.objects.bulk_create(rollups.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_order_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('last_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('price_sum', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_rollups', to='core.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'period', 'period_start'), name='core_price_rollup_unique')],
+            },
+        ),
+        migrations.RunPython(build_price_rollups, migrations.RunPython.noop),
+    ]
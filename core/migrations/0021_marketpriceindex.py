@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_pricerollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketPriceIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('Tomato', 'Tomato'), ('Maize', 'Maize'), ('Pepper', 'Pepper'), ('Yam', 'Yam'), ('Cassava', 'Cassava'), ('Rice', 'Rice'), ('Okra', 'Okra'), ('Onion', 'Onion'), ('Cucumber', 'Cucumber'), ('Carrot', 'Carrot'), ('Eggplant', 'Eggplant'), ('Watermelon', 'Watermelon')], max_length=20)),
+                ('state', models.CharField(blank=True, max_length=100)),
+                ('week_start', models.DateField()),
+                ('mean_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('sample_count', models.PositiveIntegerField()),
+                ('moving_average', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('index_value', models.FloatField(blank=True, null=True)),
+                ('volatility', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('category', 'state', 'week_start'), name='core_market_index_unique')],
+            },
+        ),
+    ]
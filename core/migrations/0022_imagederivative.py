@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_marketpriceindex'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageDerivative',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255)),
+                ('source_digest', models.CharField(max_length=64)),
+                ('width', models.PositiveIntegerField()),
+                ('format', models.CharField(max_length=5)),
+                ('name', models.CharField(max_length=255)),
+                ('size', models.PositiveIntegerField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('source', 'format', 'width'), name='core_image_derivative_unique')],
+            },
+        ),
+    ]
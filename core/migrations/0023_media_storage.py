@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:10
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_imagederivative'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.select_media_storage, upload_to='product_images/'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:33
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_media_storage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deliveryrequest',
+            index=models.Index(fields=['-date_requested', '-id'], name='core_delivery_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryrequest',
+            index=models.Index(fields=['status', '-date_requested', '-id'], name='core_delivery_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryrequest',
+            index=models.Index(fields=['farmer', '-date_requested', '-id'], name='core_delivery_farmer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryrequest',
+            index=models.Index(fields=['buyer', '-date_requested', '-id'], name='core_delivery_buyer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryrequest',
+            index=models.Index(django.db.models.functions.text.Lower('pickup_location'), models.OrderBy(models.F('date_requested'), descending=True), models.OrderBy(models.F('id'), descending=True), name='core_delivery_pickup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryrequest',
+            index=models.Index(django.db.models.functions.text.Lower('destination'), models.OrderBy(models.F('date_requested'), descending=True), models.OrderBy(models.F('id'), descending=True), name='core_delivery_dest_idx'),
+        ),
+    ]
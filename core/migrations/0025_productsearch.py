@@ -0,0 +1,87 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:47
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# core.search's index layout and text folding as they were when this migration was
+# written; kept here so later changes to the app code can't change what it does
+FIELDS = ('title', 'description', 'city', 'state', 'category')
+CREATE_SQL = {
+    # Prefix indexes for the lengths searched words usually are, so "fresh"* is a lookup
+    # rather than a scan of every term after "fresh"
+    'sqlite': [
+        "CREATE VIRTUAL TABLE core_productsearch USING fts5("
+        "title, description, city, state, category, tokenize = 'unicode61', prefix = '2 3 4 5 6 7 8')",
+    ],
+    'postgresql': [
+        "CREATE TABLE core_productsearch ("
+        "rowid bigint PRIMARY KEY REFERENCES core_product (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+        "core_productsearch tsvector NOT NULL)",
+        "CREATE INDEX core_productsearch_gin ON core_productsearch USING gin (core_productsearch)",
+    ],
+}
+INSERT_SQL = {
+    'sqlite': (
+        "INSERT INTO core_productsearch (rowid, title, description, city, state, category) "
+        "VALUES (%s, %s, %s, %s, %s, %s)"
+    ),
+    'postgresql': (
+        "INSERT INTO core_productsearch (rowid, core_productsearch) VALUES (%s, "
+        + " || ".join(f"setweight(to_tsvector('simple', %s), '{label}')" for label in 'ADCCB')
+        + ")"
+    ),
+}
+WORD_RE = re.compile(r'[^\W_]+')
+
+
+def fold(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+    return ' '.join(WORD_RE.findall(stripped))
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in CREATE_SQL:
+        raise RuntimeError(f"Product search needs SQLite or PostgreSQL, not {vendor}.")
+    for sql in CREATE_SQL[vendor]:
+        schema_editor.execute(sql)
+    Product = apps.get_model('core', 'Product')
+    documents = [
+        [product.pk, *(fold(getattr(product, field)) for field in FIELDS)]
+        for product in Product.objects.only(*FIELDS).iterator(chunk_size=500)
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(INSERT_SQL[vendor], documents)
+
+
+def drop_search_index(apps, schema_editor):
+    schema_editor.execute("DROP TABLE core_productsearch")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_delivery_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearch',
+            fields=[
+                ('product', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search', serialize=False, to='core.product')),
+                ('document', models.TextField(db_column='core_productsearch')),
+            ],
+            options={
+                'db_table': 'core_productsearch',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.DeleteModel(
+            name='ProductSearchToken',
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from .storage import select_media_storage
 
 # Create your models here.
 CROP_CHOICES = [
@@ -35,20 +39,148 @@ class Product(models.Model):
     city = models.CharField(max_length=100)
     state = models.CharField(max_length=100, default="Oyo State")
     category = models.CharField(max_length=20, choices=CROP_CHOICES, default='Tomato') 
-    image = models.ImageField(upload_to='product_images/', blank=True, null=True)
+    image = models.ImageField(upload_to='product_images/', storage=select_media_storage, blank=True, null=True)
     date_posted = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Marketplace sorts and keyset pagination (id is the tiebreaker)
+            models.Index(fields=['-date_posted', '-id'], name='core_product_posted_idx'),
+            models.Index(fields=['price', 'id'], name='core_product_price_idx'),
+            models.Index(fields=['category', 'price'], name='core_product_cat_price_idx'),
+            # Farmer dashboard: latest listings per farmer
+            models.Index(fields=['farmer', '-date_posted'], name='core_product_farmer_idx'),
+        ]
+
     def __str__(self):
         return self.title
-    
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_price = instance.__dict__.get('price')  # lets save() spot price changes without a SELECT
+        return instance
+
     def save(self, *args, **kwargs):
+        price_changed = False
         if self.pk:  # only check if this product already exists
-            old_price = Product.objects.get(pk=self.pk).price
-            if self.price != old_price:
-                from .models import PriceHistory  # local import to avoid circular reference
-                PriceHistory.objects.create(product=self, price=self.price)
+            old_price = getattr(self, '_loaded_price', None)
+            if old_price is None:  # not loaded from the database, or price was deferred
+                old_price = Product.objects.filter(pk=self.pk).values_list('price', flat=True).first()
+            price_changed = old_price is not None and self.price != old_price
         super().save(*args, **kwargs)
-    
+        if price_changed:
+            from .price_history import record_price  # local import to avoid circular reference
+            record_price(self, self.price)
+        self._loaded_price = self.price
+
+class PriceRollup(models.Model):
+    # Day/week/month aggregates of PriceHistory, maintained by core.price_history.record_price
+    PERIOD_CHOICES = [
+        ('day', 'Day'),
+        ('week', 'Week'),
+        ('month', 'Month'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_rollups')
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    min_price = models.DecimalField(max_digits=10, decimal_places=2)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2)
+    last_price = models.DecimalField(max_digits=10, decimal_places=2)
+    price_sum = models.DecimalField(max_digits=16, decimal_places=2)
+    sample_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'period', 'period_start'], name='core_price_rollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.period} {self.period_start}: {self.last_price}"
+
+    @property
+    def mean(self):
+        return self.price_sum / self.sample_count if self.sample_count else self.last_price
+
+class MarketPriceIndex(models.Model):
+    # Weekly per-category price summary, materialised by core.market.refresh_market_index.
+    # An empty state holds the nationwide series for the category.
+    category = models.CharField(max_length=20, choices=CROP_CHOICES)
+    state = models.CharField(max_length=100, blank=True)
+    week_start = models.DateField()
+    mean_price = models.DecimalField(max_digits=10, decimal_places=2)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2)
+    sample_count = models.PositiveIntegerField()
+    moving_average = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    index_value = models.FloatField(null=True, blank=True)  # mean price vs. the series' first week (= 100)
+    volatility = models.FloatField(null=True, blank=True)  # coefficient of variation over the moving window
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'state', 'week_start'], name='core_market_index_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.category} {self.state or 'all states'} {self.week_start}: {self.mean_price}"
+
+class ProductSearch(models.Model):
+    # The database's full-text index of a product (see core.search), written by core.signals.
+    # Created by migration 0025 rather than from this model: FTS5 on SQLite, tsvector on PostgreSQL
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, db_column='rowid', related_name='search')
+    # FTS5 matches and ranks against the hidden column named after the table
+    document = models.TextField(db_column='core_productsearch')
+
+    class Meta:
+        managed = False
+        db_table = 'core_productsearch'
+
+    def __str__(self):
+        return f"search index of {self.product_id}"
+
+class ImageDerivative(models.Model):
+    # Resized WebP/AVIF copy of an uploaded image, built by core.images
+    source = models.CharField(max_length=255)  # storage name of the original upload
+    source_digest = models.CharField(max_length=64)
+    width = models.PositiveIntegerField()
+    format = models.CharField(max_length=5)
+    name = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'format', 'width'], name='core_image_derivative_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} {self.width}w {self.format}"
+
+class Broadcast(models.Model):
+    # A "send to all users" message; core.broadcast fans it out into per-user Message rows
+    sender = models.ForeignKey(User, related_name='broadcasts', on_delete=models.CASCADE)
+    subject = models.CharField(max_length=255, default="No Subject")
+    body = models.TextField()
+    recipient_count = models.PositiveIntegerField(default=0)
+    delivered_count = models.PositiveIntegerField(default=0)
+    # Recipients are walked in id order up to the highest user id when the broadcast started
+    last_recipient_id = models.BigIntegerField(default=0)
+    max_recipient_id = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Broadcast from {self.sender}: {self.delivered_count}/{self.recipient_count}"
+
+    @property
+    def progress(self):
+        if not self.recipient_count:
+            return 100
+        return self.delivered_count * 100 // self.recipient_count
+
 class Message(models.Model):
     sender = models.ForeignKey(User, related_name='sent_messages', on_delete=models.CASCADE)
     recipient = models.ForeignKey(User, related_name='received_messages', on_delete=models.CASCADE)
@@ -56,21 +188,28 @@ class Message(models.Model):
     body = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
+    broadcast = models.ForeignKey(Broadcast, related_name='messages', on_delete=models.SET_NULL, null=True, blank=True)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['recipient', '-timestamp'], name='core_message_inbox_idx'),
+            models.Index(fields=['sender', '-timestamp'], name='core_message_sent_idx'),
+            # Unread counters only ever look at unread rows
+            models.Index(fields=['recipient', 'is_read'], name='core_message_unread_idx', condition=models.Q(is_read=False)),
+        ]
 
     def __str__(self):
         return f"From {self.sender} to {self.recipient}: {self.body[:30]}"
  
 class DeliveryRequest(models.Model):
     STATUS_CHOICES = [
-        ('pending', 'Pending'),
-        ('accepted', 'Accepted'),
-        ('in_transit', 'In Transit'),
-        ('delivered', 'Delivered'),
-        ('cancelled', 'Cancelled'),
-    ] 
+        ('pending', _('Pending')),
+        ('accepted', _('Accepted')),
+        ('in_transit', _('In Transit')),
+        ('delivered', _('Delivered')),
+        ('cancelled', _('Cancelled')),
+    ]
     
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     buyer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="buyer_delivery_requests")
@@ -83,16 +222,43 @@ class DeliveryRequest(models.Model):
     requested_for_group = models.BooleanField(default=False)
     date_requested = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Per-agent status lookups; with logistics_agent IS NULL it also serves the unclaimed pool, newest first
+            models.Index(fields=['logistics_agent', 'status', '-date_requested'], name='core_delivery_agent_idx'),
+            # Keyset-paginated delivery listings (newest first, id as tiebreaker), one per filter
+            models.Index(fields=['-date_requested', '-id'], name='core_delivery_date_idx'),
+            models.Index(fields=['status', '-date_requested', '-id'], name='core_delivery_status_idx'),
+            models.Index(fields=['farmer', '-date_requested', '-id'], name='core_delivery_farmer_idx'),
+            models.Index(fields=['buyer', '-date_requested', '-id'], name='core_delivery_buyer_idx'),
+            models.Index(Lower('pickup_location'), F('date_requested').desc(), F('id').desc(), name='core_delivery_pickup_idx'),
+            models.Index(Lower('destination'), F('date_requested').desc(), F('id').desc(), name='core_delivery_dest_idx'),
+        ]
+
     def calculate_delivery_cost(self):
-        # Fake cost calculation: ₦100 per km (simulate distance as random for prototype)
-        import random
-        distance_km = random.randint(1, 50)
-        self.delivery_cost = distance_km * 100
-        self.save()
+        # Quoted from the distance between the two locations; stays empty if either can't be placed
+        from .deliveries import quote
+        self.delivery_cost = quote(self.pickup_location, self.destination)
+
+    def save(self, *args, **kwargs):
+        # New requests are quoted in the same INSERT; requote_deliveries refreshes existing ones
+        if self._state.adding and self.delivery_cost is None:
+            self.calculate_delivery_cost()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Delivery for {self.product.title} - {self.status}"    
 
+class DeliveryEvent(models.Model):
+    # A delivery change waiting to be pushed to one user's open event streams (core.events).
+    # Every worker polls this table, so the change reaches streams held by any of them
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.payload} for {self.recipient_id}"
+
 class CartItem(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cart_items')
     product = models.ForeignKey('Product', on_delete=models.CASCADE)
@@ -112,6 +278,13 @@ class Order(models.Model):
     buyer = models.ForeignKey(User, on_delete=models.CASCADE)
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Taken at checkout so the order header doesn't need to add up the items
+    item_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['buyer', '-created_at'], name='core_order_buyer_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} by {self.buyer.username}"
@@ -124,4 +297,39 @@ class OrderItem(models.Model):
 
     def get_total_price(self):
         return self.quantity * self.price
-    
\ No newline at end of file
+
+class OutboundEmail(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipient = models.EmailField()
+    # Hash of reference/recipient/subject/body; the same mail about the same thing (e.g. one
+    # order) can only be queued once while pending
+    dedupe_key = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=models.Q(status='pending'),
+                name='core_outbound_email_pending_dedupe',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='core_outbound_email_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.recipient} ({self.status})"
@@ -0,0 +1,109 @@
+import hashlib
+import re
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils import translation
+
+from .instrumentation import record_cache
+
+CATALOG_VERSION_KEY = 'catalog:version'
+# Invalidation only reaches the cache it runs against. With a process-local cache the other
+# workers keep retired pages and cards until they expire, so there they are kept only briefly
+LOCAL_PAGE_CACHE_TTL = 30
+PRODUCT_CARD_FRAGMENT = 'product_card'
+# Every page carries the language switcher's CSRF token; cached copies hold a placeholder
+# that is swapped for the visitor's own token on the way out
+_CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+_CSRF_PLACEHOLDER = '__csrf_token__'
+
+
+def catalog_version():
+    return cache.get_or_set(CATALOG_VERSION_KEY, 1, None)
+
+
+def cache_ttl(ttl):
+    """``ttl``, cut to LOCAL_PAGE_CACHE_TTL when the cache is process-local."""
+    if settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+        return min(ttl, LOCAL_PAGE_CACHE_TTL)
+    return ttl
+
+
+def invalidate_product_pages(*product_ids):
+    """Retire cached marketplace pages, and the card fragments of ``product_ids``."""
+    # New version number retires every cached page at once
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, 2, None)
+    cache.delete_many([
+        make_template_fragment_key(PRODUCT_CARD_FRAGMENT, [product_id, language, can_add_to_cart])
+        for product_id in product_ids
+        for language, _name in settings.LANGUAGES
+        for can_add_to_cart in (True, False)
+    ])
+
+
+def _has_messages(request):
+    storage = get_messages(request)
+    pending = bool(list(storage))
+    storage.used = False  # looking must not consume them
+    return pending
+
+
+def _page_key(request, user, view_name, params, version):
+    if request.method not in ('GET', 'HEAD') or user.is_authenticated:
+        return None
+    if any(name not in params for name in request.GET):
+        return None  # unexpected parameters could otherwise fill the cache with one-off pages
+    if _has_messages(request):
+        return None
+    query = urlencode(sorted((name, value.strip()) for name, value in request.GET.items() if value.strip()))
+    digest = hashlib.md5(query.encode()).hexdigest()
+    return f"page:{view_name}:{version}:{translation.get_language()}:{digest}"
+
+
+def _cached_response(request, cached):
+    content = cached['content'].replace(_CSRF_PLACEHOLDER, get_token(request))
+    return HttpResponse(content, content_type=cached['content_type'])
+
+
+def _cache_entry(response):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return None
+    content = _CSRF_INPUT_RE.sub(rf'\g<1>{_CSRF_PLACEHOLDER}\g<2>', response.content.decode(response.charset))
+    return {'content': content, 'content_type': response['Content-Type']}
+
+
+def cache_anonymous_page(params=(), timeout=None):
+    """
+    Cache a view's whole response for anonymous visitors, keyed on the view, the
+    catalog version, the active language and the normalised values of ``params``.
+    Requests with any other query parameter, signed-in users and pending messages
+    bypass the cache.
+    """
+    def decorator(view):
+        view_name = f"{view.__module__}.{view.__name__}"
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            key = _page_key(request, request.user, view_name, params, catalog_version())
+            if key is None:
+                return view(request, *args, **kwargs)
+            cached = cache.get(key)
+            record_cache('page', cached is not None)
+            if cached is not None:
+                return _cached_response(request, cached)
+            response = view(request, *args, **kwargs)
+            entry = _cache_entry(response)
+            if entry:
+                cache.set(key, entry, cache_ttl(settings.PAGE_CACHE_TTL if timeout is None else timeout))
+            return response
+        return wrapped
+    return decorator
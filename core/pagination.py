@@ -0,0 +1,100 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def keyset_ordering(ordering, reverse=False):
+    """``ordering`` with ``id`` as tiebreaker in the same direction, optionally reversed."""
+    descending = ordering.startswith('-') != reverse
+    prefix = '-' if descending else ''
+    field = ordering.lstrip('-')
+    return (f'{prefix}{field}', f'{prefix}id')
+
+
+class CursorPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator:
+    """
+    Keyset pagination over ``ordering`` (e.g. '-date_posted') with ``id`` as the
+    tiebreaker. Each page is a single indexed range query: no COUNT(*) and no OFFSET,
+    so page 500 costs the same as page 1.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.ordering = ordering
+        self.per_page = per_page
+        self.descending = ordering.startswith('-')
+        self.field = ordering.lstrip('-')
+        self.model_field = queryset.model._meta.get_field(self.field)
+
+    def _after(self, value, pk, reverse):
+        # Rows strictly past (value, pk) in the (possibly reversed) ordering. The redundant
+        # outer bound gives the planner one index range to walk in order; on the bare OR,
+        # SQLite looks up both branches separately and sorts everything they match
+        descending = self.descending != reverse
+        op = 'lt' if descending else 'gt'
+        return Q(**{f'{self.field}__{op}e': value}) & (
+            Q(**{f'{self.field}__{op}': value}) | Q(**{self.field: value, f'id__{op}': pk})
+        )
+
+    def encode_cursor(self, obj, direction):
+        value = self.model_field.value_to_string(obj)
+        payload = json.dumps([direction, value, obj.pk]).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, value, pk = json.loads(base64.urlsafe_b64decode(padded))
+            value = self.model_field.to_python(value)
+            if value is None:
+                return None  # the ordering fields are never null; a None would compare with nothing
+            return direction, value, int(pk)
+        except (ValueError, TypeError, OverflowError, binascii.Error, ValidationError):
+            return None
+
+    def page(self, cursor=None):
+        decoded = self.decode_cursor(cursor) if cursor else None
+        reverse = bool(decoded) and decoded[0] == 'prev'
+
+        queryset = self.queryset.order_by(*keyset_ordering(self.ordering, reverse))
+        if decoded:
+            queryset = queryset.filter(self._after(decoded[1], decoded[2], reverse))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+        if not rows:
+            return CursorPage(rows)
+
+        # Coming backwards there is always a next page; going forwards, a previous one unless we started at the top
+        has_next = has_more if not reverse else True
+        has_previous = has_more if reverse else bool(decoded)
+        return CursorPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1], 'next') if has_next else None,
+            previous_cursor=self.encode_cursor(rows[0], 'prev') if has_previous else None,
+        )
@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+PERIODS = ('day', 'week', 'month')
+DEFAULT_POINTS = 120
+MAX_POINTS = 500
+
+
+def bucket_start(period, moment):
+    """First day of the day/week/month bucket containing ``moment``."""
+    day = timezone.localdate(moment) if timezone.is_aware(moment) else moment.date()
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def add_to_rollup(rollup, price):
+    rollup.min_price = min(rollup.min_price, price)
+    rollup.max_price = max(rollup.max_price, price)
+    rollup.price_sum += price
+    rollup.sample_count += 1
+    rollup.last_price = price
+
+
+def record_price(product, price):
+    """Append a price point and fold it into the product's day/week/month rollups."""
+    from .models import PriceHistory, PriceRollup
+
+    with transaction.atomic():
+        entry = PriceHistory.objects.create(product=product, price=price)
+        for period in PERIODS:
+            rollup, created = PriceRollup.objects.select_for_update().get_or_create(
+                product=product,
+                period=period,
+                period_start=bucket_start(period, entry.date_recorded),
+                defaults={
+                    'min_price': price,
+                    'max_price': price,
+                    'price_sum': price,
+                    'sample_count': 1,
+                    'last_price': price,
+                },
+            )
+            if not created:
+                add_to_rollup(rollup, price)
+                rollup.save()
+    return entry
+
+
+def price_series(product_id, max_points=DEFAULT_POINTS):
+    """
+    The product's price series with at most ``max_points`` points: raw history when
+    it is short enough, otherwise the finest rollup that fits, thinned if even the
+    monthly rollup is too long.
+    """
+    from .models import PriceHistory, PriceRollup
+
+    history = PriceHistory.objects.filter(product_id=product_id)
+    if history.count() <= max_points:
+        return {
+            'granularity': 'raw',
+            'points': [
+                {'t': entry.date_recorded.isoformat(), 'price': float(entry.price)}
+                for entry in history.order_by('date_recorded')
+            ],
+        }
+
+    rollups = PriceRollup.objects.filter(product_id=product_id)
+    counts = dict(rollups.values_list('period').annotate(n=Count('id')))
+    period = next((p for p in PERIODS if counts.get(p, 0) <= max_points), 'month')
+    rows = list(rollups.filter(period=period).order_by('period_start'))
+    if len(rows) > max_points:
+        step = -(-len(rows) // max_points)
+        rows = rows[::step]
+    return {
+        'granularity': period,
+        'points': [
+            {
+                't': row.period_start.isoformat(),
+                'price': float(row.last_price),
+                'min': float(row.min_price),
+                'max': float(row.max_price),
+                'mean': float(row.mean),
+            }
+            for row in rows
+        ],
+    }
@@ -0,0 +1,97 @@
+from django.db.models import Q
+
+from .models import DeliveryRequest, Message, Product
+from .pagination import keyset_ordering
+from .search import search_products
+
+# Querysets behind the busiest pages. The views list from these and `manage.py
+# check_query_plans` EXPLAINs the same calls, so a change here is plan-checked as shipped.
+
+PRODUCTS_PER_PAGE = 6
+DELIVERIES_PER_PAGE = 25
+
+SORT_ORDERINGS = {
+    'newest': '-date_posted',
+    'oldest': 'date_posted',
+    'price_low': 'price',
+    'price_high': '-price',
+}
+
+
+def product_listing(query=None, location=None, min_price=None, max_price=None, category=None, sort=None):
+    """
+    Marketplace products matching the list filters, and the field they are sorted
+    on (with id as tiebreaker, in the order keyset pages use); the field is None for
+    search results ranked by relevance.
+    """
+    filters = Q()
+    if min_price:
+        filters &= Q(price__gte=min_price)
+    if max_price:
+        filters &= Q(price__lte=max_price)
+    if category:
+        filters &= Q(category=category)
+
+    products = Product.objects.filter(filters)
+    if query or location:
+        products = search_products(products, query, location)  # indexed search over title, description, location, category
+
+    ordering = SORT_ORDERINGS.get(sort)
+    if ordering is None and (query or location):
+        return products.order_by('-relevance', '-date_posted'), None  # best matches first
+    ordering = ordering or '-date_posted'  # default
+    return products.order_by(*keyset_ordering(ordering)), ordering
+
+
+def latest_products(farmer=None, exclude_farmer=None):
+    """Newest listings first, of one farmer or of everyone but one."""
+    products = Product.objects.all()
+    if farmer is not None:
+        products = products.filter(farmer=farmer)
+    if exclude_farmer is not None:
+        products = products.exclude(farmer=exclude_farmer).select_related('farmer')
+    return products.order_by('-date_posted')
+
+
+def inbox_messages(user):
+    return Message.objects.filter(recipient=user)
+
+
+def unread_messages(user):
+    return Message.objects.filter(recipient=user, is_read=False)
+
+
+def sent_messages(user):
+    # Broadcast copies are summarised once per broadcast rather than listed per recipient
+    return Message.objects.filter(sender=user, broadcast__isnull=True).select_related('recipient').order_by('-timestamp')
+
+
+def listed_deliveries(user, role):
+    """The deliveries ``user`` may list in the given role; None for roles without a listing."""
+    if role == 'farmer':
+        return DeliveryRequest.objects.filter(farmer=user)
+    if role == 'buyer':
+        return DeliveryRequest.objects.filter(buyer=user)
+    if role == 'logistics':
+        return DeliveryRequest.objects.all()  # logistics sees all
+    return None
+
+
+def assigned_deliveries(agent):
+    return (
+        DeliveryRequest.objects.filter(logistics_agent=agent)
+        .select_related('product', 'farmer', 'buyer')
+        .order_by('-date_requested')
+    )
+
+
+def open_deliveries(agent):
+    """What an agent can work on: their unfinished deliveries and every pending one."""
+    return (
+        DeliveryRequest.objects.filter(logistics_agent=agent).exclude(status__in=['delivered', 'cancelled'])
+        | DeliveryRequest.objects.filter(status='pending')
+    ).distinct()
+
+
+def unclaimed_deliveries():
+    return DeliveryRequest.objects.filter(status='pending', logistics_agent__isnull=True)
@@ -0,0 +1,249 @@
+import math
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+
+from .geocoding import geocode, haversine_km
+from .instrumentation import record_cache
+from .queries import unclaimed_deliveries
+
+PLAN_CACHE_KEY = 'route_plan'
+GENERATION_KEY = 'route_plan:generation'
+BUILD_LOCK_TTL = 60
+KM_PER_DEGREE = 111.32
+
+Job = namedtuple('Job', 'id pickup destination pickup_label destination_label')
+Agent = namedtuple('Agent', 'id location')
+# One place on a route; several deliveries often share a town
+Stop = namedtuple('Stop', 'kind point label delivery_ids')
+
+
+class Batch:
+    """Deliveries proposed as one trip: every pickup first, then every drop-off."""
+
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.agent_id = None
+        self.stops = []
+        self.distance_km = 0.0
+
+    @property
+    def delivery_ids(self):
+        return [job.id for job in self.jobs]
+
+
+class Plan:
+    def __init__(self, batches, elapsed, optimised):
+        self.batches = batches
+        self.elapsed = elapsed
+        self.optimised = optimised  # False if the time budget cut 2-opt short
+
+    def for_agent(self, agent_id):
+        return next((batch for batch in self.batches if batch.agent_id == agent_id), None)
+
+
+def _cell(point, size_km):
+    # Square grid in degrees; across Nigeria's latitudes a degree of longitude is within 3% of one of latitude
+    step = size_km / KM_PER_DEGREE
+    return math.floor(point[0] / step), math.floor(point[1] / step)
+
+
+def cluster_jobs(jobs, capacity, cell_km):
+    """
+    Group jobs into batches of at most ``capacity`` that share a pickup area and
+    head for the same or a neighbouring destination area.
+    """
+    groups = defaultdict(list)
+    for job in jobs:
+        groups[_cell(job.pickup, cell_km), _cell(job.destination, cell_km)].append(job)
+
+    batches = []
+    partial = defaultdict(list)  # pickup cell -> [(destination cell, batch)] with room left
+    for (pickup_cell, destination_cell), group in sorted(groups.items()):
+        group.sort(key=lambda job: job.destination)
+        for start in range(0, len(group), capacity):
+            batch = Batch(group[start:start + capacity])
+            batches.append(batch)
+            if len(batch.jobs) < capacity:
+                partial[pickup_cell].append((destination_cell, batch))
+
+    # Fold part-filled batches into one going the same way from the same pickup area
+    for candidates in partial.values():
+        for index, (cell, batch) in enumerate(candidates):
+            if not batch.jobs:
+                continue
+            for other_cell, other in candidates[index + 1:]:
+                if (other.jobs and len(batch.jobs) + len(other.jobs) <= capacity
+                        and max(abs(cell[0] - other_cell[0]), abs(cell[1] - other_cell[1])) <= 1):
+                    batch.jobs.extend(other.jobs)
+                    other.jobs = []
+    return [batch for batch in batches if batch.jobs]
+
+
+def _nearest_neighbour(start, points, distance):
+    route, remaining, current = [], set(points), start
+    while remaining:
+        current = min(remaining, key=lambda point: distance(current, point))
+        remaining.discard(current)
+        route.append(current)
+    return route
+
+
+def _two_opt(start, route, distance, deadline):
+    """Improve an open path from ``start`` by reversing segments until no reversal helps."""
+    path = [start] + route
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, len(path) - 1):
+            if time.monotonic() > deadline:
+                return path[1:], False
+            for j in range(i + 1, len(path)):
+                after = path[j + 1] if j + 1 < len(path) else None
+                delta = distance(path[i - 1], path[j]) - distance(path[i - 1], path[i])
+                if after is not None:
+                    delta += distance(path[i], after) - distance(path[j], after)
+                if delta < -1e-9:
+                    path[i:j + 1] = reversed(path[i:j + 1])
+                    improved = True
+    return path[1:], True
+
+
+def build_route(batch, start, deadline):
+    """Order the batch's stops from ``start``; returns False if the deadline stopped 2-opt early."""
+    memo = {}
+
+    def distance(a, b):
+        key = (a, b) if a <= b else (b, a)
+        if key not in memo:
+            memo[key] = haversine_km(a, b)
+        return memo[key]
+
+    pickups, drops = defaultdict(list), defaultdict(list)
+    labels = {}
+    for job in batch.jobs:
+        pickups[job.pickup].append(job.id)
+        drops[job.destination].append(job.id)
+        labels.setdefault(('pickup', job.pickup), job.pickup_label)
+        labels.setdefault(('drop', job.destination), job.destination_label)
+
+    start = start or min(pickups)
+    complete = True
+    pickup_route, done = _two_opt(start, _nearest_neighbour(start, pickups, distance), distance, deadline)
+    complete &= done
+    drop_route, done = _two_opt(pickup_route[-1], _nearest_neighbour(pickup_route[-1], drops, distance), distance, deadline)
+    complete &= done
+
+    batch.stops = (
+        [Stop('pickup', point, labels['pickup', point], pickups[point]) for point in pickup_route]
+        + [Stop('drop', point, labels['drop', point], drops[point]) for point in drop_route]
+    )
+    path = [start] + pickup_route + drop_route
+    batch.distance_km = sum(distance(a, b) for a, b in zip(path, path[1:]))
+    return complete
+
+
+def plan_routes(jobs, agents, capacity=None, cell_km=None, budget=None):
+    """
+    Batch ``jobs`` and propose one batch to each agent, biggest batches first to the
+    nearest free agent, each routed nearest-neighbour then 2-opt from the agent's
+    location. After ``budget`` seconds routes keep their nearest-neighbour order.
+    """
+    started = time.monotonic()
+    deadline = started + (settings.ROUTE_PLAN_BUDGET if budget is None else budget)
+    batches = cluster_jobs(jobs, capacity or settings.ROUTE_BATCH_SIZE, cell_km or settings.ROUTE_CLUSTER_KM)
+    batches.sort(key=lambda batch: -len(batch.jobs))
+
+    located = {agent.id: agent.location for agent in agents if agent.location}
+    unlocated = [agent.id for agent in agents if not agent.location]
+    optimised = True
+    for batch in batches:
+        first_pickup = batch.jobs[0].pickup
+        if located:
+            batch.agent_id = min(located, key=lambda agent_id: haversine_km(located[agent_id], first_pickup))
+            start = located.pop(batch.agent_id)
+        elif unlocated:
+            batch.agent_id, start = unlocated.pop(), None
+        else:
+            start = None  # more batches than agents; still routed for the next planning round
+        optimised &= build_route(batch, start, deadline)
+    return Plan(batches, time.monotonic() - started, optimised)
+
+
+def pending_jobs():
+    """Unclaimed pending deliveries whose pickup and destination the gazetteer can place."""
+    rows = unclaimed_deliveries().values_list('id', 'pickup_location', 'destination')
+    jobs = []
+    for delivery_id, pickup, destination in rows.iterator(chunk_size=2000):
+        pickup_point, destination_point = geocode(pickup), geocode(destination)
+        if pickup_point and destination_point:
+            jobs.append(Job(delivery_id, pickup_point, destination_point, pickup, destination))
+    return jobs
+
+
+def free_agents():
+    """Active logistics agents with no delivery accepted or in transit."""
+    rows = (
+        User.objects.filter(is_active=True, profile__role='logistics')
+        .exclude(deliveries_handled__status__in=['accepted', 'in_transit'])
+        .values_list('id', 'profile__location')
+    )
+    return [Agent(agent_id, geocode(location) if location else None) for agent_id, location in rows]
+
+
+def _generation():
+    return cache.get_or_set(GENERATION_KEY, 1, None)
+
+
+def build_plan():
+    """Plan the open deliveries and cache the result, tagged with the delivery generation it saw."""
+    generation = _generation()
+    plan = plan_routes(pending_jobs(), free_agents())
+    cache.set(PLAN_CACHE_KEY, {'plan': plan, 'generation': generation, 'built_at': time.time()}, None)
+    return plan
+
+
+def _build_in_background():
+    # cache.add is atomic, so however many requests find the plan stale only one rebuilds it
+    if not cache.add(f"{PLAN_CACHE_KEY}:building", True, BUILD_LOCK_TTL):
+        return
+
+    def run():
+        try:
+            build_plan()
+        finally:
+            cache.delete(f"{PLAN_CACHE_KEY}:building")
+            connection.close()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def current_plan():
+    """
+    The route plan for the open deliveries, or None before the first one is built.
+    A plan older than ROUTE_PLAN_TTL, or built before a delivery changed, is still
+    returned while a background thread replaces it; claims are conditional, so a
+    batch taken in the meantime is simply refused. With ROUTE_PLAN_IN_BACKGROUND
+    off the plan is rebuilt inline instead.
+    """
+    entry = cache.get(PLAN_CACHE_KEY)
+    record_cache('route_plan', entry is not None)
+    if (entry is None or entry['generation'] != _generation()
+            or time.time() - entry['built_at'] > settings.ROUTE_PLAN_TTL):
+        if not settings.ROUTE_PLAN_IN_BACKGROUND:
+            return build_plan()
+        _build_in_background()
+    return entry['plan'] if entry else None
+
+
+def invalidate_route_plan():
+    # Marks the cached plan stale rather than dropping it, so readers never wait for a rebuild
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 2, None)
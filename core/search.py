@@ -0,0 +1,143 @@
+import re
+import unicodedata
+
+from django.db import NotSupportedError, connection, transaction
+from django.db.models import BooleanField, F, FloatField, Func, Value
+
+# Indexed fields, in the index's column order, and how much a hit in each one counts
+FIELD_WEIGHTS = {
+    'title': 5,
+    'description': 1,
+    'city': 2,
+    'state': 2,
+    'category': 3,
+}
+LOCATION_FIELDS = ('city', 'state')
+
+# core_productsearch (migration 0025) is the database's own full-text index: an FTS5
+# table on SQLite, a GIN-indexed tsvector on PostgreSQL, where the weights map to the
+# A-D labels (title A, category B, city/state C, description D)
+INSERT_SQL = {
+    'sqlite': (
+        "INSERT INTO core_productsearch (rowid, title, description, city, state, category) "
+        "VALUES (%s, %s, %s, %s, %s, %s)"
+    ),
+    'postgresql': (
+        "INSERT INTO core_productsearch (rowid, core_productsearch) VALUES (%s, "
+        + " || ".join(f"setweight(to_tsvector('simple', %s), '{label}')" for label in 'ADCCB')
+        + ")"
+    ),
+}
+TS_RANK_WEIGHTS = '{0.2, 0.4, 0.6, 1.0}'  # D, C, B, A: the FIELD_WEIGHTS relative to the title's
+
+_WORD_RE = re.compile(r'[^\W_]+')
+
+
+def normalize(text):
+    """Lowercase and strip accents so 'Ògbómọ̀ṣọ́' and 'ogbomoso' match."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return stripped.lower()
+
+
+def tokenize(text):
+    return _WORD_RE.findall(normalize(text))
+
+
+def _insert_sql():
+    try:
+        return INSERT_SQL[connection.vendor]
+    except KeyError:
+        raise NotSupportedError(f"Product search needs SQLite or PostgreSQL, not {connection.vendor}.") from None
+
+
+def _document(product):
+    # Accents are folded here rather than by the database, so both backends match alike
+    return [product.pk, *(' '.join(tokenize(getattr(product, field))) for field in FIELD_WEIGHTS)]
+
+
+def index_product(product):
+    insert = _insert_sql()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("DELETE FROM core_productsearch WHERE rowid = %s", [product.pk])
+        cursor.execute(insert, _document(product))
+
+
+def rebuild_index(products, batch_size=500):
+    """Rebuild the whole index from ``products``; returns how many were indexed."""
+    insert = _insert_sql()
+    count = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("DELETE FROM core_productsearch")
+        batch = []
+        for product in products.only(*FIELD_WEIGHTS).iterator(chunk_size=batch_size):
+            batch.append(_document(product))
+            if len(batch) >= batch_size:
+                cursor.executemany(insert, batch)
+                count += len(batch)
+                batch = []
+        cursor.executemany(insert, batch)
+        count += len(batch)
+        if connection.vendor == 'sqlite':
+            cursor.execute("INSERT INTO core_productsearch (core_productsearch) VALUES ('optimize')")
+    return count
+
+
+class _FullText(Func):
+    """A full-text expression over the joined index document for ``words`` (anywhere) and ``places`` (city/state)."""
+
+    def __init__(self, document, words, places):
+        super().__init__(document)
+        self.words, self.places = words, places
+
+    def fts5_query(self):
+        # Each word as a quoted prefix, places limited to the location columns; FTS5 ANDs them
+        location = ' '.join(LOCATION_FIELDS)
+        return ' '.join([f'"{word}"*' for word in self.words] + [f'{{{location}}} : "{word}"*' for word in self.places])
+
+    def tsquery(self):
+        return ' & '.join([f'{word}:*' for word in self.words] + [f'{word}:*C' for word in self.places])
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError(f"Product search needs SQLite or PostgreSQL, not {connection.vendor}.")
+
+
+class Matches(_FullText):
+    output_field = BooleanField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        document, params = compiler.compile(self.source_expressions[0])
+        return f"{document} MATCH %s", [*params, self.fts5_query()]
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        document, params = compiler.compile(self.source_expressions[0])
+        return f"{document} @@ to_tsquery('simple', %s)", [*params, self.tsquery()]
+
+
+class Relevance(_FullText):
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # bm25 is lower for better matches; the column weights follow FIELD_WEIGHTS
+        document, params = compiler.compile(self.source_expressions[0])
+        weights = ', '.join(f'{weight:.1f}' for weight in FIELD_WEIGHTS.values())
+        return f"-bm25({document}, {weights})", params
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        document, params = compiler.compile(self.source_expressions[0])
+        return f"ts_rank('{TS_RANK_WEIGHTS}', {document}, to_tsquery('simple', %s))", [*params, self.tsquery()]
+
+
+def search_products(queryset, query=None, location=None):
+    """
+    Narrow ``queryset`` to products matching every word of ``query`` (any indexed
+    field, as a prefix) and of ``location`` (city/state only), annotated with
+    ``relevance``. One join to the full-text index does both.
+    """
+    words, places = tokenize(query), tokenize(location)
+    if not words and not places:
+        return queryset.annotate(relevance=Value(0.0))
+    document = F('search__document')
+    # An expression filter leaves the reverse one-to-one as a LEFT JOIN, which MATCH can't
+    # run under; the isnull filter makes it an INNER JOIN driven from the index
+    return queryset.filter(search__isnull=False).filter(Matches(document, words, places)).annotate(relevance=Relevance(document, words, places))
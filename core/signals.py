@@ -0,0 +1,82 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from .models import DeliveryRequest, Product
+from .search import index_product
+from .deliveries import invalidate_delivery_stats
+from .events import publish_delivery_change
+from .images import get_derivatives
+from .storage import release
+from .pagecache import invalidate_product_pages
+from .db import configure_sqlite
+from .instrumentation import install_query_recorder
+from .routing import invalidate_route_plan
+
+connection_created.connect(configure_sqlite, dispatch_uid='core.configure_sqlite')
+connection_created.connect(install_query_recorder, dispatch_uid='core.install_query_recorder')
+
+@receiver(post_save, sender=Product)
+def update_product_search_index(sender, instance, raw=False, **kwargs):
+    # Deleted products drop out of the index through the FK cascade
+    if not raw:
+        index_product(instance)
+
+@receiver(post_save, sender=Product)
+def build_product_image_derivatives(sender, instance, raw=False, **kwargs):
+    # Looking the manifest up starts the background build for a new upload
+    if not raw and instance.image:
+        transaction.on_commit(lambda: get_derivatives(instance.image))
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    # After commit: a page rendered before then would cache the old row again
+    product_id = instance.pk  # delete() clears instance.pk before on_commit callbacks run
+    transaction.on_commit(lambda: invalidate_product_pages(product_id))
+
+# Shared media files are reference-counted; a replaced or deleted image drops its reference
+
+@receiver(post_init, sender=Product)
+def remember_product_image(sender, instance, **kwargs):
+    image = instance.__dict__.get('image')
+    instance._loaded_image = getattr(image, 'name', image)
+
+@receiver(post_save, sender=Product)
+def release_replaced_product_image(sender, instance, created, raw=False, **kwargs):
+    if raw or 'image' not in instance.__dict__:  # deferred, so it was not changed either
+        return
+    if not created and instance._loaded_image and instance._loaded_image != instance.image.name:
+        release(instance._loaded_image)
+    instance._loaded_image = instance.image.name
+
+@receiver(post_delete, sender=Product)
+def release_product_image(sender, instance, **kwargs):
+    release(instance.image.name)
+
+@receiver(post_init, sender=DeliveryRequest)
+def remember_delivery_state(sender, instance, **kwargs):
+    # Lets the save handler tell which agent's counters a change affects;
+    # read from __dict__ so deferred fields are never loaded here
+    instance._loaded_agent_id = instance.__dict__.get('logistics_agent_id')
+    instance._loaded_status = instance.__dict__.get('status')
+
+@receiver(post_save, sender=DeliveryRequest)
+def delivery_saved(sender, instance, created, **kwargs):
+    changed = instance.status != instance._loaded_status or instance.logistics_agent_id != instance._loaded_agent_id
+    if created or changed:
+        invalidate_delivery_stats(instance.logistics_agent_id, instance._loaded_agent_id)
+        invalidate_route_plan()
+    if changed and not created:
+        # Open my-deliveries pages of everyone involved update without reloading
+        extra = {}
+        if instance.logistics_agent_id != instance._loaded_agent_id:
+            extra['agent'] = instance.logistics_agent.username if instance.logistics_agent_id else None
+        publish_delivery_change(instance.pk, instance.status, [
+            instance.farmer_id, instance.buyer_id, instance.logistics_agent_id, instance._loaded_agent_id,
+        ], **extra)
+    remember_delivery_state(sender, instance)
+
+@receiver(post_delete, sender=DeliveryRequest)
+def delivery_deleted(sender, instance, **kwargs):
+    invalidate_delivery_stats(instance.logistics_agent_id)
+    invalidate_route_plan()
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import posixpath
+import re
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+from django.db import transaction
+from django.utils import timezone
+
+# Model fields whose files live in the "media" storage; a stored file is kept while any row here references it
+MEDIA_REFERENCES = [
+    ('core.Product', 'image'),
+    ('users.Profile', 'photo'),
+]
+_DIGEST_NAME_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+def select_media_storage():
+    # Callable so model fields (and their migrations) follow STORAGES["media"]
+    return storages['media']
+
+
+def content_digest(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_content_addressed(name):
+    return bool(name and _DIGEST_NAME_RE.search(name))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that names each upload after the SHA-256 of its bytes
+    (``<upload_to>/ab/abcd....jpg``) and stores identical content only once. Files
+    are deleted by ``release`` once no row in MEDIA_REFERENCES points at them.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = content_digest(content)
+        content.seek(0)
+
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        name = posixpath.join(directory, digest[:2], digest + extension)
+        if self.exists(name):
+            # Already stored: the new reference shares the file. Touching it restarts
+            # collect's grace period, since the row that will point here isn't committed yet
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+def reference_count(name):
+    """How many rows across MEDIA_REFERENCES point at the stored file ``name``."""
+    total = 0
+    for label, field in MEDIA_REFERENCES:
+        total += apps.get_model(label)._default_manager.filter(**{field: name}).count()
+    return total
+
+
+def _field_defaults():
+    defaults = set()
+    for label, field in MEDIA_REFERENCES:
+        default = apps.get_model(label)._meta.get_field(field).get_default()
+        if default:
+            defaults.add(default)
+    return defaults
+
+
+def _recently_written(storage, name):
+    try:
+        modified = storage.get_modified_time(name)
+    except OSError:
+        return False  # already gone
+    return timezone.now() - modified < timedelta(seconds=settings.MEDIA_COLLECT_GRACE)
+
+
+def collect(name, storage=None):
+    """
+    Delete ``name`` and its image derivatives if nothing references it any more;
+    returns True if deleted. Files written or reused within MEDIA_COLLECT_GRACE
+    seconds are kept, as a save in flight may be about to reference them;
+    `manage.py dedupe_media` collects them later.
+    """
+    from .images import forget_derivatives
+
+    storage = storage or select_media_storage()
+    # Only digest-named files are shared and managed here; legacy uploads and field defaults are left alone
+    if not is_content_addressed(name) or name in _field_defaults() or reference_count(name):
+        return False
+    if _recently_written(storage, name):
+        return False
+    forget_derivatives(name)
+    storage.delete(name)
+    return True
+
+
+def release(name):
+    """Drop a reference to ``name``; the file is collected after the surrounding transaction commits."""
+    if name:
+        transaction.on_commit(lambda: collect(name))
@@ -0,0 +1,24 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from core.images import get_derivatives, srcsets
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(fieldfile, sizes='100vw', **attrs):
+    """
+    <picture> for an ImageField value: AVIF/WebP srcsets from core.images, with the
+    original upload as the <img> fallback. Extra keyword arguments become <img> attributes.
+
+        {% responsive_image product.image sizes="(min-width: 768px) 33vw, 100vw" alt=product.title class="card-img-top" %}
+    """
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    sources = format_html_join(
+        '', '<source type="image/{}" srcset="{}" sizes="{}">',
+        ((fmt, srcset, sizes) for fmt, srcset in srcsets(get_derivatives(fieldfile)).items()),
+    )
+    img_attrs = format_html_join('', ' {}="{}"', attrs.items())
+    return format_html('<picture>{}<img src="{}"{}></picture>', sources, fieldfile.url, img_attrs)
@@ -0,0 +1,18 @@
+from django.contrib.auth.models import User
+
+from core.models import Product
+
+
+def make_user(username, role, **profile_fields):
+    user = User.objects.create_user(username, f"{username}@example.com", 'password')
+    user.profile.role = role
+    for name, value in profile_fields.items():
+        setattr(user.profile, name, value)
+    user.profile.save()
+    return user
+
+
+def make_product(farmer, title='Tomatoes', price=100, quantity=10, **fields):
+    fields.setdefault('description', f"Fresh {title.lower()}")
+    fields.setdefault('city', 'Ibadan')
+    return Product.objects.create(farmer=farmer, title=title, price=price, quantity=quantity, **fields)
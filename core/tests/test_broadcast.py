@@ -0,0 +1,59 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from core import broadcast
+from core.broadcast import deliver_broadcast, deliver_chunk, start_broadcast
+from core.models import Message
+
+from .helpers import make_user
+
+
+class BroadcastTests(TestCase):
+    def setUp(self):
+        self.sender = make_user('sender', 'farmer')
+        self.recipients = [make_user(f'user{n}', 'buyer') for n in range(5)]
+
+    def inbox(self):
+        return sorted(Message.objects.filter(broadcast__isnull=False).values_list('recipient__username', flat=True))
+
+    def test_small_broadcast_is_delivered_within_the_request(self):
+        sent = start_broadcast(self.sender, "Market day moved to Friday")
+        self.assertIsNotNone(sent.completed_at)
+        self.assertEqual((sent.recipient_count, sent.delivered_count), (5, 5))
+        self.assertEqual(self.inbox(), [f'user{n}' for n in range(5)])  # everyone but the sender
+
+    @mock.patch.object(broadcast, 'INLINE_LIMIT', 2)
+    def test_large_broadcast_is_fanned_out_in_chunks(self):
+        sent = start_broadcast(self.sender, "Market day moved to Friday")
+        self.assertIsNone(sent.completed_at)
+        self.assertEqual(self.inbox(), [])
+        make_user('latecomer', 'buyer')  # joined after the broadcast started: not a recipient
+
+        with self.assertNumQueries(6):  # savepoint, lock, recipients, insert, save, release
+            sent = deliver_chunk(sent, chunk_size=2)
+        self.assertEqual((sent.delivered_count, sent.progress), (2, 40))
+        self.assertEqual(self.inbox(), ['user0', 'user1'])
+
+        out = StringIO()
+        call_command('send_broadcasts', '--chunk-size=2', stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), [
+            f"Broadcast #{sent.pk}: 4/5 delivered (80%)",
+            f"Broadcast #{sent.pk}: 5/5 delivered (100%)",
+        ])
+        self.assertEqual(self.inbox(), [f'user{n}' for n in range(5)])
+
+    def test_completed_broadcast_is_not_delivered_twice(self):
+        sent = start_broadcast(self.sender, "Market day moved to Friday")
+        deliver_broadcast(sent)
+        deliver_chunk(sent)
+        self.assertEqual(Message.objects.filter(broadcast=sent).count(), 5)
+
+    def test_send_to_all_view_reports_delivery(self):
+        self.client.force_login(self.sender)
+        response = self.client.post(reverse('send_message'), {'send_to_all': 'on', 'body': "Market day moved"}, follow=True)
+        self.assertContains(response, "Message sent successfully to all users!")
+        self.assertEqual(len(self.inbox()), 5)
@@ -0,0 +1,88 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core import views
+from core.models import CartItem, Message, Order, OutboundEmail, Product
+
+from .helpers import make_product, make_user
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.buyer = make_user('buyer', 'buyer')
+        self.farmers = [make_user(f'farmer{n}', 'farmer') for n in range(3)]
+        self.client.force_login(self.buyer)
+
+    def fill_cart(self, count, quantity=2, stock=10):
+        products = [
+            make_product(self.farmers[n % len(self.farmers)], title=f'Crop {n}', price=50 + n, quantity=stock)
+            for n in range(count)
+        ]
+        CartItem.objects.bulk_create([CartItem(user=self.buyer, product=product, quantity=quantity) for product in products])
+        return products
+
+    def checkout(self):
+        return self.client.post(reverse('checkout'))
+
+    def test_places_order_and_takes_stock(self):
+        products = self.fill_cart(2, quantity=3)
+        response = self.checkout()
+
+        self.assertRedirects(response, reverse('orders'), fetch_redirect_response=False)
+        order = Order.objects.get(buyer=self.buyer)
+        self.assertEqual(order.total_price, 3 * 50 + 3 * 51)
+        self.assertEqual(order.item_count, 6)
+        self.assertEqual(order.items.count(), 2)
+        self.assertEqual(list(Product.objects.filter(pk__in=[p.pk for p in products]).values_list('quantity', flat=True)), [7, 7])
+        self.assertFalse(CartItem.objects.filter(user=self.buyer).exists())
+        self.assertEqual(Message.objects.filter(sender=self.buyer).count(), 2)  # one per farmer
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    def test_repeat_order_notifies_the_farmer_again(self):
+        product = self.fill_cart(1)[0]
+        self.checkout()
+        CartItem.objects.create(user=self.buyer, product=product, quantity=2)
+        self.checkout()
+        self.assertEqual(Order.objects.filter(buyer=self.buyer).count(), 2)
+        self.assertEqual(OutboundEmail.objects.filter(recipient=self.farmers[0].email).count(), 2)
+
+    def test_query_count_does_not_grow_with_the_cart(self):
+        # Warm the session, user and role lookups the middleware makes on every request
+        self.client.get(reverse('view_cart'))
+        for size in (1, 12):
+            with self.subTest(items=size):
+                CartItem.objects.filter(user=self.buyer).delete()
+                self.fill_cart(size)
+                with self.assertNumQueries(12):
+                    self.checkout()
+                self.assertEqual(Order.objects.filter(buyer=self.buyer).count(), 1 if size == 1 else 2)
+
+    def test_rejects_cart_over_stock(self):
+        self.fill_cart(1, quantity=11, stock=10)
+        response = self.checkout()
+
+        self.assertRedirects(response, reverse('view_cart'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Product.objects.get().quantity, 10)
+
+    def test_stock_sold_after_reading_the_cart_rolls_back(self):
+        sold, kept = self.fill_cart(2, quantity=4, stock=5)
+        real_total = views.cart_total
+
+        def total_while_another_order_commits(cart_items):
+            # The cart passed the stock check; another buyer takes the stock before the update
+            Product.objects.filter(pk=sold.pk).update(quantity=2)
+            return real_total(cart_items)
+
+        with mock.patch.object(views, 'cart_total', total_while_another_order_commits):
+            response = self.checkout()
+
+        self.assertRedirects(response, reverse('view_cart'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Message.objects.exists())
+        self.assertEqual(Product.objects.get(pk=kept.pk).quantity, 5)  # its decrement was rolled back too
+        self.assertEqual(CartItem.objects.filter(user=self.buyer).count(), 2)
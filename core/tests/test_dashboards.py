@@ -0,0 +1,50 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import AsyncClient, TestCase
+from django.urls import reverse
+
+from .helpers import make_product, make_user
+
+WEATHER = {'temp': 31, 'description': 'clear sky', 'icon': '01d'}
+
+
+@mock.patch('users.views.get_weather', return_value=WEATHER)
+@mock.patch('core.views.get_weather', return_value=WEATHER)
+class DashboardTests(TestCase):
+    """The dashboards and product list are sync views; they must work under both handlers."""
+
+    def setUp(self):
+        cache.clear()
+        self.farmer = make_user('farmer', 'farmer', location='Oyo')
+        self.buyer = make_user('buyer', 'buyer')
+        self.agent = make_user('agent', 'logistics')
+        make_product(self.farmer, title='Okra')
+        self.pages = [
+            (self.farmer, reverse('farmer_dashboard')),
+            (self.buyer, reverse('buyer_dashboard')),
+            (self.agent, reverse('logistics_dashboard')),
+            (self.buyer, reverse('product_list')),
+        ]
+
+    def test_pages_under_wsgi(self, core_weather, users_weather):
+        for user, url in self.pages:
+            with self.subTest(url=url):
+                self.client.force_login(user)
+                self.assertContains(self.client.get(url), 'Clear Sky, 31°C')
+        users_weather.assert_any_call('Oyo')  # the farmer's profile location
+
+    async def test_pages_under_asgi(self, core_weather, users_weather):
+        client = AsyncClient()
+        for user, url in self.pages:
+            with self.subTest(url=url):
+                await client.aforce_login(user)
+                self.assertContains(await client.get(url), 'Clear Sky, 31°C')
+
+    async def test_event_stream_still_async_behind_sync_middleware(self, core_weather, users_weather):
+        client = AsyncClient()
+        await client.aforce_login(self.buyer)
+        response = await client.get(reverse('delivery_events'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(response.is_async)
+        self.assertEqual(await anext(aiter(response.streaming_content)), b'retry: 5000\n\n')
@@ -0,0 +1,62 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+from django.conf import settings
+from django.db import OperationalError, connection, connections, transaction
+from django.test import SimpleTestCase, TransactionTestCase
+
+from core.models import Message
+
+from .helpers import make_user
+
+
+class SQLiteTuningTests(TransactionTestCase):
+    def test_pragmas_applied_to_new_connections(self):
+        with connection.cursor() as cursor:
+            for name, expected in (('journal_mode', 'wal'), ('synchronous', 1), ('busy_timeout', 5000), ('temp_store', 2)):
+                cursor.execute(f"PRAGMA {name}")
+                with self.subTest(pragma=name):
+                    self.assertEqual(cursor.fetchone()[0], expected)
+
+    def test_concurrent_read_then_write_transactions_wait_instead_of_failing(self):
+        sender, recipient = make_user('sender', 'farmer'), make_user('recipient', 'buyer')
+        failures = []
+
+        def writer(worker):
+            try:
+                for n in range(25):
+                    try:
+                        with transaction.atomic():
+                            Message.objects.filter(sender=sender).count()
+                            Message.objects.create(sender=sender, recipient=recipient, body=f"{worker}-{n}")
+                    except OperationalError as exc:  # "database is locked"
+                        failures.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(failures, [])
+        self.assertEqual(Message.objects.count(), 6 * 25)
+
+
+class PostgresProfileTests(SimpleTestCase):
+    def test_pooled_without_persistent_connections(self):
+        # Settings are read at import, so load them fresh with the PostgreSQL profile selected
+        env = {**os.environ, 'DB_ENGINE': 'postgresql', 'DB_POOL_MAX_SIZE': '7'}
+        output = subprocess.run(
+            [sys.executable, '-c', 'import json, farmmarket.settings as s; print(json.dumps(s.DATABASES["default"]))'],
+            env=env, cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+        database = json.loads(output)
+        self.assertEqual(database['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertEqual(database['OPTIONS']['pool']['max_size'], 7)
+        self.assertNotIn('transaction_mode', database['OPTIONS'])
@@ -0,0 +1,115 @@
+import random
+import threading
+
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+
+from core.deliveries import DeliveryConflict, change_status, claim_deliveries
+from core.models import DeliveryRequest
+
+from .helpers import make_product, make_user
+
+AGENTS = 6
+DELIVERIES = 40
+
+
+def race(workers, work):
+    """Run ``work(worker)`` in one thread per worker, all released together; re-raises the first error."""
+    start = threading.Barrier(len(workers))
+    errors = []
+
+    def run(worker):
+        try:
+            start.wait()
+            work(worker)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=run, args=(worker,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+class ConcurrentClaimTests(TransactionTestCase):
+    """Agents racing for the same deliveries: every delivery goes to exactly one of them."""
+
+    def setUp(self):
+        farmer = make_user('farmer', 'farmer')
+        product = make_product(farmer)
+        self.agents = [make_user(f'agent{n}', 'logistics') for n in range(AGENTS)]
+        DeliveryRequest.objects.bulk_create([
+            DeliveryRequest(product=product, farmer=farmer, pickup_location='Ibadan', destination='Oyo')
+            for _ in range(DELIVERIES)
+        ])
+        self.delivery_ids = list(DeliveryRequest.objects.values_list('pk', flat=True))
+
+    def assert_one_winner_each(self, winners):
+        final = dict(DeliveryRequest.objects.values_list('pk', 'logistics_agent_id'))
+        for delivery_id in self.delivery_ids:
+            with self.subTest(delivery=delivery_id):
+                self.assertEqual(len(winners[delivery_id]), 1, "lost update: more than one agent was told it won")
+                self.assertEqual(final[delivery_id], winners[delivery_id][0])
+        self.assertEqual(DeliveryRequest.objects.filter(status='accepted').count(), DELIVERIES)
+
+    def test_change_status(self):
+        winners = {delivery_id: [] for delivery_id in self.delivery_ids}
+        lock = threading.Lock()
+
+        def accept_all(agent):
+            order = self.delivery_ids[:]
+            random.shuffle(order)
+            for delivery_id in order:
+                try:
+                    change_status(delivery_id, agent, 'logistics', 'accepted')
+                except DeliveryConflict:
+                    continue
+                with lock:
+                    winners[delivery_id].append(agent.pk)
+
+        race(self.agents, accept_all)
+        self.assert_one_winner_each(winners)
+
+    def test_claim_deliveries(self):
+        claimed = {}
+
+        def claim_overlapping(agent):
+            # Each agent asks for an overlapping two thirds of the pool
+            offset = self.agents.index(agent) * DELIVERIES // AGENTS
+            wanted = (self.delivery_ids * 2)[offset:offset + DELIVERIES * 2 // 3]
+            claimed[agent.pk] = claim_deliveries(agent, wanted)
+
+        race(self.agents, claim_overlapping)
+        self.assertEqual(sum(claimed.values()), DeliveryRequest.objects.filter(status='accepted').count())
+        winners = {}
+        for delivery_id, agent_id in DeliveryRequest.objects.filter(status='accepted').values_list('pk', 'logistics_agent_id'):
+            winners.setdefault(delivery_id, []).append(agent_id)
+        self.assertTrue(all(len(agent_ids) == 1 for agent_ids in winners.values()))
+
+
+class ChangeStatusTests(TestCase):
+    def setUp(self):
+        self.farmer = make_user('farmer', 'farmer')
+        self.agent = make_user('agent', 'logistics')
+        self.delivery = DeliveryRequest.objects.create(
+            product=make_product(self.farmer), farmer=self.farmer, pickup_location='Ibadan', destination='Oyo',
+        )
+
+    def test_second_accept_is_a_conflict(self):
+        other = make_user('other', 'logistics')
+        change_status(self.delivery.pk, self.agent, 'logistics', 'accepted')
+        with self.assertRaisesMessage(DeliveryConflict, "Another agent accepted this delivery first."):
+            change_status(self.delivery.pk, other, 'logistics', 'accepted')
+
+    def test_disallowed_move(self):
+        with self.assertRaisesMessage(DeliveryConflict, "can't be marked as 'delivered'"):
+            change_status(self.delivery.pk, self.agent, 'logistics', 'delivered')
+
+    def test_missing_delivery_is_a_conflict_not_a_404(self):
+        with self.assertRaisesMessage(DeliveryConflict, "This delivery no longer exists."):
+            change_status(self.delivery.pk + 1, self.agent, 'logistics', 'accepted')
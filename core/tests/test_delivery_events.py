@@ -0,0 +1,56 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+
+from core.models import DeliveryEvent, DeliveryRequest
+
+from .helpers import make_product, make_user
+
+
+@override_settings(DELIVERY_EVENTS_POLL=0.01)
+class DeliveryEventTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.farmer = make_user('farmer', 'farmer')
+        self.delivery = DeliveryRequest.objects.create(
+            product=make_product(self.farmer), farmer=self.farmer, pickup_location='Ibadan', destination='Oyo',
+        )
+
+    def move(self, status):
+        self.delivery.status = status
+        self.delivery.save()
+
+    async def read_event(self, status, language='en'):
+        client = AsyncClient()
+        await client.aforce_login(self.farmer)
+        response = await client.get(reverse('delivery_events'), headers={'accept-language': language})
+        chunks = aiter(response.streaming_content)
+        await anext(chunks)  # retry interval
+        # Saved like any worker would: the stream hears it through the event table
+        await sync_to_async(self.move)(status)
+        chunk = (await anext(chunks)).decode()
+        await chunks.aclose()  # ends the stream and unsubscribes
+        return json.loads(chunk.split('data: ', 1)[1])
+
+    async def test_status_label_is_translated_for_the_reader(self):
+        self.assertEqual((await self.read_event('accepted'))['label'], 'Accepted')
+        self.assertEqual(await self.read_event('in_transit', 'yo'), {'id': self.delivery.pk, 'status': 'in_transit', 'label': 'Ninu Irinna'})
+
+    def test_changes_are_written_for_every_party(self):
+        buyer = make_user('buyer', 'buyer')
+        DeliveryRequest.objects.filter(pk=self.delivery.pk).update(buyer=buyer)
+        self.delivery.refresh_from_db()
+        self.move('cancelled')
+        self.assertEqual(
+            sorted(DeliveryEvent.objects.values_list('recipient_id', 'payload')),
+            [(self.farmer.id, {'id': self.delivery.pk, 'status': 'cancelled'}), (buyer.id, {'id': self.delivery.pk, 'status': 'cancelled'})],
+        )
+
+    def test_page_shows_translated_statuses(self):
+        self.client.force_login(self.farmer)
+        response = self.client.get(reverse('my_deliveries'), headers={'accept-language': 'yo'})
+        self.assertContains(response, 'const notAssigned = "Ko Yàn";')
+        self.assertContains(response, 'Ti nduro')  # the pending badge
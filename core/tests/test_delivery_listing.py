@@ -0,0 +1,59 @@
+import csv
+import io
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core.models import DeliveryRequest
+from core.queries import DELIVERIES_PER_PAGE
+
+from .helpers import make_product, make_user
+
+
+class DeliveryListingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.farmer = make_user('farmer', 'farmer')
+        self.buyer = make_user('buyer', 'buyer')
+        self.agent = make_user('agent', 'logistics')
+        product = make_product(self.farmer)
+        DeliveryRequest.objects.bulk_create([
+            DeliveryRequest(
+                product=product, farmer=self.farmer, buyer=self.buyer, logistics_agent=self.agent if n % 2 else None,
+                pickup_location='Ibadan', destination='Oyo', status='accepted' if n % 2 else 'pending',
+            )
+            for n in range(DELIVERIES_PER_PAGE * 4)
+        ])
+        self.client.force_login(self.farmer)
+
+    def listing(self, **params):
+        return self.client.get(reverse('my_deliveries'), params)
+
+    def test_every_page_costs_the_same_queries(self):
+        self.listing()  # warm the session, user and role lookups
+        with self.assertNumQueries(3):  # session, user, the page
+            first = self.listing()
+        cursor = first.context['page_obj'].next_cursor
+        for _ in range(2):
+            cursor = self.listing(cursor=cursor).context['page_obj'].next_cursor
+        with self.assertNumQueries(3):
+            deep = self.listing(cursor=cursor)
+
+        listed = [delivery.pk for delivery in deep.context['page_obj']]
+        expected = list(DeliveryRequest.objects.order_by('-date_requested', '-id').values_list('pk', flat=True))
+        self.assertEqual(listed, expected[DELIVERIES_PER_PAGE * 3:])
+        self.assertFalse(deep.context['page_obj'].has_next())
+
+    def test_export_neutralises_formulas(self):
+        DeliveryRequest.objects.update(pickup_location='=HYPERLINK("http://evil")', destination='@SUM(A1)')
+        product = DeliveryRequest.objects.first().product
+        product.title = '+cmd'
+        product.save()
+        response = self.client.get(reverse('export_deliveries'), {'status': 'pending'})
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), DELIVERIES_PER_PAGE * 2)
+        self.assertEqual(rows[0]['pickup_location'], '\'=HYPERLINK("http://evil")')
+        self.assertEqual(rows[0]['destination'], "'@SUM(A1)")
+        self.assertEqual(rows[0]['product__title'], "'+cmd")
+        self.assertEqual(rows[0]['farmer__username'], 'farmer')
@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+from django.test import SimpleTestCase, override_settings
+
+from core.deliveries import quote, quote_many, tariff
+from core.geocoding import PLACES, haversine_km
+
+RATE_BANDS = [(25, Decimal('100')), (100, Decimal('80')), (None, Decimal('60'))]
+
+
+@override_settings(DELIVERY_BASE_FEE=Decimal('500'), DELIVERY_ROAD_FACTOR=1.0, DELIVERY_RATE_BANDS=RATE_BANDS)
+class TariffTests(SimpleTestCase):
+    def test_each_band_is_charged_for_its_own_stretch(self):
+        cases = [
+            (0, '500.00'),
+            (10, '1500.00'),
+            (25, '3000.00'),  # the first band's edge
+            (25.5, '3040.00'),  # the next half km at the second band's rate
+            (100, '9000.00'),  # 25 km at 100 + 75 km at 80
+            (100.25, '9015.00'),
+            (150, '12000.00'),  # the rest at 60
+        ]
+        for distance, cost in cases:
+            with self.subTest(distance=distance):
+                self.assertEqual(tariff(distance), Decimal(cost))
+
+    def test_road_factor_stretches_the_distance(self):
+        with override_settings(DELIVERY_ROAD_FACTOR=1.3):
+            self.assertEqual(tariff(100), Decimal('10800.00'))  # 130 road km
+
+    def test_cost_is_rounded_to_kobo(self):
+        self.assertEqual(tariff(0.0001234), Decimal('500.01'))
+
+
+@override_settings(DELIVERY_BASE_FEE=Decimal('500'), DELIVERY_ROAD_FACTOR=1.3, DELIVERY_RATE_BANDS=RATE_BANDS)
+class QuoteTests(SimpleTestCase):
+    def test_quotes_follow_the_distance_between_places(self):
+        ibadan_oyo = tariff(haversine_km(PLACES['ibadan'], PLACES['oyo']))
+        self.assertEqual(quote_many([
+            ("Ibadan", "Oyo"),
+            ("Oyo", "Bodija, Ibadan"),  # either way round, and with a district before the town
+            ("Ibadan", "ibadan"),
+            ("Ibadan", "Atlantis"),
+            ("", "Oyo"),
+        ]), [ibadan_oyo, ibadan_oyo, Decimal('500.00'), None, None])
+
+    def test_a_state_is_quoted_from_its_capital(self):
+        self.assertIsNotNone(quote("Kano", "Lagos"))
+        self.assertEqual(quote("Kano State", "Lagos"), quote("Kano", "Lagos"))
+
+    def test_unknown_places_have_no_quote(self):
+        self.assertIsNone(quote("Atlantis", "El Dorado"))
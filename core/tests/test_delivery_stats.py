@@ -0,0 +1,59 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from core import deliveries
+from core.deliveries import change_status, delivery_stats
+from core.models import DeliveryRequest
+
+from .helpers import make_product, make_user
+
+
+class DeliveryStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.farmer = make_user('farmer', 'farmer')
+        self.agent = make_user('agent', 'logistics')
+        product = make_product(self.farmer)
+        self.deliveries = {}
+        for status in ('pending', 'accepted', 'in_transit', 'in_transit', 'delivered', 'cancelled'):
+            self.deliveries.setdefault(status, []).append(DeliveryRequest.objects.create(
+                product=product, farmer=self.farmer, logistics_agent=self.agent, status=status,
+                pickup_location='Ibadan', destination='Oyo',
+            ))
+        other_agent = make_user('other', 'logistics')
+        DeliveryRequest.objects.create(
+            product=product, farmer=self.farmer, logistics_agent=other_agent, status='delivered',
+            pickup_location='Ibadan', destination='Oyo',
+        )
+
+    def test_counts_by_status_from_one_cached_query(self):
+        with self.assertNumQueries(1):
+            stats = delivery_stats(self.agent.id)
+        self.assertEqual(stats, {'total': 6, 'pending': 1, 'in_transit': 2, 'delivered': 1})
+        with self.assertNumQueries(0):
+            self.assertEqual(delivery_stats(self.agent.id), stats)
+
+    def test_status_change_invalidates(self):
+        delivery_stats(self.agent.id)
+        change_status(self.deliveries['in_transit'][0].pk, self.agent, 'logistics', 'delivered')
+        self.assertEqual(delivery_stats(self.agent.id), {'total': 6, 'pending': 1, 'in_transit': 1, 'delivered': 2})
+
+    def test_saved_delivery_invalidates(self):
+        delivery_stats(self.agent.id)
+        delivery = self.deliveries['accepted'][0]
+        delivery.status = 'in_transit'
+        delivery.save()
+        self.assertEqual(delivery_stats(self.agent.id)['in_transit'], 3)
+
+    def test_process_local_cache_keeps_stats_briefly(self):
+        with mock.patch.object(deliveries.cache, 'set') as cache_set:
+            delivery_stats(self.agent.id)
+        self.assertEqual(cache_set.call_args.args[2], deliveries.LOCAL_STATS_TTL)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}})
+    def test_shared_cache_keeps_stats_longer(self):
+        with mock.patch.object(deliveries.cache, 'get', return_value=None), mock.patch.object(deliveries.cache, 'set') as cache_set:
+            delivery_stats(self.agent.id)
+        self.assertEqual(cache_set.call_args.args[2], deliveries.STATS_TTL)
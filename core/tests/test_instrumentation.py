@@ -0,0 +1,68 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import instrumentation
+from core.instrumentation import install_query_recorder
+
+from .helpers import make_product, make_user
+
+
+class SlowQueryLogTests(TestCase):
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_slow_queries_are_logged_with_the_line_that_ran_them(self):
+        with self.assertLogs('farmmarket.slow_queries', 'WARNING') as logs:
+            User.objects.filter(username='nobody').exists()
+        self.assertEqual(len(logs.records), 1)
+        self.assertRegex(
+            logs.output[0],
+            r'Slow query \(\d+ ms\) from core/tests/test_instrumentation\.py:\d+ '
+            r'in test_slow_queries_are_logged_with_the_line_that_ran_them: SELECT %s AS "a" FROM "auth_user" ',
+        )
+
+    @override_settings(SLOW_QUERY_MS=10_000)
+    def test_fast_queries_are_not_logged(self):
+        with self.assertNoLogs('farmmarket.slow_queries'):
+            User.objects.filter(username='nobody').exists()
+
+    def test_reconnects_do_not_stack_wrappers(self):
+        install_query_recorder(sender=None, connection=connection)
+        self.assertEqual(connection.execute_wrappers.count(instrumentation.record_query), 1)
+
+
+@override_settings(METRICS_TOKEN='scrape-me', WEATHER_FETCH_IN_VIEWS=False)
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        instrumentation.registry.reset()
+        make_product(make_user('farmer', 'farmer'), title='Okra')
+
+    def test_server_timing_reports_the_request(self):
+        response = self.client.get(reverse('product_list'))
+        self.assertRegex(response['Server-Timing'], (
+            r'^db;dur=[\d.]+;desc="[1-9]\d* queries", http;dur=0\.0;desc="0 calls", '
+            r'cache;desc="\d+ hits, [1-9]\d* misses", total;dur=[\d.]+$'
+        ))
+
+    def test_metrics_aggregate_requests_by_view(self):
+        self.client.get(reverse('product_list'))
+        self.client.get(reverse('product_list'))  # served from the page cache
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer scrape-me'})
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('farmmarket_request_duration_seconds_count{view="product_list"} 2', body)
+        self.assertIn('farmmarket_cache_lookups_total{view="product_list",cache="page",result="hit"} 1', body)
+        self.assertIn('farmmarket_cache_lookups_total{view="product_list",cache="page",result="miss"} 1', body)
+        self.assertIn('farmmarket_db_queries_bucket{view="product_list",le="+Inf"} 2', body)
+        self.assertNotIn('farmmarket_weather_http_duration_seconds_count{view="product_list"}', body)
+
+    def test_metrics_need_the_token_or_staff(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        wrong = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer guess'})
+        self.assertEqual(wrong.status_code, 403)
+        staff = make_user('admin', 'buyer')
+        User.objects.filter(pk=staff.pk).update(is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
@@ -0,0 +1,99 @@
+import smtplib
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core import mailqueue
+from core.mailqueue import enqueue_mail, send_queued_mail
+from core.models import OutboundEmail
+
+
+class EnqueueTests(TestCase):
+    def test_same_text_for_another_reference_is_queued(self):
+        enqueue_mail("New Order Notification", "Hello farmer", ['farmer@example.com'], reference='order:1')
+        enqueue_mail("New Order Notification", "Hello farmer", ['farmer@example.com'], reference='order:2')
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    def test_same_mail_for_the_same_reference_is_queued_once(self):
+        for _ in range(2):
+            enqueue_mail("New Order Notification", "Hello farmer", ['farmer@example.com'], reference='order:1')
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class SendQueuedMailTests(TransactionTestCase):
+    def test_sends_outside_a_transaction(self):
+        enqueue_mail("Hi", "Body", ['a@example.com', 'b@example.com'])
+        in_transaction = []
+
+        def send(message, *args, **kwargs):
+            in_transaction.append(connection.in_atomic_block)
+            # A second worker running now finds nothing left to claim
+            self.assertEqual(mailqueue._claim_due(100), [])
+            return 1
+
+        with mock.patch('django.core.mail.EmailMessage.send', send):
+            self.assertEqual(send_queued_mail(), (2, 0))
+        self.assertEqual(in_transaction, [False, False])
+        self.assertEqual(OutboundEmail.objects.filter(status='sent', attempts=1).count(), 2)
+
+    def test_delivers_through_the_backend(self):
+        enqueue_mail("Hi", "Body", ['a@example.com'])
+        self.assertEqual(send_queued_mail(), (1, 0))
+        self.assertEqual([message.to for message in mail.outbox], [['a@example.com']])
+        self.assertEqual(send_queued_mail(), (0, 0))
+
+    def test_failures_back_off_then_give_up(self):
+        enqueue_mail("Hi", "Body", ['a@example.com'])
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError("refused")):
+            for attempt in range(1, mailqueue.MAX_ATTEMPTS + 1):
+                OutboundEmail.objects.update(next_attempt_at=timezone.now())
+                self.assertEqual(send_queued_mail(), (0, 1))
+                email = OutboundEmail.objects.get()
+                self.assertEqual((email.attempts, email.last_error), (attempt, "refused"))
+                if attempt < mailqueue.MAX_ATTEMPTS:
+                    delay = mailqueue.RETRY_BASE_DELAY * 2 ** (attempt - 1)
+                    self.assertAlmostEqual(email.next_attempt_at, timezone.now() + delay, delta=timedelta(seconds=5))
+        self.assertEqual(email.status, 'failed')
+
+    def test_rows_of_a_dead_worker_become_due_after_the_lease(self):
+        enqueue_mail("Hi", "Body", ['a@example.com'])
+        self.assertEqual(len(mailqueue._claim_due(100)), 1)
+        self.assertEqual(send_queued_mail(), (0, 0))
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued_mail(), (1, 0))
+
+    def assert_released(self, recipients):
+        for email in OutboundEmail.objects.filter(recipient__in=recipients):
+            self.assertEqual((email.status, email.attempts), ('pending', 0))
+            self.assertLessEqual(email.next_attempt_at, timezone.now())
+
+    def test_unreachable_mail_server_releases_the_batch(self):
+        enqueue_mail("Hi", "Body", ['a@example.com', 'b@example.com'])
+        with mock.patch.object(mailqueue, 'get_connection') as get_connection, \
+                self.assertLogs('farmmarket.mail', 'WARNING'):
+            get_connection.return_value.open.side_effect = ConnectionRefusedError("refused")
+            self.assertEqual(send_queued_mail(), (0, 0))
+        get_connection.return_value.send_messages.assert_not_called()
+        self.assert_released(['a@example.com', 'b@example.com'])
+        self.assertEqual(send_queued_mail(), (2, 0))  # due again once the server is back
+
+    def test_lost_connection_stops_the_batch(self):
+        enqueue_mail("Hi", "Body", ['a@example.com', 'b@example.com', 'c@example.com'])
+        outcomes = iter([1, smtplib.SMTPServerDisconnected("gone")])
+
+        def send(message, *args, **kwargs):
+            outcome = next(outcomes)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        with mock.patch('django.core.mail.EmailMessage.send', send), self.assertLogs('farmmarket.mail', 'WARNING'):
+            self.assertEqual(send_queued_mail(), (1, 0))
+        self.assertEqual(OutboundEmail.objects.filter(status='sent').count(), 1)
+        self.assert_released(OutboundEmail.objects.filter(status='pending').values_list('recipient', flat=True))
+        self.assertEqual(OutboundEmail.objects.filter(status='pending').count(), 2)
@@ -0,0 +1,52 @@
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from core.market import market_series, refresh_market_index
+from core.models import PriceHistory
+
+from .helpers import make_product, make_user
+
+# One sample a week, Mondays from 2025-03-03: the weekly means are the prices themselves
+PRICES = [100, 200, 300, 400, 500]
+
+
+class MarketIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        product = make_product(make_user('farmer', 'farmer'), title='Maize', category='Maize', state='Oyo State')
+        PriceHistory.objects.all().delete()
+        for week, price in enumerate(PRICES):
+            entry = PriceHistory.objects.create(product=product, price=Decimal(price))
+            PriceHistory.objects.filter(pk=entry.pk).update(
+                date_recorded=timezone.make_aware(datetime(2025, 3, 3 + 7 * week, 12)),
+            )
+
+    def test_moving_average_volatility_and_index(self):
+        self.assertEqual(refresh_market_index(), 2 * len(PRICES))  # the state's series and the nationwide one
+        for state in ('Oyo State', ''):
+            with self.subTest(state=state):
+                series = market_series('Maize', state)
+                self.assertEqual([point['week'] for point in series], [
+                    '2025-03-03', '2025-03-10', '2025-03-17', '2025-03-24', '2025-03-31',
+                ])
+                self.assertEqual([point['mean'] for point in series], PRICES)
+                # Four-week window: the fifth week drops the first
+                self.assertEqual([point['moving_average'] for point in series], [100, 150, 200, 250, 350])
+                # Against the first week (= 100)
+                self.assertEqual([round(point['index'], 6) for point in series], [100, 200, 300, 400, 500])
+                # Population standard deviation over the window, relative to its mean
+                self.assertEqual([round(point['volatility'], 6) for point in series], [
+                    0, round(50 / 150, 6), round(81.649658 / 200, 6), round(111.803399 / 250, 6), round(111.803399 / 350, 6),
+                ])
+
+    def test_refresh_retires_cached_series(self):
+        refresh_market_index()
+        self.assertEqual(len(market_series('Maize', 'Oyo State')), len(PRICES))
+        PriceHistory.objects.filter(price=Decimal(500)).delete()
+        self.assertEqual(len(market_series('Maize', 'Oyo State')), len(PRICES))  # still cached
+        refresh_market_index()
+        self.assertEqual(len(market_series('Maize', 'Oyo State')), len(PRICES) - 1)
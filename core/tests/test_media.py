@@ -0,0 +1,88 @@
+import importlib
+import io
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import clear_url_caches
+from PIL import Image
+
+import farmmarket.urls
+from core.images import FORMATS, generate_derivatives
+
+from .helpers import make_product, make_user
+
+
+class DerivativeRouteTests(SimpleTestCase):
+    def load_urls(self, debug):
+        with override_settings(DEBUG=debug):
+            module = importlib.reload(farmmarket.urls)
+        clear_url_caches()
+        return module
+
+    def tearDown(self):
+        importlib.reload(farmmarket.urls)
+        clear_url_caches()
+
+    def test_not_served_by_django_in_production(self):
+        names = [getattr(pattern, 'name', None) for pattern in self.load_urls(debug=False).urlpatterns]
+        self.assertNotIn('media_derivative', names)
+
+    def test_served_as_immutable_in_development(self):
+        self.load_urls(debug=True)
+        with tempfile.TemporaryDirectory() as media_root:
+            (Path(media_root) / 'derivatives').mkdir()
+            (Path(media_root) / 'derivatives' / 'abc-320.webp').write_bytes(b'RIFF')
+            with override_settings(MEDIA_ROOT=media_root, DEBUG=True):
+                response = self.client.get('/media/derivatives/abc-320.webp')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+                response.close()
+
+
+PHOTO_SIZE = (1200, 900)
+
+
+def phone_photo(width=PHOTO_SIZE[0], height=PHOTO_SIZE[1]):
+    # A gradient with sensor-like noise, saved the way phones save: big, high-quality JPEG
+    gradient = Image.radial_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), 20)
+    image = Image.merge('RGB', (gradient, Image.blend(gradient, noise, 0.3), noise))
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=95)
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, IMAGE_DERIVATIVE_WIDTHS=[320, 640, 1024])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.product = make_product(make_user('farmer', 'farmer'), image=phone_photo())
+
+    def test_derivatives_are_resized_content_named_and_smaller(self):
+        manifest = generate_derivatives(self.product.image.name)
+        self.assertEqual(sorted((fmt, width) for fmt, width, _ in manifest), sorted(
+            (fmt, width) for fmt in FORMATS for width in (320, 640, 1024)
+        ))
+        original_size = self.product.image.size
+        for fmt, width, name in manifest:
+            self.assertRegex(name, rf'^derivatives/[0-9a-f]{{2}}/[0-9a-f]{{64}}/{width}\.{fmt}$')
+            with default_storage.open(name) as fh, Image.open(fh) as image:
+                self.assertEqual(image.size, (width, width * 3 // 4))
+            self.assertLess(default_storage.size(name), original_size * (width / PHOTO_SIZE[0]) ** 2)  # fewer bytes per pixel too
+
+    def test_template_tag_emits_srcsets_with_the_original_as_fallback(self):
+        generate_derivatives(self.product.image.name)
+        html = Template(
+            '{% load responsive_images %}{% responsive_image product.image sizes="33vw" alt=product.title %}'
+        ).render(Context({'product': self.product}))
+        for fmt in FORMATS:
+            self.assertRegex(html, rf'<source type="image/{fmt}" srcset="[^"]+ 320w, [^"]+ 640w, [^"]+ 1024w" sizes="33vw">')
+        self.assertIn(f'<img src="{self.product.image.url}" alt="Tomatoes"', html)
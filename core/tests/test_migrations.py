@@ -0,0 +1,56 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from core.queries import product_listing
+
+
+class DataMigrationTests(TransactionTestCase):
+    """The data migrations carry their own copies of app code; they must still build what the app would."""
+
+    def migrate(self, *targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(list(targets))
+        return executor.loader.project_state(list(targets)).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        self.migrate(*executor.loader.graph.leaf_nodes())
+
+    def make_product(self, apps, **fields):
+        farmer, _ = apps.get_model('auth', 'User').objects.get_or_create(username='farmer')
+        return apps.get_model('core', 'Product').objects.create(farmer=farmer, price=100, quantity=1, **fields)
+
+    def test_existing_products_are_searchable_after_the_index_migration(self):
+        apps = self.migrate(('core', '0024_delivery_listing_indexes'))
+        self.make_product(apps, title="Fresh Tomatoes", description="Grown locally", city="Ògbómọ̀ṣọ́", state="Oyo State")
+        self.make_product(apps, title="Yellow Maize", description="Dried", city="Kano", state="Kano State")
+        self.migrate(('core', '0025_productsearch'))
+        products, _ = product_listing('tomato', 'ogbomoso')
+        self.assertEqual([product.title for product in products], ["Fresh Tomatoes"])
+
+    def test_price_rollups_built_from_history(self):
+        apps = self.migrate(('core', '0019_order_summary'))
+        product = self.make_product(apps, title="Yam", description="", city="Oyo")
+        PriceHistory = apps.get_model('core', 'PriceHistory')
+        for price, day in ((Decimal('100'), 5), (Decimal('80'), 5), (Decimal('120'), 20)):
+            entry = PriceHistory.objects.create(product=product, price=price)
+            PriceHistory.objects.filter(pk=entry.pk).update(
+                date_recorded=timezone.make_aware(timezone.datetime(2025, 3, day, 12)),
+            )
+        apps = self.migrate(('core', '0020_pricerollup'))
+        rollups = {
+            (row.period, row.period_start.isoformat()): (row.min_price, row.max_price, row.price_sum, row.sample_count, row.last_price)
+            for row in apps.get_model('core', 'PriceRollup').objects.all()
+        }
+        self.assertEqual(rollups, {
+            ('day', '2025-03-05'): (80, 100, 180, 2, 80),
+            ('day', '2025-03-20'): (120, 120, 120, 1, 120),
+            ('week', '2025-03-03'): (80, 100, 180, 2, 80),
+            ('week', '2025-03-17'): (120, 120, 120, 1, 120),
+            ('month', '2025-03-01'): (80, 120, 300, 3, 120),
+        })
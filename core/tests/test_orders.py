@@ -0,0 +1,39 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core.models import Order, OrderItem
+
+from .helpers import make_product, make_user
+
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.buyer = make_user('buyer', 'buyer')
+        self.products = [make_product(make_user(f'farmer{n}', 'farmer'), title=f'Crop {n}') for n in range(4)]
+        self.client.force_login(self.buyer)
+
+    def place_orders(self, count, items_per_order):
+        for _ in range(count):
+            order = Order.objects.create(buyer=self.buyer, total_price=100, item_count=items_per_order)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=1, price=product.price)
+                for product in self.products[:items_per_order]
+            ])
+
+    def test_query_count_does_not_grow_with_orders_or_items(self):
+        self.client.get(reverse('orders'))  # warm the session, user and role lookups
+        for count, items_per_order in ((1, 1), (12, 4)):
+            with self.subTest(orders=count, items=items_per_order):
+                Order.objects.all().delete()
+                self.place_orders(count, items_per_order)
+                with self.assertNumQueries(6):
+                    response = self.client.get(reverse('orders'))
+                self.assertEqual(len(response.context['orders']), min(count, 10))
+                self.assertContains(response, 'Crop 0')
+
+    def test_second_page(self):
+        self.place_orders(12, 1)
+        response = self.client.get(reverse('orders'), {'page': 2})
+        self.assertEqual(len(response.context['orders']), 2)
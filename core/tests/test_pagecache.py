@@ -0,0 +1,82 @@
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import pagecache
+from core.models import CartItem
+from core.pagecache import LOCAL_PAGE_CACHE_TTL, PRODUCT_CARD_FRAGMENT, catalog_version
+
+from .helpers import make_product, make_user
+
+
+class ProductPageInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.farmer = make_user('farmer', 'farmer')
+        self.product = make_product(self.farmer, title='Yams')
+        self.card_key = make_template_fragment_key(PRODUCT_CARD_FRAGMENT, [self.product.pk, 'en', False])
+
+    def test_product_save_invalidates_only_after_commit(self):
+        version = catalog_version()
+        cache.set(self.card_key, 'old card')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.product.title = 'White yams'
+            self.product.save()
+            # A page rendered now would read the old row; it must land under the retiring version
+            self.assertEqual(catalog_version(), version)
+            self.assertEqual(cache.get(self.card_key), 'old card')
+        for callback in callbacks:
+            callback()
+        self.assertGreater(catalog_version(), version)
+        self.assertIsNone(cache.get(self.card_key))
+
+    def test_product_delete_invalidates_its_card(self):
+        cache.set(self.card_key, 'old card')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        self.assertIsNone(cache.get(self.card_key))
+
+    def test_anonymous_page_shows_change_after_commit(self):
+        self.assertContains(self.client.get(reverse('product_list')), 'Yams')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.title = 'Cocoyams'
+            self.product.save()
+        self.assertContains(self.client.get(reverse('product_list')), 'Cocoyams')
+
+    def test_checkout_invalidates_after_commit(self):
+        buyer = make_user('buyer', 'buyer')
+        CartItem.objects.create(user=buyer, product=self.product, quantity=1)
+        self.client.force_login(buyer)
+        version = catalog_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(reverse('checkout'))
+        self.assertEqual(catalog_version(), version)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(catalog_version(), version)
+
+
+class PageCacheTTLTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_product(make_user('farmer', 'farmer'), title='Yams')
+
+    def page_ttl(self):
+        with mock.patch.object(pagecache.cache, 'set') as cache_set:
+            response = self.client.get(reverse('product_list'))
+        return cache_set.call_args.args[2], response.context['product_card_ttl']
+
+    @override_settings(PAGE_CACHE_TTL=300, PRODUCT_CARD_CACHE_TTL=86400)
+    def test_process_local_cache_keeps_pages_and_cards_briefly(self):
+        self.assertEqual(self.page_ttl(), (LOCAL_PAGE_CACHE_TTL, LOCAL_PAGE_CACHE_TTL))
+
+    @override_settings(PAGE_CACHE_TTL=300, PRODUCT_CARD_CACHE_TTL=86400)
+    def test_shared_cache_keeps_pages_and_cards_longer(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location},
+        }):
+            self.assertEqual(self.page_ttl(), (300, 86400))
@@ -0,0 +1,58 @@
+import base64
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core.models import Product
+from core.queries import PRODUCTS_PER_PAGE
+
+from .helpers import make_product, make_user
+
+
+class ProductListPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        farmer = make_user('farmer', 'farmer')
+        # Three prices shared across many rows, so the listing relies on the id tiebreaker
+        for n in range(PRODUCTS_PER_PAGE * 3 + 2):
+            make_product(farmer, title=f"Crop {n}", price=100 + 50 * (n % 3))
+
+    def ids(self, response):
+        return [product.pk for product in response.context['page_obj']]
+
+    def numbered_pages(self, sort):
+        ids, number = [], 1
+        while True:
+            page_obj = self.client.get(reverse('product_list'), {'sort': sort, 'page': number}).context['page_obj']
+            ids += [product.pk for product in page_obj]
+            if not page_obj.has_next():
+                return ids
+            number += 1
+
+    def cursor_pages(self, sort):
+        ids, cursor = [], None
+        while True:
+            params = {'sort': sort, 'cursor': cursor} if cursor else {'sort': sort}
+            page_obj = self.client.get(reverse('product_list'), params).context['page_obj']
+            ids += [product.pk for product in page_obj]
+            if not page_obj.has_next():
+                return ids
+            cursor = page_obj.next_cursor
+
+    def test_numbered_and_cursor_pages_list_the_same_order(self):
+        for sort in ('newest', 'oldest', 'price_low', 'price_high'):
+            with self.subTest(sort=sort):
+                cursor_ids = self.cursor_pages(sort)
+                self.assertEqual(len(cursor_ids), PRODUCTS_PER_PAGE * 3 + 2)
+                self.assertEqual(self.numbered_pages(sort), cursor_ids)
+
+    def test_malformed_cursors_fall_back_to_the_first_page(self):
+        first_page = self.ids(self.client.get(reverse('product_list'), {'sort': 'newest'}))
+        posted = Product.objects.get(pk=first_page[0]).date_posted.isoformat()
+        for payload in ('["next", null, 1]', f'["next", "{posted}", 1e400]', '"next"'):
+            with self.subTest(payload=payload):
+                cursor = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+                response = self.client.get(reverse('product_list'), {'sort': 'newest', 'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self.ids(response), first_page)
@@ -0,0 +1,12 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_view_queries_use_indexes(self):
+        # Raises CommandError naming the queries that fall back to a full scan or sort
+        output = StringIO()
+        call_command('check_query_plans', stdout=output)
+        self.assertIn("All query plans use an index.", output.getvalue())
@@ -0,0 +1,138 @@
+import math
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import routing
+from core.models import DeliveryRequest
+from core.routing import Agent, Job, _two_opt, cluster_jobs, current_plan, free_agents, invalidate_route_plan, plan_routes
+
+from .helpers import make_product, make_user
+
+IBADAN, OYO, LAGOS, KANO = (7.3775, 3.9470), (7.8526, 3.9312), (6.5244, 3.3792), (12.0022, 8.5920)
+
+
+def job(job_id, pickup, destination):
+    return Job(job_id, pickup, destination, f"from-{job_id}", f"to-{job_id}")
+
+
+def batches(plan):
+    return [(batch.agent_id, batch.delivery_ids) for batch in plan.batches]
+
+
+def euclidean(a, b):
+    return math.dist(a, b)
+
+
+class ClusterJobsTests(SimpleTestCase):
+    def test_groups_by_pickup_and_destination_area_up_to_capacity(self):
+        jobs = [job(n, IBADAN, OYO) for n in range(5)] + [job(10 + n, IBADAN, KANO) for n in range(2)]
+        batches = cluster_jobs(jobs, capacity=3, cell_km=30)
+        self.assertEqual(sorted(sorted(batch.delivery_ids) for batch in batches), [[0, 1, 2], [3, 4], [10, 11]])
+
+    def test_part_filled_batches_to_neighbouring_areas_are_merged(self):
+        # 0.3 degrees apart: adjacent 30 km cells, same pickup cell
+        near_oyo = (OYO[0] + 0.3, OYO[1])
+        jobs = [job(1, IBADAN, OYO), job(2, IBADAN, near_oyo), job(3, LAGOS, OYO)]
+        batches = cluster_jobs(jobs, capacity=4, cell_km=30)
+        self.assertEqual(sorted(sorted(batch.delivery_ids) for batch in batches), [[1, 2], [3]])
+
+    def test_full_batches_are_not_merged(self):
+        near_oyo = (OYO[0] + 0.3, OYO[1])
+        jobs = [job(1, IBADAN, OYO), job(2, IBADAN, OYO), job(3, IBADAN, near_oyo)]
+        batches = cluster_jobs(jobs, capacity=2, cell_km=30)
+        self.assertEqual(sorted(sorted(batch.delivery_ids) for batch in batches), [[1, 2], [3]])
+
+
+class TwoOptTests(SimpleTestCase):
+    def test_uncrosses_a_path(self):
+        # Overshooting to 2 and doubling back to 1 costs 4; walking along the line costs 3
+        route, complete = _two_opt((0, 0), [(2, 0), (1, 0), (3, 0)], euclidean, time.monotonic() + 10)
+        self.assertTrue(complete)
+        self.assertEqual(route, [(1, 0), (2, 0), (3, 0)])
+
+    def test_keeps_an_optimal_path(self):
+        route, complete = _two_opt((0, 0), [(1, 0), (2, 0), (3, 0)], euclidean, time.monotonic() + 10)
+        self.assertEqual((route, complete), ([(1, 0), (2, 0), (3, 0)], True))
+
+    def test_stops_at_the_deadline(self):
+        route, complete = _two_opt((0, 0), [(2, 0), (1, 0), (3, 0)], euclidean, time.monotonic() - 1)
+        self.assertFalse(complete)
+        self.assertEqual(route, [(2, 0), (1, 0), (3, 0)])
+
+
+class PlanRoutesTests(SimpleTestCase):
+    def test_biggest_batch_goes_to_the_nearest_agent(self):
+        jobs = [job(n, LAGOS, IBADAN) for n in range(3)] + [job(10, KANO, KANO)]
+        plan = plan_routes(jobs, [Agent(1, KANO), Agent(2, LAGOS)], capacity=8, cell_km=30, budget=10)
+        self.assertTrue(plan.optimised)
+        self.assertEqual(sorted(plan.for_agent(2).delivery_ids), [0, 1, 2])
+        self.assertEqual(plan.for_agent(1).delivery_ids, [10])
+
+    def test_pickups_come_before_drops(self):
+        jobs = [job(1, IBADAN, LAGOS), job(2, OYO, LAGOS)]
+        plan = plan_routes(jobs, [Agent(1, OYO)], capacity=8, cell_km=200, budget=10)
+        batch = plan.for_agent(1)
+        self.assertEqual([stop.kind for stop in batch.stops], ['pickup', 'pickup', 'drop'])
+        self.assertEqual([stop.point for stop in batch.stops], [OYO, IBADAN, LAGOS])
+        self.assertEqual(batch.stops[-1].delivery_ids, [1, 2])
+
+    def test_more_batches_than_agents(self):
+        jobs = [job(1, LAGOS, LAGOS), job(2, KANO, KANO)]
+        plan = plan_routes(jobs, [Agent(1, None)], capacity=8, cell_km=30, budget=10)
+        self.assertEqual(len(plan.batches), 2)
+        self.assertEqual([batch.agent_id for batch in plan.batches].count(1), 1)
+        self.assertIn(None, [batch.agent_id for batch in plan.batches])
+
+
+class CurrentPlanTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.farmer = make_user('farmer', 'farmer')
+        self.product = make_product(self.farmer)
+        self.free = make_user('free', 'logistics', location='Ibadan')
+        self.busy = make_user('busy', 'logistics', location='Ibadan')
+        DeliveryRequest.objects.create(
+            product=self.product, farmer=self.farmer, logistics_agent=self.busy, status='in_transit',
+            pickup_location='Ibadan', destination='Oyo',
+        )
+        self.open = DeliveryRequest.objects.create(
+            product=self.product, farmer=self.farmer, pickup_location='Ibadan', destination='Lagos',
+        )
+
+    def test_agents_holding_deliveries_are_not_free(self):
+        self.assertEqual([agent.id for agent in free_agents()], [self.free.id])
+        self.assertEqual(current_plan().for_agent(self.free.id).delivery_ids, [self.open.id])
+        self.assertIsNone(current_plan().for_agent(self.busy.id))
+
+    def test_cached_until_a_delivery_changes(self):
+        plan = current_plan()
+        with self.assertNumQueries(0):
+            self.assertEqual(batches(current_plan()), batches(plan))
+        DeliveryRequest.objects.create(product=self.product, farmer=self.farmer, pickup_location='Ibadan', destination='Lagos')
+        self.assertEqual(len(current_plan().for_agent(self.free.id).delivery_ids), 2)
+
+    @override_settings(ROUTE_PLAN_IN_BACKGROUND=True)
+    def test_stale_plan_served_while_one_rebuild_runs(self):
+        with mock.patch.object(routing.threading, 'Thread') as thread:
+            self.assertIsNone(current_plan())  # nothing built yet
+            thread.assert_called_once()
+            routing.build_plan()
+            stale = current_plan()
+            invalidate_route_plan()
+            DeliveryRequest.objects.filter(pk=self.open.pk).delete()
+            with self.assertNumQueries(0):
+                self.assertEqual(batches(current_plan()), batches(stale))
+                self.assertEqual(batches(current_plan()), batches(stale))
+        self.assertEqual(thread.call_count, 1)  # the build lock is still held by the first
+
+    @override_settings(ROUTE_PLAN_IN_BACKGROUND=True)
+    def test_background_build_replaces_the_plan(self):
+        with mock.patch.object(routing.threading, 'Thread') as thread:
+            current_plan()
+        run = thread.call_args.kwargs['target']
+        with mock.patch.object(routing.connection, 'close'):  # the test's own connection
+            run()
+        self.assertEqual(current_plan().for_agent(self.free.id).delivery_ids, [self.open.id])
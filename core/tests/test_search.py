@@ -0,0 +1,56 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core.models import ProductSearch
+from core.queries import product_listing
+
+from .helpers import make_product, make_user
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.farmer = make_user('farmer', 'farmer')
+
+    def search(self, query=None, location=None):
+        products, _ = product_listing(query, location)
+        return [product.title for product in products]
+
+    def test_index_follows_saves_and_deletes(self):
+        product = make_product(self.farmer, title='Sweet Pepper', description='Grown in Oyo')
+        self.assertEqual(self.search('pepper'), ['Sweet Pepper'])
+
+        product.title = 'Yellow Maize'
+        product.save()
+        self.assertEqual(self.search('pepper'), [])
+        self.assertEqual(self.search('maize'), ['Yellow Maize'])
+
+        product_id = product.pk
+        product.delete()
+        self.assertEqual(self.search('maize'), [])
+        self.assertFalse(ProductSearch.objects.filter(product_id=product_id).exists())
+
+    def test_matches_prefixes_and_folds_accents(self):
+        make_product(self.farmer, title='Tomatoes', city='Ògbómọ̀ṣọ́')
+        self.assertEqual(self.search('TOMATO'), ['Tomatoes'])
+        self.assertEqual(self.search(location='ogbomoso'), ['Tomatoes'])
+        self.assertEqual(self.search('tomato onions'), [])  # every word must match
+
+    def test_title_hits_outrank_description_hits(self):
+        make_product(self.farmer, title='Onions', description='Pairs well with tomatoes')
+        make_product(self.farmer, title='Tomatoes')
+        make_product(self.farmer, title='Tomato paste tomatoes')
+        self.assertEqual(self.search('tomato'), ['Tomato paste tomatoes', 'Tomatoes', 'Onions'])
+
+    def test_location_only_matches_city_and_state(self):
+        make_product(self.farmer, title='Yam', city='Oyo', state='Oyo State')
+        make_product(self.farmer, title='Cassava', city='Kano', state='Kano State', description='Shipped to Oyo')
+        self.assertEqual(self.search(location='oyo'), ['Yam'])
+
+    def test_product_list_searches_the_index(self):
+        make_product(self.farmer, title='Fresh Tomatoes', city='Ibadan')
+        make_product(self.farmer, title='Fresh Tomatoes', city='Kano')
+        make_product(self.farmer, title='Maize', city='Ibadan')
+        response = self.client.get(reverse('product_list'), {'q': 'tomatoes', 'location': 'ibadan'})
+        self.assertEqual([(p.title, p.city) for p in response.context['page_obj']], [('Fresh Tomatoes', 'Ibadan')])
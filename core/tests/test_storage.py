@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from core.models import Product
+from core.storage import collect
+
+from .helpers import make_product, make_user
+
+
+class MediaStorageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, MEDIA_COLLECT_GRACE=600)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.storage = storages['media']
+        self.farmer = make_user('farmer', 'farmer')
+
+    def age(self, name, seconds=3600):
+        path = self.storage.path(name)
+        past = time.time() - seconds
+        os.utime(path, (past, past))
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.storage.save('product_images/a.jpg', ContentFile(b'same bytes'))
+        second = self.storage.save('product_images/b.JPG', ContentFile(b'same bytes'))
+        self.assertEqual(first, second)
+        self.assertRegex(first, r'^product_images/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+
+    def test_unreferenced_file_is_collected_after_the_grace_period(self):
+        name = self.storage.save('product_images/a.jpg', ContentFile(b'orphan'))
+        self.assertFalse(collect(name))  # just written
+        self.age(name)
+        self.assertTrue(collect(name))
+        self.assertFalse(self.storage.exists(name))
+
+    def test_reusing_a_file_restarts_its_grace_period(self):
+        # A save reuses an old orphan while another row releases it, before the save commits
+        name = self.storage.save('product_images/a.jpg', ContentFile(b'shared'))
+        self.age(name)
+        self.assertEqual(self.storage.save('product_images/b.jpg', ContentFile(b'shared')), name)
+        self.assertFalse(collect(name))
+        self.assertTrue(self.storage.exists(name))
+
+    def test_referenced_file_is_kept(self):
+        product = make_product(self.farmer, image=SimpleUploadedFile('a.jpg', b'in use'))
+        self.age(product.image.name)
+        self.assertFalse(collect(product.image.name))
+
+    @override_settings(MEDIA_COLLECT_GRACE=0)
+    def test_replaced_product_image_is_released(self):
+        product = make_product(self.farmer, image=SimpleUploadedFile('a.jpg', b'old'))
+        product = Product.objects.get(pk=product.pk)
+        old_name = product.image.name
+        product.image = SimpleUploadedFile('b.jpg', b'new')
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertFalse(self.storage.exists(old_name))
+        self.assertTrue(self.storage.exists(product.image.name))
+
+    @override_settings(MEDIA_COLLECT_GRACE=0)
+    def test_replaced_profile_photo_is_released(self):
+        profile = self.farmer.profile
+        profile.photo = SimpleUploadedFile('a.jpg', b'old')
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        old_name = profile.photo.name
+        profile.photo = SimpleUploadedFile('b.jpg', b'new')
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        self.assertFalse(self.storage.exists(old_name))
+        self.assertTrue(self.storage.exists(profile.photo.name))
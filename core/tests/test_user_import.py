@@ -0,0 +1,79 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from users.provisioning import ROLE_GROUPS, provision_users
+
+from .helpers import make_user
+
+
+class ProvisionUsersTests(TestCase):
+    def setUp(self):
+        make_user('ada', 'farmer')
+        for name in ROLE_GROUPS.values():
+            Group.objects.create(name=name)
+
+    def test_users_profiles_and_groups_are_created_in_batches(self):
+        rows = [
+            {'username': f'farmer{n}', 'role': 'Farmer', 'city': 'Ibadan', 'password': 'secret' if n == 0 else ''}
+            for n in range(5)
+        ] + [{' Username ': 'agent', 'ROLE': 'logistics', 'email': 'agent@example.com'}]
+        # The role groups, then per batch of 3: existing usernames, then users, profiles and
+        # memberships inside a savepoint
+        with self.assertNumQueries(3 + 2 * (1 + 2 + 3)):
+            result = provision_users(rows, batch_size=3)
+        self.assertEqual((result.created, result.skipped, result.errors), (6, [], []))
+
+        farmer = User.objects.get(username='farmer0')
+        self.assertEqual((farmer.profile.role, farmer.profile.city), ('farmer', 'Ibadan'))
+        self.assertEqual(list(farmer.groups.values_list('name', flat=True)), ['Farmer'])
+        self.assertTrue(farmer.check_password('secret'))
+        self.assertFalse(User.objects.get(username='farmer1').has_usable_password())
+        agent = User.objects.get(username='agent')
+        self.assertEqual((agent.email, agent.profile.role), ('agent@example.com', 'logistics'))
+        self.assertEqual(list(agent.groups.values_list('name', flat=True)), ['Logistics'])
+
+    def test_existing_duplicate_and_invalid_rows_are_reported(self):
+        result = provision_users([
+            {'username': 'ada', 'role': 'buyer'},
+            {'username': 'bola', 'role': 'buyer'},
+            {'username': 'bola', 'role': 'farmer'},
+            {'username': '', 'role': 'buyer'},
+            {'username': 'chidi', 'role': 'chef'},
+        ])
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.skipped, ['ada', 'bola'])
+        self.assertEqual(result.errors, [(4, "missing username"), (5, "unknown role 'chef'")])
+        self.assertEqual(User.objects.get(username='bola').profile.role, 'buyer')
+        self.assertEqual(User.objects.get(username='ada').profile.role, 'farmer')
+
+    def test_import_users_command_reads_a_csv_file(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as handle:
+            handle.write("username,role,state\nbola,buyer,Oyo\nada,farmer,\n")
+        self.addCleanup(os.remove, handle.name)
+        out = StringIO()
+        call_command('import_users', handle.name, stdout=out, stderr=StringIO())
+        self.assertEqual(out.getvalue().splitlines(), ["Skipped 1 existing usernames.", "Created 1 users."])
+        self.assertEqual(User.objects.get(username='bola').profile.state, 'Oyo')
+
+
+class UserSaveTests(TestCase):
+    def test_new_user_gets_a_profile(self):
+        user = User.objects.create_user('ada')
+        self.assertEqual(user.profile.role, '')
+
+    def test_saving_a_user_leaves_the_profile_alone(self):
+        user = make_user('ada', 'farmer')
+        user = User.objects.get(pk=user.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.force_login(user)  # updates last_login
+            user.first_name = 'Ada'
+            user.save()
+        self.assertFalse([query for query in queries if 'users_profile' in query['sql']])
+        self.assertEqual(User.objects.get(pk=user.pk).profile.role, 'farmer')
@@ -0,0 +1,193 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import weather
+from core.management.commands.prefetch_weather import active_locations
+from core.weather import _cache_key, get_weather, pop_stats
+
+from .helpers import make_product, make_user
+
+IBADAN = {'main': {'temp': 31.5}, 'weather': [{'description': 'few clouds', 'icon': '02d'}]}
+IBADAN_WEATHER = {'temp': 31.5, 'description': 'few clouds', 'icon': '02d'}
+
+
+def response(status_code, data=None):
+    reply = mock.Mock(status_code=status_code)
+    reply.json.return_value = data
+    return reply
+
+
+class InlineThread:
+    """Stands in for threading.Thread and runs the target on start()."""
+
+    def __init__(self, target, daemon=None):
+        self.target = target
+
+    def start(self):
+        self.target()
+
+
+@override_settings(WEATHER_FETCH_IN_VIEWS=True, WEATHER_CACHE_TTL=600, WEATHER_FAILURE_TTL=60)
+class GetWeatherTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(weather._session, 'get')
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def age(self, city, seconds):
+        entry = cache.get(_cache_key(city))
+        entry['fetched_at'] -= seconds
+        cache.set(_cache_key(city), entry)
+
+    def test_fresh_entry_is_served_from_the_cache(self):
+        self.get.return_value = response(200, IBADAN)
+        self.assertEqual(get_weather("Ibadan"), IBADAN_WEATHER)
+        self.assertEqual(get_weather("  ibadan "), IBADAN_WEATHER)
+        self.get.assert_called_once()
+
+    def test_stale_entry_is_served_while_it_refreshes(self):
+        self.get.return_value = response(200, IBADAN)
+        get_weather("Ibadan")
+        self.age("Ibadan", 601)
+        self.get.return_value = response(200, {**IBADAN, 'main': {'temp': 25.0}})
+        with mock.patch.object(weather.threading, 'Thread', InlineThread):
+            self.assertEqual(get_weather("Ibadan"), IBADAN_WEATHER)
+        self.assertEqual(get_weather("Ibadan")['temp'], 25.0)
+        self.assertEqual(self.get.call_count, 2)
+
+    def test_unknown_city_is_cached(self):
+        self.get.return_value = response(404)
+        self.assertIsNone(get_weather("Atlantis"))
+        self.assertIsNone(get_weather("Atlantis"))
+        self.get.assert_called_once()
+
+    def test_timeouts_and_server_errors_are_not_retried_at_once(self):
+        for failure in (requests.Timeout(), response(503), response(200, {'unexpected': True})):
+            with self.subTest(failure=failure):
+                cache.clear()
+                self.get.reset_mock()
+                self.get.side_effect = failure if isinstance(failure, Exception) else None
+                self.get.return_value = failure
+                self.assertIsNone(get_weather("Ibadan"))
+                self.assertIsNone(get_weather("Ibadan"))
+                self.get.assert_called_once()
+
+    def test_failed_city_is_retried_after_the_failure_ttl(self):
+        self.get.side_effect = requests.ConnectionError()
+        self.assertIsNone(get_weather("Ibadan"))
+        cache.delete(weather._failed_key("Ibadan"))  # as if WEATHER_FAILURE_TTL passed
+        self.get.side_effect = None
+        self.get.return_value = response(200, IBADAN)
+        self.assertEqual(get_weather("Ibadan"), IBADAN_WEATHER)
+
+    def test_failed_refresh_keeps_serving_stale_data_without_retrying(self):
+        self.get.return_value = response(200, IBADAN)
+        get_weather("Ibadan")
+        self.age("Ibadan", 601)
+        self.get.return_value = response(500)
+        with mock.patch.object(weather.threading, 'Thread', InlineThread):
+            for _ in range(3):
+                self.assertEqual(get_weather("Ibadan"), IBADAN_WEATHER)
+        self.assertEqual(self.get.call_count, 2)
+
+
+class StubOpenWeather(BaseHTTPRequestHandler):
+    """Answers like OpenWeather: Ibadan is known, 'slow' takes a second, anything else is a 404."""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive, so connection reuse is visible
+    requests_seen = []
+
+    def do_GET(self):
+        city = parse_qs(urlparse(self.path).query)['q'][0].lower()
+        self.requests_seen.append((city, self.client_address))
+        if city == 'slow':
+            time.sleep(1)
+        status, body = (200, IBADAN) if city.startswith('ibadan') else (404, {'cod': '404'})
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class WeatherStubServerTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubOpenWeather)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def setUp(self):
+        cache.clear()
+        StubOpenWeather.requests_seen = []
+        url = f"http://127.0.0.1:{self.server.server_port}/weather"
+        override = override_settings(
+            OPENWEATHER_URL=url, WEATHER_FETCH_IN_VIEWS=True, WEATHER_TIMEOUT=0.2, WEATHER_FAILURE_TTL=60,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_lookups_reuse_one_pooled_connection(self):
+        self.assertEqual(get_weather("Ibadan"), IBADAN_WEATHER)
+        self.assertIsNone(get_weather("Atlantis"))
+        self.assertEqual(get_weather("ibadan north"), IBADAN_WEATHER)
+        self.assertEqual(get_weather("IBADAN"), IBADAN_WEATHER)  # cached
+        self.assertEqual([city for city, _ in StubOpenWeather.requests_seen], ["ibadan", "atlantis", "ibadan north"])
+        self.assertEqual(len({client for _, client in StubOpenWeather.requests_seen}), 1)
+
+    def test_slow_api_is_cut_off_by_the_timeout(self):
+        started = time.perf_counter()
+        self.assertIsNone(get_weather("slow"))
+        self.assertLess(time.perf_counter() - started, 0.9)
+        self.assertIsNone(get_weather("slow"))  # not retried until WEATHER_FAILURE_TTL passes
+        self.assertEqual(len(StubOpenWeather.requests_seen), 1)
+
+
+@override_settings(WEATHER_FETCH_IN_VIEWS=False, WEATHER_FAILURE_TTL=60)
+class PrefetchWeatherTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        farmer = make_user('farmer', 'farmer', location='Ibadan North', city=' ibadan  north ')
+        make_user('buyer', 'buyer', city='Atlantis')
+        make_product(farmer, city='IBADAN')
+        patcher = mock.patch.object(weather._session, 'get', side_effect=self.openweather)
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def openweather(self, url, params, timeout):
+        return response(200, IBADAN) if params['q'].lower().startswith('ibadan') else response(404)
+
+    def test_active_locations_are_deduplicated_on_the_normalised_name(self):
+        self.assertEqual(sorted(active_locations()), ["Atlantis", "Ibadan", "Ibadan North"])
+
+    def test_round_warms_the_cache_views_read_from(self):
+        self.assertIsNone(get_weather("Ibadan"))  # views don't fetch; the worker does
+        self.get.assert_not_called()
+        out = StringIO()
+        call_command('prefetch_weather', stdout=out, stderr=StringIO())
+        self.assertIn("Refreshed 2/3 cities", out.getvalue())
+        self.assertIn("(hits 0, stale 0, misses 1, hit ratio 0%)", out.getvalue())
+        self.assertIn("Unknown or unreachable: Atlantis", out.getvalue())
+        self.assertEqual(self.get.call_count, 3)
+
+        self.assertEqual(get_weather("ibadan north"), IBADAN_WEATHER)
+        self.assertIsNone(get_weather("Atlantis"))  # negatively cached
+        self.assertEqual(self.get.call_count, 3)
+        self.assertEqual(pop_stats(), {'hits': 2, 'stale': 0, 'misses': 0})
@@ -5,9 +5,12 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('products', views.product_list, name='product_list'),
     path('product/<int:pk>/', views.product_detail, name='product_detail'),
+    path('product/<int:pk>/price-history/', views.product_price_history, name='product_price_history'),
     path('product/<int:pk>/edit/', views.product_update, name='product_update'),
     path('product/<int:pk>/delete/', views.product_delete, name='product_delete'),
     path('post/', views.product_create, name='product_create'),
+    path('market/prices/', views.market_prices, name='market_prices'),
+    path('metrics/', views.metrics, name='metrics'),
     path('cart/', views.view_cart, name='view_cart'),
     path('cart/add/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
     path('cart/remove/<int:item_id>/', views.remove_from_cart, name='remove_from_cart'),
@@ -20,8 +23,11 @@ urlpatterns = [
     # Delivery URLs
     path('delivery/request/<int:product_id>/', views.request_delivery, name='request_delivery_with_product'),
     path('delivery/pending/', views.view_pending_deliveries, name='pending_deliveries'),
+    path('delivery/route/claim/', views.claim_route_batch, name='claim_route_batch'),
     path('delivery/update-status/<int:delivery_id>/<str:status>/', views.update_delivery_status, name='update_delivery_status'),
     path('delivery/my/', views.my_delivery_requests, name='my_deliveries'),
+    path('delivery/my/export/', views.export_deliveries, name='export_deliveries'),
+    path('delivery/events/', views.delivery_events, name='delivery_events'),
 
     # Logistics dashboard
     path('dashboard/logistics/', views.logistics_dashboard, name='logistics_dashboard'),
@@ -1,69 +1,84 @@
+import asyncio
+import csv
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.mail import send_mail
-from django.contrib.auth.models import User
 from django.core.paginator import Paginator
-from django.db.models import Q
-from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Sum, When
 
-from .models import Product, Message, DeliveryRequest, CartItem, Order, OrderItem
-from .forms import ProductForm, MessageForm, DeliveryRequestForm
+from .models import Product, Message, Broadcast, DeliveryRequest, CartItem, Order, OrderItem
+from .forms import ProductForm, MessageForm, DeliveryRequestForm, DeliveryFilterForm
+from django.utils.crypto import constant_time_compare
+from django.utils import translation
 from django.utils.translation import gettext_lazy as _
-from .utils import get_weather
-import requests
+from .weather import get_weather
+from .pagination import CursorPaginator
+from .mailqueue import enqueue_mass_mail
+from .broadcast import start_broadcast
+from .deliveries import DeliveryConflict, change_status, claim_deliveries, delivery_stats, filter_deliveries
+from .price_history import DEFAULT_POINTS, MAX_POINTS, price_series
+from .market import market_series
+from .images import DERIVATIVE_DIR
+from . import events, instrumentation
+from .pagecache import cache_anonymous_page, cache_ttl, invalidate_product_pages
+from .routing import current_plan
+from .queries import (
+    DELIVERIES_PER_PAGE, PRODUCTS_PER_PAGE, assigned_deliveries, inbox_messages, listed_deliveries,
+    open_deliveries, product_listing, sent_messages,
+)
+import os
+from django.conf import settings
+from django.views.static import serve
+from users.roles import get_user_role
+
 
+PRODUCT_LIST_PARAMS = ('q', 'location', 'min_price', 'max_price', 'category', 'sort', 'page', 'cursor')
+
+DELIVERY_LIST_TITLES = {
+    'farmer': "My Delivery Requests (Farmer)",
+    'buyer': "My Deliveries (Buyer)",
+    'logistics': "All Deliveries (Logistics)",
+}
+DELIVERY_EXPORT_FIELDS = (
+    'id', 'date_requested', 'status', 'product__title', 'farmer__username', 'buyer__username',
+    'logistics_agent__username', 'pickup_location', 'destination', 'delivery_cost',
+)
+EXPORT_CHUNK_SIZE = 2000
+# Spreadsheets evaluate cells starting with these as formulas
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
 
 # Create your views here.
+@cache_anonymous_page()
 def home(request):
     return render(request, 'core/home.html')
 
+@cache_anonymous_page(params=PRODUCT_LIST_PARAMS)
 def product_list(request):
-    products = Product.objects.all().order_by('-date_posted')
-    is_farmer = request.user.is_authenticated and request.user.groups.filter(name='Farmer').exists()
+    is_farmer = request.role.in_group('Farmer')
 
     query = request.GET.get('q')
     location = request.GET.get('location')
     min_price = request.GET.get('min_price')
     max_price = request.GET.get('max_price')
     category = request.GET.get('category')
-    
-    filters = Q()
-    if query:
-        filters &= Q(title__icontains=query)
-    if location:
-        filters &= Q(city__icontains=location) | Q(state__icontains=location)
-    if min_price:
-        filters &= Q(price__gte=min_price)
-    if max_price:
-        filters &= Q(price__lte=max_price)
-    if category:
-        filters &= Q(category=category)
-
-    products = products.filter(filters)
-    
-    # Handle sorting
-    sort = request.GET.get('sort')
-    if sort == 'newest':
-        products = products.order_by('-date_posted')
-    elif sort == 'oldest':
-        products = products.order_by('date_posted')
-    elif sort == 'price_low':
-        products = products.order_by('price')
-    elif sort == 'price_high':
-        products = products.order_by('-price')
+    products, ordering = product_listing(query, location, min_price, max_price, category, request.GET.get('sort'))
+
+    # Keyset pages cost the same at any depth; relevance-ranked search results
+    # and explicit ?page= links keep the numbered paginator
+    cursor_pagination = ordering is not None and not request.GET.get('page')
+    if cursor_pagination:
+        page_obj = CursorPaginator(products, PRODUCTS_PER_PAGE, ordering).page(request.GET.get('cursor'))
     else:
-        products = products.order_by('-date_posted')  # default
-    
-    paginator = Paginator(products, 6)  # Show 6 products per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+        paginator = Paginator(products, PRODUCTS_PER_PAGE)
+        page_obj = paginator.get_page(request.GET.get('page'))
 
     city = location or "Ibadan"
-    try:
-        weather = get_weather(city)
-    except Exception:
-        weather = None
+    weather = get_weather(city)
 
     return render(request, 'core/product_list.html', {
         'products': page_obj,
@@ -74,7 +89,10 @@ def product_list(request):
         'max_price': max_price,
         'category': category,
         'page_obj': page_obj,
+        'cursor_pagination': cursor_pagination,
         'weather': weather,
+        'can_add_to_cart': request.user.is_authenticated and request.role.name == 'buyer',
+        'product_card_ttl': cache_ttl(settings.PRODUCT_CARD_CACHE_TTL),
         
     })
 
@@ -97,12 +115,39 @@ def product_create(request):
 @login_required
 def product_detail(request, pk):
     product = get_object_or_404(Product, pk=pk)
-    history = product.price_history.order_by("date_recorded")  # thanks to related_name
     return render(request, 'core/product_detail.html', {
         'product': product,
-        'history': history,
     })
 
+@login_required
+def product_price_history(request, pk):
+    # Downsampled series for the product detail chart
+    get_object_or_404(Product.objects.only('id'), pk=pk)
+    try:
+        points = min(int(request.GET.get('points', DEFAULT_POINTS)), MAX_POINTS)
+    except ValueError:
+        points = DEFAULT_POINTS
+    return JsonResponse(price_series(pk, max(points, 1)))
+
+@login_required
+def market_prices(request):
+    category = request.GET.get('category') or None
+    state = request.GET.get('state', '')
+    return JsonResponse({'category': category, 'state': state, 'series': market_series(category, state)})
+
+def media_derivative(request, path):
+    # Derivative names are content hashes, so browsers and proxies may keep them for good
+    response = serve(request, path, document_root=os.path.join(settings.MEDIA_ROOT, DERIVATIVE_DIR))
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+def metrics(request):
+    # Prometheus scrapes with the bearer token; staff can look from the browser
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not request.user.is_staff and not (settings.METRICS_TOKEN and constant_time_compare(token, settings.METRICS_TOKEN)):
+        return HttpResponseForbidden()
+    return HttpResponse(instrumentation.registry.prometheus(), content_type='text/plain; version=0.0.4')
+
 @login_required
 def product_update(request, pk):
     product = get_object_or_404(Product, pk=pk, farmer=request.user)  # restrict to farmer who posted it
@@ -133,7 +178,7 @@ def add_to_cart(request, product_id):
     product = get_object_or_404(Product, id=product_id)
 
     # Only buyers can add to cart
-    if request.user.profile.role != 'buyer':
+    if request.role.name != 'buyer':
         messages.error(request, "Only buyers can add products to the cart.")
         return redirect('product_list')
 
@@ -150,14 +195,19 @@ def add_to_cart(request, product_id):
     messages.success(request, f"{product.title} added to your cart.")
     return redirect('view_cart')
 
+def cart_total(cart_items):
+    return cart_items.aggregate(
+        total=Sum(F('quantity') * F('product__price'), output_field=DecimalField())
+    )['total'] or 0
+
 @login_required
 def view_cart(request):
-    if request.user.profile.role != 'buyer':
+    if request.role.name != 'buyer':
         messages.error(request, "Only buyers have a cart.")
         return redirect('product_list')
 
-    cart_items = CartItem.objects.filter(user=request.user)
-    total = sum(item.get_total_price() for item in cart_items)
+    cart_items = CartItem.objects.filter(user=request.user).select_related('product')
+    total = cart_total(cart_items)
     return render(request, 'core/cart.html', {
         'cart_items': cart_items,
         'total': total
@@ -165,7 +215,7 @@ def view_cart(request):
 
 @login_required
 def remove_from_cart(request, item_id):
-    if request.user.profile.role != 'buyer':
+    if request.role.name != 'buyer':
         messages.error(request, "Only buyers have a cart.")
         return redirect('product_list')
 
@@ -176,48 +226,79 @@ def remove_from_cart(request, item_id):
 
 @login_required
 def checkout(request):
-    cart_items = CartItem.objects.filter(user=request.user)
+    cart_items = CartItem.objects.filter(user=request.user).select_related('product__farmer')
     if request.method == 'POST':
-        if not cart_items.exists():
-            messages.error(request, "Your cart is empty.")
-            return redirect("product_list")
-
-        total = sum(item.get_total_price() for item in cart_items)
-        order = Order.objects.create(buyer=request.user, total_price=total)
-
-        # Create OrderItems and notify farmers
-        notified_farmers = set()
-        for item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                product=item.product,
-                quantity=item.quantity,
-                price=item.product.price,
+        # The whole order is one transaction with a fixed number of queries, however big the cart
+        with transaction.atomic():
+            items = list(cart_items)
+            if not items:
+                messages.error(request, "Your cart is empty.")
+                return redirect("product_list")
+
+            out_of_stock = [item.product.title for item in items if item.quantity > item.product.quantity]
+            if out_of_stock:
+                messages.error(request, f"Not enough stock for: {', '.join(out_of_stock)}.")
+                return redirect("view_cart")
+
+            total = cart_total(cart_items)
+
+            # One UPDATE takes every item's stock, each row only while it still holds enough, so a
+            # checkout that read the same quantities can't oversell them; select_for_update is a
+            # no-op on SQLite. Fewer rows than items means another order got there first.
+            in_stock = Q()
+            for item in items:
+                in_stock |= Q(pk=item.product_id, quantity__gte=item.quantity)
+            taken = Product.objects.filter(in_stock).update(quantity=Case(
+                *(When(pk=item.product_id, then=F('quantity') - item.quantity) for item in items),
+            ))
+            if taken != len(items):
+                transaction.set_rollback(True)
+                messages.error(request, "Some items sold out while you were checking out. Please review your cart.")
+                return redirect("view_cart")
+            # update() sends no signals; waiting for the commit keeps pages rendered meanwhile out of the cache
+            product_ids = [item.product_id for item in items]
+            transaction.on_commit(lambda: invalidate_product_pages(*product_ids))
+
+            order = Order.objects.create(
+                buyer=request.user,
+                total_price=total,
+                item_count=sum(item.quantity for item in items),
             )
-            farmer = item.product.farmer
-            if farmer.id not in notified_farmers:
-                Message.objects.create(
+
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=item.product, quantity=item.quantity, price=item.product.price)
+                for item in items
+            ])
+
+            # Notify each farmer once
+            farmers = {item.product.farmer.id: item.product.farmer for item in items}
+            Message.objects.bulk_create([
+                Message(
                     sender=request.user,
                     recipient=farmer,
                     subject="New Order Notification",
                     body=f"Hi {farmer.username}, your product(s) have been purchased by {request.user.username}."
                 )
-                if farmer.email:
-                    send_mail(
-                        subject="New Order Notification",
-                        message=f"Hello {farmer.username}, your product(s) have been purchased by {request.user.username}.",
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        recipient_list=[farmer.email],
-                    )
-                notified_farmers.add(farmer.id)
-
-        # Empty cart
-        cart_items.delete()
+                for farmer in farmers.values()
+            ])
+            # Queued with the order; send_queued_mail delivers it outside the request
+            enqueue_mass_mail([
+                (
+                    "New Order Notification",
+                    f"Hello {farmer.username}, your product(s) have been purchased by {request.user.username}.",
+                    None,
+                    [farmer.email],
+                )
+                for farmer in farmers.values() if farmer.email
+            ], reference=f"order:{order.pk}")
+
+            # Empty cart
+            cart_items.delete()
         messages.success(request, "Your order was placed successfully!")
         return redirect("orders")
 
     # GET request: just show checkout page
-    total = sum(item.get_total_price() for item in cart_items)
+    total = cart_total(cart_items)
     return render(request, 'core/checkout.html', {
         'cart_items': cart_items,
         'total': total
@@ -225,14 +306,15 @@ def checkout(request):
 
 @login_required
 def orders(request):
-    orders = Order.objects.filter(buyer=request.user).order_by('-created_at')
-    return render(request, 'core/orders.html', {'orders': orders})
+    orders = Order.objects.filter(buyer=request.user).order_by('-created_at').prefetch_related('items__product')
+    paginator = Paginator(orders, 10)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    return render(request, 'core/orders.html', {'orders': page_obj, 'page_obj': page_obj})
 
 
 @login_required
 def inbox_view(request):
-    inbox_messages = Message.objects.filter(recipient=request.user)
-    return render(request, 'core/inbox.html', {'inbox_messages': inbox_messages})
+    return render(request, 'core/inbox.html', {'inbox_messages': inbox_messages(request.user)})
 
 @login_required
 def send_message_view(request):
@@ -244,11 +326,12 @@ def send_message_view(request):
             sender = request.user
 
             if send_to_all:
-                # send to all users
-                recipients = User.objects.exclude(id=sender.id)  # exclude yourself
-                for user in recipients:
-                    Message.objects.create(sender=sender, recipient=user, body=body)
-                messages.success(request, "Message sent successfully to all users!")
+                # send to all users (excluding yourself), in bulk chunks
+                broadcast = start_broadcast(sender, body)
+                if broadcast.completed_at:
+                    messages.success(request, "Message sent successfully to all users!")
+                else:
+                    messages.success(request, f"Message queued for {broadcast.recipient_count} users and is being delivered.")
             else:
                 recipient = form.cleaned_data.get('recipient')
                 if recipient:
@@ -265,13 +348,13 @@ def send_message_view(request):
 
 @login_required
 def sent_message_view(request):
-    sent_messages = Message.objects.filter(sender=request.user).order_by('-timestamp')
-    return render(request, 'core/sent_message.html', {'messages_list': sent_messages})
+    broadcasts = Broadcast.objects.filter(sender=request.user)
+    return render(request, 'core/sent_message.html', {'messages_list': sent_messages(request.user), 'broadcasts': broadcasts})
 
 
 @login_required
 def request_delivery(request, product_id):
-    if request.user.profile.role != 'farmer':
+    if request.role.name != 'farmer':
         messages.error(request, "Only farmers can request deliveries.")
         return redirect('home')
 
@@ -284,8 +367,7 @@ def request_delivery(request, product_id):
             delivery.farmer = request.user
             delivery.product = product
             delivery.status = 'pending'
-            delivery.save()
-            delivery.calculate_delivery_cost()  # Auto-fill delivery cost
+            delivery.save()  # quotes delivery_cost as it inserts
             messages.success(request, "Delivery request submitted successfully.")
             return redirect('my_deliveries')
     else:
@@ -298,116 +380,172 @@ def request_delivery(request, product_id):
 
 @login_required
 def view_pending_deliveries(request):
-    if request.user.profile.role == 'logistics':
-        deliveries = DeliveryRequest.objects.filter(
-            logistics_agent=request.user
-        ).exclude(status__in=['delivered', 'cancelled']) | DeliveryRequest.objects.filter(status='pending')
-        deliveries = deliveries.distinct()
-        return render(request, 'core/pending_deliveries.html', {'deliveries': deliveries})
+    if request.role.name == 'logistics':
+        plan = current_plan()
+        return render(request, 'core/pending_deliveries.html', {
+            'deliveries': open_deliveries(request.user),
+            'route': plan.for_agent(request.user.id) if plan else None,
+        })
     else:
         return redirect('home')
 
+@login_required
+def claim_route_batch(request):
+    if request.role.name != 'logistics' or request.method != 'POST':
+        return redirect('home')
+    delivery_ids = [value for value in request.POST.getlist('delivery') if value.isdigit()]
+    # Only rows nobody has claimed in the meantime change hands
+    claimed = claim_deliveries(request.user, delivery_ids)
+    if claimed == len(delivery_ids):
+        messages.success(request, f"You accepted {claimed} deliveries.")
+    else:
+        messages.warning(request, f"You accepted {claimed} of {len(delivery_ids)} deliveries; the rest were taken by other agents.")
+    return redirect('logistics_dashboard')
+
     
 @login_required
 def update_delivery_status(request, delivery_id, status):
-    delivery = get_object_or_404(DeliveryRequest, id=delivery_id)
-
-    allowed_statuses = ['cancelled', 'pending', 'accepted', 'in_transit', 'delivered']
-
-    if status not in allowed_statuses:
-        messages.error(request, "Invalid status update.")
+    role = request.role.name
+    if role not in ('logistics', 'farmer', 'buyer'):
+        messages.error(request, "You are not authorized to update this delivery.")
         return redirect('home')
+    dashboard = 'logistics_dashboard' if role == 'logistics' else 'my_deliveries'
 
-    role = request.user.profile.role
+    # Checked and applied in one UPDATE, so a concurrent claim can't be overwritten
+    try:
+        change_status(delivery_id, request.user, role, status)
+    except DeliveryConflict as conflict:
+        messages.error(request, str(conflict))
+        return redirect(dashboard)
 
     if role == 'logistics':
-        # If unassigned, allow the agent to claim it
-        if delivery.logistics_agent is None:
-            delivery.logistics_agent = request.user
-
-        # Otherwise, only the assigned agent can update
-        elif delivery.logistics_agent != request.user:
-            messages.error(request, "You are not assigned to this delivery.")
-            return redirect('logistics_dashboard')
-
-        delivery.status = status
-        delivery.save()
         messages.success(request, f"Delivery marked as '{status}'.")
-        return redirect('logistics_dashboard')
-
-    # Farmer and buyer can only cancel
-    elif role == 'farmer' and delivery.farmer == request.user and status == 'cancelled':
-        delivery.status = status
-        delivery.save()
+    else:
         messages.success(request, "Delivery request cancelled successfully.")
-        return redirect('my_deliveries')
+    return redirect(dashboard)
 
-    elif role == 'buyer' and delivery.buyer == request.user and status == 'cancelled':
-        delivery.status = status
-        delivery.save()
-        messages.success(request, "Delivery request cancelled successfully.")
-        return redirect('my_deliveries')
+def _listed_deliveries(request):
+    # The deliveries the user may list, narrowed by the filter form; None for roles without a listing
+    deliveries = listed_deliveries(request.user, request.role.name)
+    if deliveries is None:
+        return None, None
 
+    filter_form = DeliveryFilterForm(request.GET)
+    if filter_form.is_valid():
+        deliveries = filter_deliveries(deliveries, filter_form.cleaned_data)
     else:
-        messages.error(request, "You are not authorized to update this delivery.")
-        return redirect('home')
+        deliveries = deliveries.none()  # the form shows what to fix
+    return deliveries, filter_form
 
 @login_required
 def my_delivery_requests(request):
-    role = request.user.profile.role
-
-    if role == 'farmer':
-        deliveries = DeliveryRequest.objects.filter(farmer=request.user)
-        title = "My Delivery Requests (Farmer)"
-    elif role == 'buyer':
-        deliveries = DeliveryRequest.objects.filter(buyer=request.user)
-        title = "My Deliveries (Buyer)"
-    elif role == 'logistics':
-        deliveries = DeliveryRequest.objects.all()  # logistics sees all
-        title = "All Deliveries (Logistics)"
-    else:
+    deliveries, filter_form = _listed_deliveries(request)
+    if deliveries is None:
         messages.error(request, "You do not have access to deliveries.")
         return redirect('home')
 
+    # One query per page, however deep: a keyset range with every related row the table shows joined in
+    deliveries = deliveries.select_related('product', 'farmer', 'buyer', 'logistics_agent')
+    page_obj = CursorPaginator(deliveries, DELIVERIES_PER_PAGE, '-date_requested').page(request.GET.get('cursor'))
+
     return render(request, 'core/my_deliveries.html', {
-        'deliveries': deliveries,
-        'title': title,
-        'role': role
+        'deliveries': page_obj,
+        'page_obj': page_obj,
+        'filter_form': filter_form,
+        'title': DELIVERY_LIST_TITLES[request.role.name],
+        'role': request.role.name,
     })
 
+class _Echo:
+    # csv.writer target that hands each formatted line straight back
+    def write(self, value):
+        return value
+
+def _csv_safe(row):
+    # Product titles and locations are user input; a leading quote makes the cell plain text
+    return [f"'{value}" if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES) else value for value in row]
+
+@login_required
+def export_deliveries(request):
+    deliveries, filter_form = _listed_deliveries(request)
+    if deliveries is None:
+        messages.error(request, "You do not have access to deliveries.")
+        return redirect('home')
+
+    rows = deliveries.order_by('-date_requested', '-id').values_list(*DELIVERY_EXPORT_FIELDS)
+    writer = csv.writer(_Echo())
+    # Rows are written as they are read, so a year of deliveries never sits in memory
+    if isinstance(request, ASGIRequest):
+        async def content():
+            yield writer.writerow(DELIVERY_EXPORT_FIELDS)
+            async for row in rows.aiterator(chunk_size=EXPORT_CHUNK_SIZE):
+                yield writer.writerow(_csv_safe(row))
+    else:
+        def content():
+            yield writer.writerow(DELIVERY_EXPORT_FIELDS)
+            for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                yield writer.writerow(_csv_safe(row))
+
+    response = StreamingHttpResponse(content(), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="deliveries.csv"'
+    return response
+
+@login_required
+async def delivery_events(request):
+    # Server-sent events: status changes of the user's deliveries, pushed as they are saved
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)  # a WSGI worker can't hold the stream open; 204 stops EventSource retrying
+    user = await request.auser()
+    language = translation.get_language()  # labels are for the reader, not whoever made the change
+
+    async def stream():
+        subscription = await events.subscribe(user.id)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), settings.DELIVERY_EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"  # lets proxies and the server notice a dropped client
+                    continue
+                with translation.override(language):
+                    label = str(events.STATUS_LABELS[event['status']])
+                yield f"event: delivery\ndata: {json.dumps({**event, 'label': label})}\n\n"
+        finally:
+            events.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx would otherwise hold events back
+    return response
+
 def is_logistics(user):
-    return user.is_authenticated and user.groups.filter(name='Logistics').exists()
+    return get_user_role(user).in_group('Logistics')
 
 @login_required
 def logistics_dashboard(request):
-    if request.user.profile.role != 'logistics':
+    if request.role.name != 'logistics':
         return redirect('home')
 
     # Deliveries assigned to this logistics agent
-    assigned_deliveries = DeliveryRequest.objects.filter(logistics_agent=request.user)
+    assigned = assigned_deliveries(request.user)
+    pending_assigned = assigned.filter(status='pending')[:20]
+    paginator = Paginator(assigned, 10)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    stats = delivery_stats(request.user.id)  # one aggregate query, cached until a delivery changes
 
     # Weather Data
-    location = request.GET.get('city') or request.user.profile.location or "Ibadan"
-    weather = None
-    try:
-        url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={settings.OPENWEATHER_API_KEY}&units=metric"
-        response = requests.get(url)
-        data = response.json()
-        if data.get("main"):
-            weather = {
-                "temp": data["main"]["temp"],
-                "description": data["weather"][0]["description"].title(),
-                "icon": data["weather"][0]["icon"]
-            }
-    except:
-        pass
-    
+    location = request.GET.get('city') or request.role.location or "Ibadan"
+    weather = get_weather(location)
+
     context = {
-        'assigned_deliveries': assigned_deliveries,
-        'total_deliveries': assigned_deliveries.count(),
-        'pending_deliveries': assigned_deliveries.filter(status='pending').count(),
-        'in_transit_deliveries': assigned_deliveries.filter(status='in_transit').count(),
-        'delivered_deliveries': assigned_deliveries.filter(status='delivered').count(),
+        'assigned_deliveries': page_obj,
+        'pending_assigned': pending_assigned,
+        'page_obj': page_obj,
+        'total_deliveries': stats['total'],
+        'pending_deliveries': stats['pending'],
+        'in_transit_deliveries': stats['in_transit'],
+        'delivered_deliveries': stats['delivered'],
         'weather': weather,
         'location': location,
     }
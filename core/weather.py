@@ -0,0 +1,131 @@
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+from .instrumentation import record_cache, record_http
+
+# One pooled session per process so dashboard lookups reuse keep-alive connections
+_session = requests.Session()
+_session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+NOT_FOUND = 'not_found'
+REFRESH_LOCK_TTL = 30
+
+
+def normalize_city(city):
+    return ' '.join((city or '').split()).lower()
+
+
+def _cache_key(city):
+    return f"weather:{normalize_city(city).replace(' ', '_')}"
+
+
+def _failed_key(city):
+    return f"{_cache_key(city)}:failed"
+
+
+def _fetch(city):
+    """Return parsed weather, NOT_FOUND for an unknown city, or None on a transient failure."""
+    params = {
+        'q': city,
+        'appid': settings.OPENWEATHER_API_KEY,
+        'units': 'metric',
+    }
+    started = time.perf_counter()
+    try:
+        response = _session.get(settings.OPENWEATHER_URL, params=params, timeout=settings.WEATHER_TIMEOUT)
+    except requests.RequestException:
+        return None
+    finally:
+        record_http(time.perf_counter() - started)
+    if response.status_code == 404:
+        return NOT_FOUND
+    if response.status_code != 200:
+        return None
+    try:
+        data = response.json()
+        return {
+            'temp': data['main']['temp'],
+            'description': data['weather'][0]['description'],
+            'icon': data['weather'][0]['icon'],
+        }
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+def refresh_weather(city):
+    """Fetch ``city`` from OpenWeather and store it; returns the weather dict or None."""
+    key = _cache_key(city)
+    result = _fetch(city)
+    if result is None:
+        # Timeout, 5xx or garbage: keep whatever is cached, and stop lookups and refreshes
+        # of this city from hitting the API again until WEATHER_FAILURE_TTL passes
+        cache.set(_failed_key(city), True, settings.WEATHER_FAILURE_TTL)
+        return None
+    if result == NOT_FOUND:
+        cache.set(key, {'weather': None, 'fetched_at': time.time()}, settings.WEATHER_NEGATIVE_TTL)
+        return None
+    # Kept past its fresh TTL so stale readers can be served while a refresh runs
+    cache.set(key, {'weather': result, 'fetched_at': time.time()}, settings.WEATHER_CACHE_TTL + settings.WEATHER_STALE_TTL)
+    cache.delete(_failed_key(city))
+    return result
+
+
+def _refresh_in_background(city):
+    # cache.add is atomic, so only one request per city triggers the refresh
+    if not cache.add(f"{_cache_key(city)}:refreshing", True, REFRESH_LOCK_TTL):
+        return
+
+    def run():
+        try:
+            refresh_weather(city)
+        finally:
+            cache.delete(f"{_cache_key(city)}:refreshing")
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def _count(name):
+    key = f"weather:stats:{name}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def pop_stats():
+    """Return and reset the lookup counters recorded by get_weather."""
+    keys = {name: f"weather:stats:{name}" for name in ('hits', 'stale', 'misses')}
+    values = cache.get_many(keys.values())
+    cache.delete_many(keys.values())
+    return {name: values.get(key, 0) for name, key in keys.items()}
+
+
+def get_weather(city):
+    """
+    Current weather for ``city`` as {'temp', 'description', 'icon'}, or None.
+    Fresh entries come straight from the cache, stale ones are returned while a
+    background refresh runs, unknown cities are negatively cached, and after a
+    failed fetch the city is not retried for WEATHER_FAILURE_TTL. With
+    WEATHER_FETCH_IN_VIEWS off, only data warmed by prefetch_weather is read.
+    """
+    if not normalize_city(city):
+        return None
+    entry = cache.get(_cache_key(city))
+    record_cache('weather', entry is not None)
+    fetch = settings.WEATHER_FETCH_IN_VIEWS and not cache.get(_failed_key(city))
+    if entry is None:
+        _count('misses')
+        return refresh_weather(city) if fetch else None
+    if entry['weather'] is not None and time.time() - entry['fetched_at'] > settings.WEATHER_CACHE_TTL:
+        _count('stale')
+        if fetch:
+            _refresh_in_background(city)
+    else:
+        _count('hits')
+    return entry['weather']
@@ -2,6 +2,11 @@
 ASGI config for farmmarket project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The delivery event stream (core.views.delivery_events) holds connections open
+on the event loop, so serve the app with an ASGI server, e.g. on Azure App
+Service use the startup command:
+
+    python -m uvicorn farmmarket.asgi:application --host 0.0.0.0 --port 8000 --workers 4
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
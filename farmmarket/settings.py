@@ -10,14 +10,19 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from decimal import Decimal
 from pathlib import Path
 from decouple import config
 from django.utils.translation import gettext_lazy as _
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Running under `manage.py test`; background work and production-only storage are switched off
+TESTING = sys.argv[1:2] == ['test']
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -70,13 +75,16 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.InstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.middleware.UserRoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.SyncChainMiddleware',  # keep last: one thread hop per request under ASGI
 ]
 
 ROOT_URLCONF = 'farmmarket.urls'
@@ -103,10 +111,78 @@ WSGI_APPLICATION = 'farmmarket.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# DB_ENGINE selects the profile: "sqlite" (default) or "postgresql" (needs psycopg[pool] installed)
+
+DB_ENGINE = config('DB_ENGINE', default='sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='farmmarket'),
+            'USER': config('DB_USER', default=''),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            # Connections come from a per-process psycopg pool. Django's own persistent
+            # connections (CONN_MAX_AGE) belong to a thread, and under ASGI each request
+            # runs in a new thread, so they would be opened per request and never reused;
+            # the pool requires CONN_MAX_AGE = 0. With health checks on, the pool pings a
+            # connection before handing it out, so one dropped by the server or a
+            # failover is replaced instead of failing the request
+            'CONN_MAX_AGE': 0,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+                'sslmode': config('DB_SSLMODE', default='prefer'),
+                'pool': {
+                    'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+                    'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),  # per worker process
+                    'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),  # wait for a free connection
+                    'max_idle': config('DB_POOL_MAX_IDLE', default=600, cast=float),
+                },
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+            'OPTIONS': {},
+            # A file rather than SQLite's shared in-memory database, whose table locks
+            # fail concurrent tests at once instead of waiting out busy_timeout
+            'TEST': {'NAME': str(BASE_DIR / 'test_db.sqlite3')},
+        }
+    }
+
+# Applied to every new SQLite connection by core.db.configure_sqlite. WAL lets readers
+# run alongside the single writer, and busy_timeout makes writers queue instead of
+# failing with "database is locked". SQLITE_TUNING=False restores SQLite's defaults.
+SQLITE_PRAGMAS = {}
+if DB_ENGINE != 'postgresql' and config('SQLITE_TUNING', default=True, cast=bool):
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),  # ms
+        'mmap_size': 128 * 1024 * 1024,
+        'cache_size': -20000,  # KiB
+        'temp_store': 'MEMORY',
+    }
+    # Take the write lock when a transaction starts; a deferred transaction that later
+    # needs to write fails at once with "database is locked" instead of waiting
+    DATABASES['default']['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Background workers such as prefetch_weather run in their own process, so set a shared
+# backend (e.g. django.core.cache.backends.filebased.FileBasedCache) in production
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='farmmarket'),
     }
 }
 
@@ -163,6 +239,14 @@ LOGOUT_REDIRECT_URL = 'login'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Resized WebP/AVIF copies of uploads (core.images). Missing ones are built in a background
+# thread on first view; `manage.py generate_image_derivatives` builds them up front.
+# Django serves them (with immutable caching) only when DEBUG is on; in production the
+# web server serves MEDIA_ROOT, and should send MEDIA_URL + 'derivatives/' with
+# "Cache-Control: public, max-age=31536000, immutable" since those names are content hashes
+IMAGE_DERIVATIVE_WIDTHS = [320, 640, 1024]
+IMAGE_DERIVATIVES_IN_BACKGROUND = config('IMAGE_DERIVATIVES_IN_BACKGROUND', default=not TESTING, cast=bool)
+
 EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = BASE_DIR / "sent_emails"  # folder where emails will be saved
 DEFAULT_FROM_EMAIL = "noreply@farmmarket.com"
@@ -183,14 +267,78 @@ STORAGES = {
     "default": {
         "BACKEND": "django.core.files.storage.FileSystemStorage",
     },
+    # Product images and profile photos: stored once per distinct content (core.storage)
+    "media": {
+        "BACKEND": "core.storage.ContentAddressedStorage",
+    },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     },
 }
+# Unreferenced media files younger than this (seconds) are not deleted yet: an upload of the
+# same content may be about to commit a row pointing at them
+MEDIA_COLLECT_GRACE = config('MEDIA_COLLECT_GRACE', default=600, cast=int)
+
+# `manage.py test` renders templates without running collectstatic first, and
+# hashes test users' passwords with a fast hasher
+if TESTING:
+    STORAGES["staticfiles"] = {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"}
+    PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
 
 # Crispy Forms Settings
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
+# Anonymous marketplace pages and product-card fragments (core.pagecache), in seconds.
+# Product saves and deletes invalidate both; the TTL bounds how stale the page's weather gets
+# (with a process-local cache, both are cut to core.pagecache.LOCAL_PAGE_CACHE_TTL)
+PAGE_CACHE_TTL = config('PAGE_CACHE_TTL', default=300, cast=int)
+PRODUCT_CARD_CACHE_TTL = config('PRODUCT_CARD_CACHE_TTL', default=60 * 60 * 24, cast=int)
+
+# Request instrumentation (core.instrumentation): queries slower than this are logged as
+# warnings with the line that ran them; /metrics/ is open to staff and to this bearer token
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=200, cast=int)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Seconds between keepalive comments on idle delivery event streams (/delivery/events/)
+DELIVERY_EVENTS_KEEPALIVE = config('DELIVERY_EVENTS_KEEPALIVE', default=15, cast=int)
+# Seconds between each worker's polls for new delivery events (core.events), which bounds
+# how late a change made through another worker shows up
+DELIVERY_EVENTS_POLL = config('DELIVERY_EVENTS_POLL', default=1, cast=float)
+
+# Delivery quotes (core.deliveries): the great-circle distance between pickup and destination,
+# stretched by the road factor, is charged at each band's per-km rate on top of the base fee
+DELIVERY_BASE_FEE = config('DELIVERY_BASE_FEE', default='500', cast=Decimal)
+DELIVERY_ROAD_FACTOR = config('DELIVERY_ROAD_FACTOR', default=1.3, cast=float)
+DELIVERY_RATE_BANDS = [  # (road km up to, naira per km); None for the rest of the trip
+    (25, Decimal('100')),
+    (100, Decimal('80')),
+    (None, Decimal('60')),
+]
+
+# Route proposals for logistics agents (core.routing): deliveries per trip, size of the
+# pickup/destination grid squares they are grouped by, and the planner's time budget.
+# A plan older than ROUTE_PLAN_TTL or outdated by a delivery change keeps being served
+# while a background thread rebuilds it
+ROUTE_BATCH_SIZE = config('ROUTE_BATCH_SIZE', default=8, cast=int)
+ROUTE_CLUSTER_KM = config('ROUTE_CLUSTER_KM', default=30, cast=float)
+ROUTE_PLAN_BUDGET = config('ROUTE_PLAN_BUDGET', default=2.0, cast=float)
+ROUTE_PLAN_TTL = config('ROUTE_PLAN_TTL', default=300, cast=int)
+ROUTE_PLAN_IN_BACKGROUND = config('ROUTE_PLAN_IN_BACKGROUND', default=not TESTING, cast=bool)
+
 # Any external API keys
-OPENWEATHER_API_KEY = config('OPENWEATHER_API_KEY')
\ No newline at end of file
+OPENWEATHER_API_KEY = config('OPENWEATHER_API_KEY')
+OPENWEATHER_URL = config('OPENWEATHER_URL', default='https://api.openweathermap.org/data/2.5/weather')
+
+# Weather cache (seconds): fresh lifetime, extra window served stale while refreshing,
+# how long an unknown city is remembered, how long a city is not retried after a timeout
+# or server error, and the HTTP timeout per lookup
+WEATHER_CACHE_TTL = config('WEATHER_CACHE_TTL', default=600, cast=int)
+WEATHER_STALE_TTL = config('WEATHER_STALE_TTL', default=1800, cast=int)
+WEATHER_NEGATIVE_TTL = config('WEATHER_NEGATIVE_TTL', default=3600, cast=int)
+WEATHER_FAILURE_TTL = config('WEATHER_FAILURE_TTL', default=60, cast=int)
+WEATHER_TIMEOUT = config('WEATHER_TIMEOUT', default=3, cast=float)
+
+# Turn off once `manage.py prefetch_weather --interval ...` is running, so views only read warmed data
+# (off by default under `manage.py test`, so no test reaches the real API)
+WEATHER_FETCH_IN_VIEWS = config('WEATHER_FETCH_IN_VIEWS', default=not TESTING, cast=bool)
\ No newline at end of file
@@ -15,8 +15,9 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
-from core.views import home
+from django.urls import path, include, re_path
+from core.images import DERIVATIVE_DIR
+from core.views import home, media_derivative
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -25,4 +26,12 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('users/', include('users.urls')),
     path('', include('core.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
+
+# Uploads are only served by Django in development, like static() below; in production the
+# web server serves MEDIA_ROOT (see the image derivative settings)
+if settings.DEBUG:
+    urlpatterns += [
+        re_path(rf'^{settings.MEDIA_URL.lstrip("/")}{DERIVATIVE_DIR}/(?P<path>.+)$', media_derivative, name='media_derivative'),
+    ]
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,30 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.provisioning import provision_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Import farmers, buyers and logistics agents from a CSV file with a header row. "
+        "Required columns: username, role. Optional: email, password, first_name, last_name, "
+        "location, address, city, state, country."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['csv_file'], newline='', encoding='utf-8-sig') as handle:
+                result = provision_users(csv.DictReader(handle), batch_size=options['batch_size'])
+        except OSError as exc:
+            raise CommandError(exc)
+
+        for number, message in result.errors:
+            self.stderr.write(f"Row {number}: {message}")
+        if result.skipped:
+            self.stdout.write(f"Skipped {len(result.skipped)} existing usernames.")
+        self.stdout.write(self.style.SUCCESS(f"Created {result.created} users."))
@@ -0,0 +1,14 @@
+from django.utils.functional import SimpleLazyObject
+
+from .roles import get_user_role
+
+
+class UserRoleMiddleware:
+    """Expose ``request.role`` (see users.roles.UserRole), resolved at most once per request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.role = SimpleLazyObject(lambda: get_user_role(request.user))
+        return self.get_response(request)
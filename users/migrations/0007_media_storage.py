@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:10
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_alter_profile_photo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='photo',
+            field=models.ImageField(blank=True, default='profile_photos/default.png', null=True, storage=core.storage.select_media_storage, upload_to='profile_photos/'),
+        ),
+    ]
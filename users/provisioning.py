@@ -0,0 +1,92 @@
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+
+from .models import Profile
+
+# Group each role is placed in; DeliveryRequestForm and the role checks look users up by these
+ROLE_GROUPS = {
+    'farmer': 'Farmer',
+    'buyer': 'Buyer',
+    'logistics': 'Logistics',
+}
+PROFILE_FIELDS = ('location', 'address', 'city', 'state', 'country')
+ROLES = {role for role, _ in Profile.ROLE_CHOICES}
+
+
+class ProvisioningResult:
+    def __init__(self):
+        self.created = 0
+        self.skipped = []  # usernames that already exist
+        self.errors = []   # (row number, message)
+
+
+def _clean(row):
+    return {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+
+
+def provision_users(rows, batch_size=1000):
+    """
+    Create users with their profiles and role groups from dicts with at least
+    ``username`` and ``role``, ``batch_size`` at a time using bulk inserts.
+    Rows without a ``password`` get an unusable one; existing usernames are skipped.
+    """
+    result = ProvisioningResult()
+    groups = {role: Group.objects.get_or_create(name=name)[0] for role, name in ROLE_GROUPS.items()}
+
+    batch = []
+    for number, row in enumerate(rows, start=1):
+        row = _clean(row)
+        if not row.get('username'):
+            result.errors.append((number, "missing username"))
+        elif row.get('role', '').lower() not in ROLES:
+            result.errors.append((number, f"unknown role {row.get('role')!r}"))
+        else:
+            batch.append(row)
+        if len(batch) >= batch_size:
+            _provision_batch(batch, groups, result)
+            batch = []
+    if batch:
+        _provision_batch(batch, groups, result)
+    return result
+
+
+def _provision_batch(rows, groups, result):
+    usernames = [row['username'] for row in rows]
+    existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    seen = set()
+    new_rows = []
+    for row in rows:
+        if row['username'] in existing or row['username'] in seen:
+            result.skipped.append(row['username'])
+        else:
+            seen.add(row['username'])
+            new_rows.append(row)
+    if not new_rows:
+        return
+
+    with transaction.atomic():
+        # bulk_create skips post_save, so profiles and group memberships are inserted here too
+        users = User.objects.bulk_create([
+            User(
+                username=row['username'],
+                email=row.get('email', ''),
+                first_name=row.get('first_name', ''),
+                last_name=row.get('last_name', ''),
+                password=make_password(row.get('password') or None),
+            )
+            for row in new_rows
+        ])
+        Profile.objects.bulk_create([
+            Profile(
+                user=user,
+                role=row['role'].lower(),
+                **{field: row[field] for field in PROFILE_FIELDS if row.get(field)},
+            )
+            for user, row in zip(users, new_rows)
+        ])
+        User.groups.through.objects.bulk_create([
+            User.groups.through(user_id=user.pk, group_id=groups[row['role'].lower()].pk)
+            for user, row in zip(users, new_rows)
+        ])
+    result.created += len(users)
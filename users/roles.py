@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from core.instrumentation import record_cache
+
+# Invalidation only reaches the cache it runs against. With a process-local cache the other
+# workers keep a changed role until their copy expires, so there it is kept only briefly
+ROLE_CACHE_TTL = 60 * 60
+LOCAL_ROLE_CACHE_TTL = 30
+
+
+class UserRole:
+    """Who the current user is: profile role, verified flag, location and group names."""
+
+    def __init__(self, name=None, verified=False, location=None, groups=()):
+        self.name = name
+        self.verified = verified
+        self.location = location
+        self.groups = frozenset(groups)
+
+    def __str__(self):
+        return self.name or ''
+
+    def in_group(self, group_name):
+        return group_name in self.groups
+
+    @property
+    def is_farmer(self):
+        return self.name == 'farmer'
+
+    @property
+    def is_buyer(self):
+        return self.name == 'buyer'
+
+    @property
+    def is_logistics(self):
+        return self.name == 'logistics'
+
+
+ANONYMOUS = UserRole()
+
+
+def _cache_key(user_id):
+    return f"user_role:{user_id}"
+
+
+def _cache_ttl():
+    if settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+        return LOCAL_ROLE_CACHE_TTL
+    return ROLE_CACHE_TTL
+
+
+def _role_rows(user):
+    return User.objects.filter(pk=user.pk).values_list(
+        'profile__role', 'profile__verified', 'profile__location', 'groups__name',
+    )
+
+
+def _role_data(rows):
+    role, verified, location, _ = rows[0]
+    return {
+        'name': role,
+        'verified': bool(verified),
+        'location': location,
+        'groups': [group for *_, group in rows if group],
+    }
+
+
+def get_user_role(user):
+    """
+    Resolve a user's role with one joined query, cached until the profile or groups
+    change (or, with a process-local cache, for LOCAL_ROLE_CACHE_TTL seconds).
+    """
+    if not user.is_authenticated:
+        return ANONYMOUS
+    data = cache.get(_cache_key(user.pk))
+    record_cache('user_role', data is not None)
+    if data is None:
+        rows = list(_role_rows(user))
+        if not rows:
+            return ANONYMOUS
+        data = _role_data(rows)
+        cache.set(_cache_key(user.pk), data, _cache_ttl())
+    return UserRole(**data)
+
+
+def invalidate_user_role(*user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
@@ -1,10 +1,61 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
-from django.contrib.auth.models import User
-from .models import Profile
-
-@receiver(post_save, sender=User)
-def create_or_update_user_profile(sender, instance, created, **kwargs):
-    if created:
-        Profile.objects.create(user=instance)
-    instance.profile.save()
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from core.images import get_derivatives
+from core.storage import release
+from .models import Profile
+from .roles import invalidate_user_role
+
+@receiver(post_save, sender=User)
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
+    # Only new users need a write; re-saving the profile on every User save (e.g. each
+    # last_login update) cost a SELECT and an UPDATE per login
+    if created and not raw:
+        Profile.objects.create(user=instance)
+
+@receiver(post_save, sender=Profile)
+def build_profile_photo_derivatives(sender, instance, raw=False, **kwargs):
+    # Looking the manifest up starts the background build for a new upload
+    if not raw and instance.photo:
+        transaction.on_commit(lambda: get_derivatives(instance.photo))
+
+# Shared media files are reference-counted; a replaced or deleted photo drops its reference
+
+@receiver(post_init, sender=Profile)
+def remember_profile_photo(sender, instance, **kwargs):
+    photo = instance.__dict__.get('photo')
+    instance._loaded_photo = getattr(photo, 'name', photo)
+
+@receiver(post_save, sender=Profile)
+def release_replaced_profile_photo(sender, instance, created, raw=False, **kwargs):
+    if raw or 'photo' not in instance.__dict__:  # deferred, so it was not changed either
+        return
+    if not created and instance._loaded_photo and instance._loaded_photo != instance.photo.name:
+        release(instance._loaded_photo)
+    instance._loaded_photo = instance.photo.name
+
+@receiver(post_delete, sender=Profile)
+def release_profile_photo(sender, instance, **kwargs):
+    release(instance.photo.name)
+
+# Keep the cached request.role in step with profile and group changes
+
+@receiver([post_save, post_delete], sender=Profile)
+def invalidate_profile_role(sender, instance, **kwargs):
+    invalidate_user_role(instance.user_id)
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_membership_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:  # user.groups.add(...) and friends
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_user_role(instance.pk)
+    elif action in ('post_add', 'post_remove'):  # group.user_set.add(...)
+        invalidate_user_role(*pk_set)
+    elif action == 'pre_clear':
+        invalidate_user_role(*instance.user_set.values_list('pk', flat=True))
+
+@receiver([post_save, pre_delete], sender=Group)
+def invalidate_group_roles(sender, instance, created=False, **kwargs):
+    if not created:
+        invalidate_user_role(*instance.user_set.values_list('pk', flat=True))
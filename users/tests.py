@@ -1,3 +1,43 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from users import roles
+from users.roles import get_user_role
+
+
+class UserRoleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ada', 'ada@example.com', 'password')
+        self.user.profile.role = 'farmer'
+        self.user.profile.location = 'Ibadan'
+        self.user.profile.save()
+
+    def test_resolved_with_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            role = get_user_role(self.user)
+        self.assertEqual((role.name, role.location, role.groups), ('farmer', 'Ibadan', frozenset()))
+        with self.assertNumQueries(0):
+            self.assertTrue(get_user_role(self.user).is_farmer)
+
+    def test_profile_and_group_changes_invalidate(self):
+        get_user_role(self.user)
+        self.user.profile.role = 'buyer'
+        self.user.profile.save()
+        self.assertTrue(get_user_role(self.user).is_buyer)
+        self.user.groups.add(Group.objects.create(name='cooperative'))
+        self.assertTrue(get_user_role(self.user).in_group('cooperative'))
+
+    def test_process_local_cache_keeps_roles_briefly(self):
+        with mock.patch.object(roles.cache, 'set') as cache_set:
+            get_user_role(self.user)
+        self.assertEqual(cache_set.call_args.args[2], roles.LOCAL_ROLE_CACHE_TTL)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}})
+    def test_shared_cache_keeps_roles_longer(self):
+        with mock.patch.object(roles.cache, 'get', return_value=None), mock.patch.object(roles.cache, 'set') as cache_set:
+            get_user_role(self.user)
+        self.assertEqual(cache_set.call_args.args[2], roles.ROLE_CACHE_TTL)
@@ -3,12 +3,11 @@ from django.contrib import messages
 from .forms import UserRegisterForm, UserUpdateForm, ProfileUpdateForm
 from core.forms import DeliveryRequestForm
 from .models import Profile
-from core.models import Product, Message, DeliveryRequest
+from core.queries import latest_products, listed_deliveries, unread_messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
-import requests
-from django.conf import settings
+from core.weather import get_weather
 
 # Create your views here.
 def register_view(request):
@@ -47,7 +46,7 @@ def logout_view(request):
     
 @login_required
 def dashboard_redirect(request):
-    role = request.user.profile.role
+    role = request.role.name
     if role == 'logistics':
         return redirect('logistics_dashboard')
     elif role == 'farmer':
@@ -57,44 +56,38 @@ def dashboard_redirect(request):
     else:
         return redirect('home')
 
+def _submit_delivery_request(request, requester_field, dashboard):
+    delivery_form = DeliveryRequestForm(request.POST)
+    if delivery_form.is_valid():
+        delivery = delivery_form.save(commit=False)
+        setattr(delivery, requester_field, request.user)
+        delivery.save()
+        messages.success(request, "Delivery request submitted!")
+        return delivery_form, redirect(dashboard)
+    return delivery_form, None
+
 @login_required
 def farmer_dashboard(request):
-    my_products = Product.objects.filter(farmer=request.user).order_by('-date_posted')[:5]  # latest 5
-    unread_messages = Message.objects.filter(recipient=request.user, is_read=False).count()
-    recent_marketplace = Product.objects.exclude(farmer=request.user).order_by('-date_posted')[:5]
-    my_deliveries = DeliveryRequest.objects.filter(farmer=request.user)
-    # Weather Data
-    location = request.GET.get('city') or request.user.profile.location or "Ibadan"
-    
-    weather = None
-    try:
-        url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={settings.OPENWEATHER_API_KEY}&units=metric"
-        response = requests.get(url)
-        data = response.json()
-        if data.get("main"):
-            weather = {
-                "temp": data["main"]["temp"],
-                "description": data["weather"][0]["description"].title(),
-                "icon": data["weather"][0]["icon"]
-            }
-    except:
-        pass
-
     if request.method == 'POST':
-        delivery_form = DeliveryRequestForm(request.POST)
-        if delivery_form.is_valid():
-            delivery = delivery_form.save(commit=False)
-            delivery.farmer = request.user
-            delivery.save()
-            messages.success(request, "Delivery request submitted!")
-            return redirect('farmer_dashboard')
+        delivery_form, response = _submit_delivery_request(request, 'farmer', 'farmer_dashboard')
+        if response:
+            return response
     else:
         delivery_form = DeliveryRequestForm()
 
+    my_products = latest_products(farmer=request.user)[:5]  # latest 5
+    unread_count = unread_messages(request.user).count()
+    recent_marketplace = latest_products(exclude_farmer=request.user)[:5]
+    my_deliveries_count = listed_deliveries(request.user, 'farmer').count()
+
+    # Weather Data
+    location = request.GET.get('city') or request.role.location or "Ibadan"
+    weather = get_weather(location)
+
     return render(request, 'users/farmer_dashboard.html', {
         'my_products': my_products,
-        'my_deliveries': my_deliveries,
-        'unread_messages': unread_messages,
+        'my_deliveries_count': my_deliveries_count,
+        'unread_messages': unread_count,
         'recent_marketplace': recent_marketplace,
         'weather': weather,
         'location': location,
@@ -103,43 +96,25 @@ def farmer_dashboard(request):
 
 @login_required
 def buyer_dashboard(request):
-    recent_products = Product.objects.all().order_by('-date_posted')[:5]
-    unread_messages = Message.objects.filter(recipient=request.user, is_read=False).count()
-    
-    # Weather Data
-    location = request.GET.get('city') or request.user.profile.location or "Ibadan"
-    weather = None
-    try:
-        url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={settings.OPENWEATHER_API_KEY}&units=metric"
-        response = requests.get(url)
-        data = response.json()
-        if data.get("main"):
-            weather = {
-                "temp": data["main"]["temp"],
-                "description": data["weather"][0]["description"].title(),
-                "icon": data["weather"][0]["icon"]
-            }
-    except:
-        pass
-    
     # Delivery Request
     if request.method == 'POST':
-        delivery_form = DeliveryRequestForm(request.POST)
-        if delivery_form.is_valid():
-            delivery = delivery_form.save(commit=False)
-            delivery.buyer = request.user  # or .farmer for farmer
-            delivery.save()
-            messages.success(request, "Delivery request submitted!")
-            return redirect('buyer_dashboard')
+        delivery_form, response = _submit_delivery_request(request, 'buyer', 'buyer_dashboard')
+        if response:
+            return response
     else:
         delivery_form = DeliveryRequestForm()
 
-    # Buyer deliveries
-    my_deliveries = DeliveryRequest.objects.filter(buyer=request.user)
+    recent_products = latest_products()[:5]
+    unread_count = unread_messages(request.user).count()
+    my_deliveries = listed_deliveries(request.user, 'buyer').select_related('product', 'farmer')  # buyer deliveries
+
+    # Weather Data
+    location = request.GET.get('city') or request.role.location or "Ibadan"
+    weather = get_weather(location)
 
     return render(request, 'users/buyer_dashboard.html', {
         'recent_products': recent_products,
-        'unread_messages': unread_messages,
+        'unread_messages': unread_count,
         'weather': weather,
         'location': location,
         'delivery_form': delivery_form,